@@ -0,0 +1,64 @@
+"""add report completions
+
+Revision ID: 5c3e9a1d7b42
+Revises: 12049328fd0a
+Create Date: 2026-10-19 09:14:52.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e9a1d7b42'
+down_revision = '12049328fd0a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'report_completions',
+        sa.Column('quiz_completion_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('agency_id', sa.Integer(), nullable=False),
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('user_name', sa.String(), nullable=False),
+        sa.Column('user_email', sa.String(), nullable=False),
+        sa.Column('agency_name', sa.String(), nullable=False),
+        sa.Column('bureau', sa.String(), nullable=True),
+        sa.Column('quiz_name', sa.String(), nullable=False),
+        sa.Column('submit_ts', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['quiz_completion_id'], ['quiz_completions.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['agency_id'], ['agencies.id'], ),
+        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+        sa.PrimaryKeyConstraint('quiz_completion_id')
+    )
+    op.create_index(op.f('ix_report_completions_user_id'), 'report_completions', ['user_id'])
+    op.create_index(
+        'ix_report_completions_report_order',
+        'report_completions',
+        ['agency_name', sa.text('bureau NULLS FIRST'), sa.text('submit_ts DESC')]
+    )
+    op.create_index('ix_report_completions_agency_id_submit_ts', 'report_completions', ['agency_id', 'submit_ts'])
+
+    # Add the completions that have already passed
+    op.execute('''
+        INSERT INTO report_completions
+            (quiz_completion_id, user_id, agency_id, quiz_id, user_name, user_email, agency_name, bureau, quiz_name, submit_ts)
+        SELECT quiz_completions.id, users.id, agencies.id, quizzes.id, users.name, users.email,
+               agencies.name, agencies.bureau, quizzes.name, quiz_completions.submit_ts
+        FROM quiz_completions
+        JOIN users ON quiz_completions.user_id = users.id
+        JOIN agencies ON users.agency_id = agencies.id
+        JOIN quizzes ON quiz_completions.quiz_id = quizzes.id
+        WHERE quiz_completions.passed
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_report_completions_agency_id_submit_ts', table_name='report_completions')
+    op.drop_index('ix_report_completions_report_order', table_name='report_completions')
+    op.drop_index(op.f('ix_report_completions_user_id'), table_name='report_completions')
+    op.drop_table('report_completions')
@@ -0,0 +1,41 @@
+"""add report summaries
+
+Revision ID: 8e1f4b6c2d93
+Revises: 5c3e9a1d7b42
+Create Date: 2026-10-19 11:02:17.540129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1f4b6c2d93'
+down_revision = '5c3e9a1d7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'report_summaries',
+        sa.Column('agency_id', sa.Integer(), nullable=False),
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('passed', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['agency_id'], ['agencies.id'], ),
+        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+        sa.PrimaryKeyConstraint('agency_id', 'quiz_id', 'month')
+    )
+
+    # Count the completions that have already passed
+    op.execute('''
+        INSERT INTO report_summaries (agency_id, quiz_id, month, passed)
+        SELECT agency_id, quiz_id, CAST(date_trunc('month', submit_ts) AS date), count(*)
+        FROM report_completions
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_table('report_summaries')
@@ -0,0 +1,57 @@
+"""add quiz item analysis
+
+Revision ID: b7d25e0f9c14
+Revises: 8e1f4b6c2d93
+Create Date: 2026-10-19 13:36:41.208514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d25e0f9c14'
+down_revision = '8e1f4b6c2d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'quiz_version_stats',
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.Column('completions', sa.Integer(), nullable=False),
+        sa.Column('passed', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+        sa.PrimaryKeyConstraint('quiz_id', 'version')
+    )
+    op.create_table(
+        'quiz_question_stats',
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('responses', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+        sa.PrimaryKeyConstraint('quiz_id', 'version', 'question_id')
+    )
+    op.create_table(
+        'quiz_choice_stats',
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('choice_id', sa.Integer(), nullable=False),
+        sa.Column('selected', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+        sa.PrimaryKeyConstraint('quiz_id', 'version', 'question_id', 'choice_id')
+    )
+    # The existing completions are counted by
+    # python -m training.database.refresh_reports --item-analysis
+    # rather than here, it reads every completion's responses
+
+
+def downgrade() -> None:
+    op.drop_table('quiz_choice_stats')
+    op.drop_table('quiz_question_stats')
+    op.drop_table('quiz_version_stats')
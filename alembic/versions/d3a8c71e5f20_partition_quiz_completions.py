@@ -0,0 +1,152 @@
+"""partition quiz completions
+
+Revision ID: d3a8c71e5f20
+Revises: b7d25e0f9c14
+Create Date: 2026-10-19 15:48:09.611374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8c71e5f20'
+down_revision = 'b7d25e0f9c14'
+branch_labels = None
+depends_on = None
+
+
+# Rows copied per transaction while the app keeps running
+BATCH_SIZE = 50_000
+
+
+def upgrade() -> None:
+    # Partitioned tables need the partition key in their primary key, so the
+    # rows are copied to a new table with a primary key of (id, submit_ts).
+    # The copy is made in batches, each committed on its own, while the app
+    # keeps using the old table. Completions are only ever inserted, so once
+    # writes are locked out, just before the tables are swapped, the rows the
+    # batches missed are copied.
+    # A copy left behind by an earlier run that failed part way is started over
+    op.execute('DROP TABLE IF EXISTS quiz_completions_partitioned')
+    op.execute('''
+        CREATE TABLE quiz_completions_partitioned (
+            id integer NOT NULL DEFAULT nextval('quiz_completions_id_seq'),
+            quiz_id integer NOT NULL REFERENCES quizzes (id),
+            user_id integer NOT NULL REFERENCES users (id),
+            passed boolean NOT NULL,
+            submit_ts timestamp without time zone NOT NULL DEFAULT now(),
+            responses jsonb NOT NULL DEFAULT '{}'::jsonb,
+            CONSTRAINT quiz_completions_partitioned_pkey PRIMARY KEY (id, submit_ts)
+        ) PARTITION BY RANGE (submit_ts)
+    ''')
+    # A partition per year, from the first completion through next year.
+    # python -m training.database.retention adds the following years.
+    bind = op.get_bind()
+    first_year, last_year = bind.execute(sa.text('''
+        SELECT CAST(extract(year FROM coalesce(min(submit_ts), now())) AS integer), CAST(extract(year FROM now()) AS integer) + 1
+        FROM quiz_completions
+    ''')).one()
+    for year in range(first_year, last_year + 1):
+        op.execute(
+            f"CREATE TABLE quiz_completions_y{year} PARTITION OF quiz_completions_partitioned "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+    op.execute('CREATE TABLE quiz_completions_default PARTITION OF quiz_completions_partitioned DEFAULT')
+
+    copied = bind.execute(sa.text('SELECT coalesce(max(id), 0) FROM quiz_completions')).scalar_one()
+    with op.get_context().autocommit_block():
+        copy_batches(bind, 'quiz_completions', 'quiz_completions_partitioned', copied)
+
+    # Reads carry on, writes wait until the tables are swapped
+    op.execute('LOCK TABLE quiz_completions IN EXCLUSIVE MODE')
+    copy_missing(bind, 'quiz_completions', 'quiz_completions_partitioned')
+
+    # Certificates are listed per user. Built after the copy, which is faster
+    # than keeping it up to date during it.
+    op.execute('CREATE INDEX ix_quiz_completions_partitioned_user_id ON quiz_completions_partitioned (user_id)')
+
+    op.drop_constraint('report_completions_quiz_completion_id_fkey', 'report_completions', type_='foreignkey')
+    op.execute('ALTER SEQUENCE quiz_completions_id_seq OWNED BY quiz_completions_partitioned.id')
+    op.drop_table('quiz_completions')
+    op.rename_table('quiz_completions_partitioned', 'quiz_completions')
+    op.execute('ALTER INDEX quiz_completions_partitioned_pkey RENAME TO quiz_completions_pkey')
+    op.execute('ALTER INDEX ix_quiz_completions_partitioned_user_id RENAME TO ix_quiz_completions_user_id')
+
+    op.create_foreign_key(
+        'report_completions_quiz_completion_fkey', 'report_completions', 'quiz_completions',
+        ['quiz_completion_id', 'submit_ts'], ['id', 'submit_ts']
+    )
+
+    # Where python -m training.database.retention moves old failed attempts
+    op.create_table(
+        'quiz_completions_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('quiz_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('passed', sa.Boolean(), nullable=False),
+        sa.Column('submit_ts', sa.DateTime(), nullable=False),
+        sa.Column('responses', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('archived_on', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def copy_batches(bind, source: str, target: str, through: int, batch_size: int = BATCH_SIZE) -> None:
+    '''
+    Copies the rows with ids up to `through` from `source` to `target`, a
+    batch of ids per statement.
+    '''
+    copy = sa.text(f'''
+        INSERT INTO {target} (id, quiz_id, user_id, passed, submit_ts, responses)
+        SELECT id, quiz_id, user_id, passed, submit_ts, responses FROM {source}
+        WHERE id > :after AND id <= :through
+    ''')
+    for after in range(0, through, batch_size):
+        bind.execute(copy, {"after": after, "through": min(after + batch_size, through)})
+
+
+def copy_missing(bind, source: str, target: str) -> None:
+    '''
+    Copies the rows of `source` that aren't in `target` yet. That's the rows
+    added during the batched copy, including ones whose ids were taken
+    before it started, by transactions that committed after their batch was
+    copied, so the whole table is compared rather than only the higher ids.
+    '''
+    bind.execute(sa.text(f'''
+        INSERT INTO {target} (id, quiz_id, user_id, passed, submit_ts, responses)
+        SELECT id, quiz_id, user_id, passed, submit_ts, responses FROM {source}
+        WHERE NOT EXISTS (SELECT 1 FROM {target} WHERE {target}.id = {source}.id AND {target}.submit_ts = {source}.submit_ts)
+    '''))
+
+
+def downgrade() -> None:
+    op.drop_table('quiz_completions_archive')
+    op.drop_constraint('report_completions_quiz_completion_fkey', 'report_completions', type_='foreignkey')
+    op.rename_table('quiz_completions', 'quiz_completions_partitioned')
+    op.execute('ALTER INDEX quiz_completions_pkey RENAME TO quiz_completions_partitioned_pkey')
+
+    op.execute('''
+        CREATE TABLE quiz_completions (
+            id integer NOT NULL DEFAULT nextval('quiz_completions_id_seq'),
+            quiz_id integer NOT NULL REFERENCES quizzes (id),
+            user_id integer NOT NULL REFERENCES users (id),
+            passed boolean NOT NULL,
+            submit_ts timestamp without time zone NOT NULL DEFAULT now(),
+            responses jsonb NOT NULL DEFAULT '{}'::jsonb,
+            PRIMARY KEY (id)
+        )
+    ''')
+    op.execute('''
+        INSERT INTO quiz_completions (id, quiz_id, user_id, passed, submit_ts, responses)
+        SELECT id, quiz_id, user_id, passed, submit_ts, responses FROM quiz_completions_partitioned
+    ''')
+    op.execute('ALTER SEQUENCE quiz_completions_id_seq OWNED BY quiz_completions.id')
+    # Drops the partitions too
+    op.drop_table('quiz_completions_partitioned')
+
+    op.create_foreign_key(
+        'report_completions_quiz_completion_id_fkey', 'report_completions', 'quiz_completions',
+        ['quiz_completion_id'], ['id']
+    )
@@ -0,0 +1,47 @@
+# gunicorn reads this file on startup, before forking the workers.
+import importlib
+import os
+import shutil
+import tempfile
+
+# Each worker keeps its own metrics. Giving them a shared directory lets
+# /metrics report totals across all of the workers on the instance. Stale
+# files from a previous run are cleared out first. prometheus_client only
+# looks for the directory when it's first imported, so nothing above this
+# may import it.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "training-metrics"))
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+
+# Import the app once in the master process, before forking the workers.
+# The workers start with it already imported, so they boot in milliseconds
+# instead of re-importing everything, and share its memory copy-on-write.
+preload_app = True
+
+# Modules the app imports on first use, loaded in the master as well so the
+# workers don't each import them on their first request
+PRELOAD_MODULES = ("fitz",)
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the workers are forked
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+
+
+def post_fork(server, worker):
+    # Database connections can't be shared between processes. None should be
+    # open before the fork, but a worker mustn't use one of the master's, so
+    # each worker starts with empty pools. close=False leaves the master's
+    # connections, if any, alone.
+    from training.database import async_engine, async_replica_engine, engine, replica_engine
+
+    for db_engine in (engine, replica_engine, async_engine.sync_engine, async_replica_engine.sync_engine):
+        db_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Drop the gauges of workers that exit, so they don't count as live
+    multiprocess.mark_process_dead(worker.pid)
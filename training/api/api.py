@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from training.api.api_v1 import auth, loginless_flow, agencies, users, quizzes, certificates, gspc
+from training.api.api_v1 import auth, loginless_flow, agencies, users, quizzes, certificates, gspc, profiles, reports
 
 api_router = APIRouter()
 
@@ -9,5 +9,7 @@ api_router.include_router(auth.router)
 api_router.include_router(certificates.router)
 api_router.include_router(gspc.router)
 api_router.include_router(loginless_flow.router)
+api_router.include_router(profiles.router)
 api_router.include_router(quizzes.router)
+api_router.include_router(reports.router)
 api_router.include_router(users.router)
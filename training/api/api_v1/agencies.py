@@ -3,15 +3,19 @@ from fastapi import APIRouter, status, HTTPException, Depends
 from training.schemas import Agency
 from training.repositories import AgencyRepository
 from training.api.deps import agency_repository
+from training.api.responses import ModelSerializer
 from training.schemas.agency import AgencyWithBureaus
+from training.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_agencies_with_bureaus = ModelSerializer(List[AgencyWithBureaus])
 
 
 @router.get("/agencies", response_model=List[AgencyWithBureaus])
 def get_agencies(repo: AgencyRepository = Depends(agency_repository)):
-    return repo.get_agencies_with_bureaus()
+    return _agencies_with_bureaus.response(repo.get_agencies_with_bureaus())
 
 
 @router.get("/agencies/{id}", response_model=Agency)
@@ -1,14 +1,14 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-import jwt
-from training.api.auth import UAAJWTUser
+from training.api.auth import UAAJWTUser, encode_jwt
 from training.config import settings
 from training.repositories import UserRepository
 from training.schemas import UserJWT, User
 from training.api.deps import user_repository
+from training.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.get("/auth/metadata")
@@ -43,6 +43,6 @@ def auth_exchange(
         )
 
     jwt_user = UserJWT.model_validate(db_user)
-    encoded_jwt = jwt.encode(jwt_user.model_dump(), settings.JWT_SECRET, algorithm="HS256")
+    encoded_jwt = encode_jwt(jwt_user)
     logging.info(f"Token exchange success for {db_user.email}")
     return {'user': jwt_user, 'jwt': encoded_jwt}
@@ -1,45 +1,49 @@
 from typing import List, Any, Dict
 from fastapi import APIRouter, status, HTTPException, Depends, Response
 from training.schemas import UserCertificate, CertificateType, CertificateListValue
-from training.repositories import CertificateRepository
-from training.api.deps import certificate_repository
+from training.repositories import CertificateRepository, AsyncCertificateRepository
+from training.api.deps import certificate_repository, async_certificate_repository
 from training.services.certificate import Certificate
 from training.api.auth import JWTUser, user_from_form
 from training.api.auth import RequireRole
+from training.api.responses import ModelSerializer
+from training.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_certificate_list = ModelSerializer(List[CertificateListValue])
 
 
 @router.get("/certificates/{userId}", response_model=List[CertificateListValue])
-def get_certificates_by_userId(
+async def get_certificates_by_userId(
     userId: int,
     user=Depends(RequireRole(["Admin"])),
-    repo: CertificateRepository = Depends(certificate_repository),
+    repo: AsyncCertificateRepository = Depends(async_certificate_repository),
 ):
     '''
     Returns a list of certificates for `userId`
     '''
-    db_user_certificates = repo.get_all_certificates_by_userId(userId)
+    db_user_certificates = await repo.get_all_certificates_by_userId(userId)
 
     if db_user_certificates is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    return db_user_certificates
+    return _certificate_list.response(db_user_certificates)
 
 
 @router.get("/certificates/", response_model=List[CertificateListValue])
-def get_certificates_by_user(
-    repo: CertificateRepository = Depends(certificate_repository),
+async def get_certificates_by_user(
+    repo: AsyncCertificateRepository = Depends(async_certificate_repository),
     user: dict[str, Any] = Depends(JWTUser())
 ):
     '''
     Returns a list of certificates for current `user`
     '''
-    db_user_certificates = repo.get_all_certificates_by_userId(user["id"])
+    db_user_certificates = await repo.get_all_certificates_by_userId(user["id"])
 
     if db_user_certificates is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    return db_user_certificates
+    return _certificate_list.response(db_user_certificates)
 
 
 @router.post("/certificate/{certType}/{id}", response_model=UserCertificate)
@@ -3,20 +3,24 @@ import logging
 import csv
 from io import StringIO
 from fastapi import APIRouter, status, HTTPException, Response, Depends
+from redis.exceptions import RedisError
 from training.schemas import GspcInvite, GspcResult, GspcSubmission
 from training.services import GspcService
 from training.repositories import GspcInviteRepository, GspcCompletionRepository
 from training.api.deps import gspc_invite_repository, gspc_completion_repository, gspc_service
 from training.api.email import send_gspc_invite_email
 from training.api.auth import RequireRole
+from training.api.rate_limit import RateLimit, check_rate_limit
 from training.config import settings
 from training.api.auth import JWTUser
+from training.api.idempotency import Idempotent, IdempotentRequest
+from training.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
-@router.post("/gspc-invite")
+@router.post("/gspc-invite", dependencies=[Depends(RateLimit("gspc-invite"))])
 async def gspc_admin_invite(
     gspcInvite: GspcInvite,
     repo: GspcInviteRepository = Depends(gspc_invite_repository),
@@ -25,21 +29,25 @@ async def gspc_admin_invite(
     '''
     Given a list of emails we parse them into two list (valid and invalid).
     Then we log each of the valid emails to the db and shoot of an email to each.
+    The number of emails each admin can invite is rate limited.
     '''
     try:
         # Parse emails string into valid and invalid email list
         gspcInvite.parse()
 
-        for email in gspcInvite.valid_emails:
-            repo.create(email=email, certification_expiration_date=gspcInvite.certification_expiration_date)
-            # If performance becomes an issue use multithreading to send the emails
-            try:
-                params = gspcInvite.certification_expiration_date.strftime('%Y-%m-%d')
-                link = f"{settings.BASE_URL}/gspc_registration/?expirationDate={params}"
-                send_gspc_invite_email(to_email=email, link=link)
-                logging.info(f"Sent gspc invite email to {email}")
-            except Exception as e:
-                logging.error("Error sending gspc invite email", e)
+        if gspcInvite.valid_emails:
+            await check_rate_limit("gspc-invite:user", user["email"], cost=len(gspcInvite.valid_emails))
+
+        repo.create_many(emails=gspcInvite.valid_emails, certification_expiration_date=gspcInvite.certification_expiration_date)
+
+        # Sent by the worker, which retries the ones that fail
+        params = gspcInvite.certification_expiration_date.strftime('%Y-%m-%d')
+        link = f"{settings.BASE_URL}/gspc_registration/?expirationDate={params}"
+        try:
+            send_gspc_invite_email.delay_many([(email, link) for email in gspcInvite.valid_emails])
+            logging.info(f"Queued {len(gspcInvite.valid_emails)} gspc invite emails")
+        except RedisError as e:
+            logging.error(f"Error queueing gspc invite emails: {e}")
 
         # Return object with both list for success and failure messages
         return gspcInvite
@@ -58,9 +66,15 @@ async def gspc_admin_invite(
 def submit_gspc_registration(
     submission: GspcSubmission,
     gspc_service: GspcService = Depends(gspc_service),
-    user: dict[str, Any] = Depends(JWTUser())
+    user: dict[str, Any] = Depends(JWTUser()),
+    idempotency: IdempotentRequest = Depends(Idempotent("gspc-submission"))
 ):
+    '''
+    Grades the submission. With an Idempotency-Key header, repeats of the
+    submission get the first result instead of being graded again.
+    '''
     result = gspc_service.grade(user_id=user["id"], submission=submission)
+    idempotency.complete(status.HTTP_201_CREATED, result)
     return result
 
 
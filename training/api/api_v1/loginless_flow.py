@@ -1,17 +1,20 @@
 import logging
-import jwt
 from typing import Union
 
 from fastapi import APIRouter, status, Response, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from training.schemas import TempUser, IncompleteTempUser, WebDestination, UserJWT
 from training.data import UserCache
-from training.repositories import UserRepository
-from training.api.deps import user_repository
+from training.repositories import AsyncUserRepository
+from training.api.deps import async_user_repository
+from training.api.auth import encode_jwt
+from training.api.rate_limit import RateLimit, check_rate_limit
 
 from training.config import settings
 from training.api.email import send_email
+from training.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 def page_lookup():
@@ -35,15 +38,17 @@ def page_lookup():
 
 @router.post("/get-link",
              status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(RateLimit("get-link"))],
              responses={
                  200: {"description": 'OK, but user details needed'},
-                 201: {"description": "Token created"}
+                 201: {"description": "Token created"},
+                 429: {"description": "Too many links requested"}
                  })
-def send_link(
+async def send_link(
     response: Response,
     user: Union[TempUser, IncompleteTempUser],
     dest: WebDestination,
-    repo: UserRepository = Depends(user_repository),
+    repo: AsyncUserRepository = Depends(async_user_repository),
     cache: UserCache = Depends(UserCache),
     page_id_lookup: dict = Depends(page_lookup)
 ):
@@ -67,6 +72,8 @@ def send_link(
 
     Parameters needed for the generated link can be passed in through the WebDestination
     object and will concatenated with the user token and added to the link.
+
+    The links sent to each email, and the requests from each IP, are rate limited.
     '''
     try:
         required_roles = page_id_lookup[dest.page_id]['required_roles']
@@ -77,7 +84,7 @@ def send_link(
         )
     if isinstance(user, IncompleteTempUser):
         # we only got the email from the front end
-        user_from_db = repo.find_by_email(user.email)
+        user_from_db = await repo.find_by_email(user.email)
         if user_from_db is None:
             response.status_code = status.HTTP_200_OK
             return {'new': True}
@@ -101,8 +108,10 @@ def send_link(
                 "email": user_from_db.email,
                 "agency_id": user_from_db.agency_id,
             })
+    await check_rate_limit("get-link:email", user.email)
     try:
-        token = cache.set(user)
+        # Redis and SMTP clients are blocking, keep them off the event loop
+        token = await run_in_threadpool(cache.set, user)
     except Exception as e:
         logging.error("Error saving user to Redis", e)
         raise HTTPException(
@@ -113,7 +122,7 @@ def send_link(
     parameters = f"t={token}" if not dest.parameters else f"{dest.parameters}&t={token}"
     url = f"{settings.BASE_URL}{path}?{parameters}"
     try:
-        send_email(to_email=user.email, name=user.name, link=url, training_title=dest.title)
+        await run_in_threadpool(send_email, to_email=user.email, name=user.name, link=url, training_title=dest.title)
         logging.info(f"Sent confirmation email to {user.email} for {path}")
     except Exception as e:
         logging.error("Error sending mail", e)
@@ -126,7 +135,7 @@ def send_link(
 @router.get("/get-user/{token}")
 async def get_user(
     token: str,
-    repo: UserRepository = Depends(user_repository),
+    repo: AsyncUserRepository = Depends(async_user_repository),
     cache: UserCache = Depends(UserCache)
 ):
     '''
@@ -136,7 +145,7 @@ async def get_user(
     can use to authenticate.
     '''
     try:
-        user = cache.get(token)
+        user = await run_in_threadpool(cache.get, token)
     except Exception as e:
         logging.error("Error reading token from Redis", e)
         raise HTTPException(
@@ -147,10 +156,10 @@ async def get_user(
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
-    db_user = repo.find_by_email(user.email)
+    db_user = await repo.find_by_email(user.email)
     if not db_user:
-        db_user = repo.create(user)
+        db_user = await repo.create(user)
     user_return = UserJWT.model_validate(db_user)
     logging.info(f"Confirmed email token for {user.email}")
-    encoded_jwt = jwt.encode(user_return.model_dump(), settings.JWT_SECRET, algorithm="HS256")
+    encoded_jwt = encode_jwt(user_return)
     return {'user': user_return, 'jwt': encoded_jwt}
@@ -0,0 +1,40 @@
+from typing import Literal
+from fastapi import APIRouter, status, HTTPException, Response, Depends
+from training.api.auth import RequireRole
+from training.data import ProfileStore
+from training.profiling import ProfiledRoute
+from training.schemas import RequestProfile
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/profiles", response_model=list[RequestProfile])
+def get_profiles(
+    store: ProfileStore = Depends(ProfileStore),
+    user=Depends(RequireRole(["Admin"]))
+):
+    '''
+    Lists the request profiles that have been captured, newest first.
+    '''
+    return store.list()
+
+
+@router.get("/profiles/{id}")
+def download_profile(
+    id: str,
+    format: Literal["prof", "text"] = "prof",
+    store: ProfileStore = Depends(ProfileStore),
+    user=Depends(RequireRole(["Admin"]))
+):
+    '''
+    Downloads a request profile, either as a cProfile dump that can be opened
+    with pstats or snakeviz, or as a text report sorted by cumulative time.
+    '''
+    profile = store.get(id, format)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if format == "text":
+        return Response(profile, media_type="text/plain")
+    headers = {'Content-Disposition': f'attachment; filename="profile-{id}.prof"'}
+    return Response(profile, headers=headers, media_type="application/octet-stream")
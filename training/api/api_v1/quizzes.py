@@ -1,14 +1,19 @@
 from typing import Any
 from fastapi import APIRouter, status, HTTPException, Depends
-from training.api.auth import JWTUser
+from training.api.auth import JWTUser, RequireRole
+from training.api.idempotency import Idempotent, IdempotentRequest
+from training.api.responses import ModelSerializer
 from training.errors import IncompleteQuizResponseError, QuizNotFoundError
-from training.schemas import QuizPublic, QuizGrade, QuizSubmission  # , Quiz,  QuizCreate
-from training.repositories import QuizRepository
+from training.schemas import QuizAnalysis, QuizPublic, QuizGrade, QuizSubmission  # , Quiz,  QuizCreate
+from training.repositories import AsyncQuizRepository, QuizAnalysisRepository  # , QuizRepository
 from training.services import QuizService
-from training.api.deps import quiz_repository, quiz_service
+from training.api.deps import async_quiz_repository, quiz_analysis_repository, quiz_service  # , quiz_repository
+from training.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_quizzes = ModelSerializer(list[QuizPublic])
 
 ''' disable quiz creation for security
 @router.post("/quizzes", response_model=Quiz, status_code=status.HTTP_201_CREATED)
@@ -19,11 +24,11 @@ def create_quiz(quiz: QuizCreate, repo: QuizRepository = Depends(quiz_repository
 
 
 @router.get("/quizzes", response_model=list[QuizPublic])
-def get_quizzes(
+async def get_quizzes(
     topic: str | None = None,
     audience: str | None = None,
     active: bool | None = None,
-    repo: QuizRepository = Depends(quiz_repository)
+    repo: AsyncQuizRepository = Depends(async_quiz_repository)
 ):
     filters = {}
     if topic is not None:
@@ -32,12 +37,12 @@ def get_quizzes(
         filters["audience"] = audience
     if active is not None:
         filters["active"] = active
-    return repo.find_all(filters=filters)
+    return _quizzes.response(await repo.find_all(filters=filters))
 
 
 @router.get("/quizzes/{id}", response_model=QuizPublic)
-def get_quiz(id: int, repo: QuizRepository = Depends(quiz_repository)):
-    quiz = repo.find_by_id(id)
+async def get_quiz(id: int, repo: AsyncQuizRepository = Depends(async_quiz_repository)):
+    quiz = await repo.find_by_id(id)
     if quiz is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     return quiz
@@ -48,14 +53,19 @@ def get_quiz(id: int, repo: QuizRepository = Depends(quiz_repository)):
     response_model=QuizGrade,
     status_code=status.HTTP_201_CREATED
 )
-def submit_quiz(
+async def submit_quiz(
     id: int,
     submission: QuizSubmission,
     quiz_service: QuizService = Depends(quiz_service),
-    user: dict[str, Any] = Depends(JWTUser())
+    user: dict[str, Any] = Depends(JWTUser()),
+    idempotency: IdempotentRequest = Depends(Idempotent("quiz-submission"))
 ):
+    '''
+    Grades the submission. With an Idempotency-Key header, repeats of the
+    submission get the first grade instead of being graded again.
+    '''
     try:
-        grade = quiz_service.grade(quiz_id=id, user_id=user["id"], submission=submission)
+        grade = await quiz_service.grade(quiz_id=id, user_id=user["id"], submission=submission)
     except QuizNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -66,4 +76,22 @@ def submit_quiz(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"No response(s) given for question ID(s): {err.missing_responses}"
         )
+    idempotency.complete(status.HTTP_201_CREATED, grade)
     return grade
+
+
+@router.get("/quizzes/{id}/analysis", response_model=QuizAnalysis)
+def get_quiz_analysis(
+    id: int,
+    repo: QuizAnalysisRepository = Depends(quiz_analysis_repository),
+    user=Depends(RequireRole(["Admin"]))
+):
+    '''
+    Item analysis of the quiz for each version of its content: the pass rate,
+    each question's difficulty (the share of correct responses) and how
+    often each choice was selected.
+    '''
+    analysis = repo.get_analysis(id)
+    if analysis is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return analysis
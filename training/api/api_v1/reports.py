@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Annotated
+from fastapi import APIRouter, status, HTTPException, Depends, Query
+from training.api.auth import RequireRole
+from training.api.deps import replica_user_repository
+from training.repositories import UserRepository
+from training.schemas import QuizCompletionSummaryData, SmartPayTrainingReportFilter
+from training.profiling import ProfiledRoute
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/reports/summary", response_model=list[QuizCompletionSummaryData])
+def get_report_summary(
+        agency_id: int | None = None,
+        bureau_id: int | None = None,
+        completion_date_start: datetime | None = None,
+        completion_date_end: datetime | None = None,
+        quiz_names: Annotated[list[str] | None, Query()] = None,
+        repo: UserRepository = Depends(replica_user_repository),
+        user=Depends(RequireRole(["Report"]))
+):
+    '''
+    Returns the number of passed quiz completions per agency, bureau, quiz and
+    month for the agencies the user can report on, filtered like the training
+    report download. Completion dates are rounded to their month.
+    '''
+    filter_info = SmartPayTrainingReportFilter(
+        agency_id=agency_id,
+        bureau_id=bureau_id,
+        completion_date_start=completion_date_start,
+        completion_date_end=completion_date_end,
+        quiz_names=quiz_names
+    )
+    try:
+        return repo.get_user_quiz_completion_summary(filter_info, user['id'])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unable to process"
+        )
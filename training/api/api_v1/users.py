@@ -5,11 +5,15 @@ from training.api.auth import RequireRole
 from fastapi import APIRouter, status, HTTPException, Response, Depends, Query
 from training.schemas import User, UserCreate, UserSearchResult, UserUpdate, SmartPayTrainingReportFilter
 from training.repositories import UserRepository
-from training.api.deps import user_repository
+from training.api.deps import user_repository, report_user_repository
+from training.api.responses import ModelSerializer
+from training.profiling import ProfiledRoute
 from typing import Annotated
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_user_search_result = ModelSerializer(UserSearchResult)
 
 
 @router.post("/users", response_model=User, status_code=status.HTTP_201_CREATED)
@@ -50,7 +54,7 @@ def edit_user_for_reporting(
 @router.post("/users/download-smartpay-training-report")
 def download_smartpay_training_report_csv(
         filter_info: SmartPayTrainingReportFilter,
-        repo: UserRepository = Depends(user_repository),
+        repo: UserRepository = Depends(report_user_repository),
         user=Depends(RequireRole(["Report"]))
 ):
     '''
@@ -83,7 +87,7 @@ def download_smartpay_training_report_csv(
 @router.post("/users/download-admin-smartpay-training-report")
 def download_admin_smartpay_training_report_csv(
     filter_info: SmartPayTrainingReportFilter,
-    repo: UserRepository = Depends(user_repository),
+    repo: UserRepository = Depends(report_user_repository),
     user=Depends(RequireRole(["Admin"])
                  )):
     '''
@@ -123,7 +127,7 @@ def get_users(
     page_number param is used to support UI pagination functionality.
     It returns UserSearchResult object with a list of users and total_count used for UI pagination
     '''
-    return repo.get_users(searchText, page_number)
+    return _user_search_result.response(repo.get_users(searchText, page_number))
 
 
 @router.get("/users/{user_id}", response_model=User)
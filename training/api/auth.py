@@ -1,5 +1,11 @@
+import hashlib
 import json
-from typing import Annotated
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Annotated, Any
 from urllib.request import urlopen
 
 from fastapi import Request, HTTPException, Depends, status
@@ -7,7 +13,123 @@ from fastapi import Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from jwt.exceptions import InvalidTokenError
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
 from training.config import settings
+from training.data import UserProfileCache
+from training.database import AsyncSessionLocal, async_checkout
+from training.repositories import AsyncUserRepository
+from training.schemas import UserJWT
+from training.tracing import traced
+
+# The version of the claims in the JWTs we issue. Version 2 tokens only carry
+# the user's id and roles, and the rest of the user is looked up with
+# `load_profile`. They expire after JWT_TTL seconds. Tokens without a version
+# carry the whole UserJWT and never expire, so they're only accepted until
+# LEGACY_JWT_ACCEPTED_UNTIL.
+JWT_VERSION = 2
+
+
+class TokenCache:
+    '''
+    A bounded LRU cache of the claims of tokens that passed verification, so
+    a client sending the same token with each request only has its signature
+    checked once. Tokens are keyed by their SHA-256 hash rather than kept in
+    the cache, and one whose `exp` has passed is dropped instead of returned.
+    '''
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._claims: OrderedDict[bytes, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            claims = self._claims.get(key)
+            if claims is None:
+                return None
+            if "exp" in claims and claims["exp"] <= time.time():
+                del self._claims[key]
+                return None
+            self._claims.move_to_end(key)
+        return dict(claims)
+
+    def set(self, token: str, claims: dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._claims[key] = dict(claims)
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.maxsize:
+                self._claims.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._claims.clear()
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+
+token_cache = TokenCache(settings.JWT_CACHE_SIZE)
+
+
+def decode_token(token: str) -> dict[str, Any] | None:
+    '''
+    Returns the claims of a JWT issued by our API, or None if it's invalid or
+    expired. Verified tokens are cached in `token_cache`.
+    '''
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+        except InvalidTokenError:
+            return None
+        token_cache.set(token, claims)
+    if "ver" not in claims and _legacy_tokens_expired():
+        return None
+    return claims
+
+
+def _legacy_tokens_expired() -> bool:
+    cutoff = settings.LEGACY_JWT_ACCEPTED_UNTIL
+    return cutoff is not None and time.time() >= cutoff.timestamp()
+
+
+def encode_jwt(user: UserJWT) -> str:
+    now = int(time.time())
+    claims = {"id": user.id, "roles": user.roles, "ver": JWT_VERSION, "iat": now, "exp": now + settings.JWT_TTL}
+    return jwt.encode(claims, settings.JWT_SECRET, algorithm="HS256")
+
+
+async def load_profile(user_id: int) -> dict[str, Any] | None:
+    '''
+    Returns the user as a UserJWT dict from the profile cache, or from the
+    database if it's not cached, or None if there's no such user. If Redis
+    can't be reached the database is used.
+    '''
+    cache = UserProfileCache()
+    try:
+        profile = await run_in_threadpool(cache.get, user_id)
+    except RedisError as e:
+        logging.error(f"Error reading the cached profile of user {user_id}: {e}")
+        profile = None
+    if profile is not None:
+        return profile
+
+    async with AsyncSessionLocal() as session:
+        await async_checkout(session)
+        db_user = await AsyncUserRepository(session).find_by_id(user_id)
+        if db_user is None:
+            return None
+        user = UserJWT.model_validate(db_user)
+    try:
+        await run_in_threadpool(cache.set, user)
+    except RedisError as e:
+        logging.error(f"Error caching the profile of user {user_id}: {e}")
+    return user.model_dump()
 
 
 class JWTUser(HTTPBearer):
@@ -18,25 +140,37 @@ class JWTUser(HTTPBearer):
     @router.get("/somepath", response_model=SomeModel)
     def my_function( user: dict[str, Any] = Depends(JWTUser())):
 
-    to generate a user with a valid token.
+    to generate a user with a valid token. The user's profile is looked up
+    for compact tokens, with their roles taken from the token. The user is
+    kept on the request's state, so the other dependencies of the route that
+    need it, like RequireRole, don't decode the token again.
 
     '''
 
     async def __call__(self, request: Request):
+        user = getattr(request.state, "jwt_user", None)
+        if user is not None:
+            return user
+
         # The parent HTTPBearer default's to raising an error if there is
         # no authentication or the authentication schema is not bearer
         credentials: HTTPAuthorizationCredentials | None = await super().__call__(request)
 
-        user = self.decode_jwt(credentials.credentials)
-        if user is None:
+        claims = self.decode_jwt(credentials.credentials)
+        if claims is None:
             raise HTTPException(status_code=403, detail="Invalid or expired token.")
+        if "ver" not in claims:
+            user = claims
+        else:
+            profile = await load_profile(claims["id"])
+            if profile is None:
+                raise HTTPException(status_code=403, detail="Invalid or expired token.")
+            user = {**profile, "id": claims["id"], "roles": claims["roles"]}
+        request.state.jwt_user = user
         return user
 
     def decode_jwt(self, token: str):
-        try:
-            return jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-        except InvalidTokenError:
-            return
+        return decode_token(token)
 
 
 class UAAJWTUser(HTTPBearer):
@@ -73,6 +207,7 @@ class UAAJWTUser(HTTPBearer):
         except InvalidTokenError:
             return
 
+    @traced()
     def get_jwks(self):
         # Get a list of JSON Web Keys from the OIDC server.
 
@@ -106,6 +241,7 @@ class UAAJWTUser(HTTPBearer):
 
         return keys
 
+    @traced()
     def discover_jwks_endpoint(self) -> str:
         # Use the OIDC Discovery endpoint to get the location of the JSON Web
         # Key Set (JWKS) data.
@@ -152,6 +288,28 @@ class RequireRole:
             raise HTTPException(status_code=401, detail="Not Authorized")
 
 
+class MetricsReader(HTTPBearer):
+    '''
+    Used for the /metrics endpoint. Accepts the METRICS_TOKEN setting as a
+    bearer token, so Prometheus can scrape with a static credential, or the
+    JWT of a user with the `Admin` role.
+    '''
+
+    async def __call__(self, request: Request):
+        credentials: HTTPAuthorizationCredentials | None = await super().__call__(request)
+        token = credentials.credentials
+
+        if settings.METRICS_TOKEN and secrets.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return {"name": "metrics"}
+
+        user = JWTUser().decode_jwt(token)
+        if user is None:
+            raise HTTPException(status_code=403, detail="Invalid or expired token.")
+        if "Admin" not in user.get("roles", []):
+            raise HTTPException(status_code=401, detail="Not Authorized")
+        return user
+
+
 def user_from_form(jwtToken: Annotated[str, Form()]):
     '''
     This allows POST requests to send a token as part of form-encoded request.
@@ -159,9 +317,10 @@ def user_from_form(jwtToken: Annotated[str, Form()]):
     need to authenticate the user. We cannot pass a JWT with a simple html <a>, so instead
     use a form to POST the request. The form can then include the JWT as in input. This
     function is used to decode and validate the JWT in that case. See: "/certificate/{certType}/{id}"
-    for an example.
+    for an example. It returns the token's claims, which include the user's id and roles,
+    without looking up the rest of the profile.
     '''
-    try:
-        return jwt.decode(jwtToken, settings.JWT_SECRET, algorithms=["HS256"])
-    except jwt.exceptions.InvalidTokenError:
+    user = decode_token(jwtToken)
+    if user is None:
         raise HTTPException(status_code=401, detail="Not Authorized")
+    return user
@@ -1,29 +1,91 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager
 from fastapi import Depends
-from training.repositories import AgencyRepository, UserRepository, QuizRepository, CertificateRepository, GspcInviteRepository, GspcCompletionRepository
+from training.repositories import (AgencyRepository, UserRepository, QuizRepository, CertificateRepository, GspcInviteRepository,
+                                   GspcCompletionRepository, AsyncUserRepository, AsyncQuizRepository, AsyncCertificateRepository,
+                                   QuizAnalysisRepository)
 from training.services import QuizService, GspcService
-from training.database import SessionLocal
-from sqlalchemy.orm import Session
+from training.database import (SessionLocal, ReplicaSessionLocal, checkout, AsyncSessionLocal, AsyncReplicaSessionLocal,
+                               async_checkout)
+from training.config import settings
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 import logging
 
 
 def db() -> Generator[Session, None, None]:
     '''
     Provides a database session that automatically rolls back upon an
-    Exception.
+    Exception. Statements use the default (interactive) statement timeout.
     '''
-    session: Session = SessionLocal()
+    yield from _session()
+
+
+def replica_db() -> Generator[Session, None, None]:
+    '''
+    Provides a database session on the read replica, if one is configured,
+    for read-only routes that can tolerate replication lag.
+    '''
+    yield from _session(ReplicaSessionLocal)
+
+
+def report_db() -> Generator[Session, None, None]:
+    '''
+    Provides a read replica session for report downloads, which are allowed a
+    longer statement timeout than interactive routes.
+    '''
+    yield from _session(ReplicaSessionLocal, statement_timeout=settings.DB_REPORT_STATEMENT_TIMEOUT)
+
+
+def _session(session_factory: sessionmaker = SessionLocal, statement_timeout: int | None = None) -> Generator[Session, None, None]:
+    session: Session = session_factory()
     try:
-        yield session
-        session.commit()
-    except Exception as e:
-        logging.error(f"Error in DB session: {e}")
-        session.rollback()
+        # Raises if no connection is available within DB_POOL_TIMEOUT
+        checkout(session, statement_timeout)
+        try:
+            yield session
+            session.commit()
+        except Exception as e:
+            logging.error(f"Error in DB session: {e}")
+            session.rollback()
     finally:
         session.close()
 
 
-def agency_repository(db: Session = Depends(db)) -> AgencyRepository:
+async def async_db() -> AsyncGenerator[AsyncSession, None]:
+    '''
+    The asyncio counterpart of `db`, for routes that run on the event loop
+    rather than in the threadpool.
+    '''
+    async with _async_session(AsyncSessionLocal) as session:
+        yield session
+
+
+async def async_replica_db() -> AsyncGenerator[AsyncSession, None]:
+    '''
+    The asyncio counterpart of `replica_db`.
+    '''
+    async with _async_session(AsyncReplicaSessionLocal) as session:
+        yield session
+
+
+@asynccontextmanager
+async def _async_session(session_factory: async_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    session: AsyncSession = session_factory()
+    try:
+        await async_checkout(session)
+        try:
+            yield session
+            await session.commit()
+        except Exception as e:
+            logging.error(f"Error in DB session: {e}")
+            await session.rollback()
+    finally:
+        await session.close()
+
+
+def agency_repository(db: Session = Depends(replica_db)) -> AgencyRepository:
+    # Agencies are only read through the API
     return AgencyRepository(db)
 
 
@@ -31,25 +93,55 @@ def user_repository(db: Session = Depends(db)) -> UserRepository:
     return UserRepository(db)
 
 
+def replica_user_repository(db: Session = Depends(replica_db)) -> UserRepository:
+    # For the report summary, which only reads the summary counters
+    return UserRepository(db)
+
+
+def report_user_repository(db: Session = Depends(report_db)) -> UserRepository:
+    return UserRepository(db)
+
+
+def async_user_repository(db: AsyncSession = Depends(async_db)) -> AsyncUserRepository:
+    return AsyncUserRepository(db)
+
+
 def quiz_repository(db: Session = Depends(db)) -> QuizRepository:
     return QuizRepository(db)
 
 
-def quiz_service(db: Session = Depends(db)) -> QuizService:
-    return QuizService(db)
+def async_quiz_repository(db: AsyncSession = Depends(async_replica_db)) -> AsyncQuizRepository:
+    # Quizzes are only read through the API
+    return AsyncQuizRepository(db)
+
+
+def quiz_analysis_repository(db: Session = Depends(replica_db)) -> QuizAnalysisRepository:
+    # The item analysis is only read through the API
+    return QuizAnalysisRepository(db)
+
+
+def quiz_service(db: AsyncSession = Depends(async_db)) -> QuizService:
+    return QuizService(db, queue_emails=True)
 
 
 def certificate_repository(db: Session = Depends(db)) -> CertificateRepository:
     return CertificateRepository(db)
 
 
+def async_certificate_repository(db: AsyncSession = Depends(async_replica_db)) -> AsyncCertificateRepository:
+    # For certificate listings. Downloads use the primary, since users
+    # download a certificate right after it is created.
+    return AsyncCertificateRepository(db)
+
+
 def gspc_invite_repository(db: Session = Depends(db)) -> GspcInviteRepository:
     return GspcInviteRepository(db)
 
 
-def gspc_completion_repository(db: Session = Depends(db)) -> GspcCompletionRepository:
+def gspc_completion_repository(db: Session = Depends(report_db)) -> GspcCompletionRepository:
+    # Only used for the GSPC completion report
     return GspcCompletionRepository(db)
 
 
 def gspc_service(db: Session = Depends(db)) -> GspcService:
-    return GspcService(db)
+    return GspcService(db, queue_emails=True)
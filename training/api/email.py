@@ -5,6 +5,9 @@ from email.message import EmailMessage
 
 from training.config import settings
 from training.errors import SendEmailError
+from training.metrics import EMAILS_SENT, count_outcome
+from training.tracing import traced
+from training.tasks import task
 
 # We also use jinja template.
 # See: https://sabuhish.github.io/fastapi-mail/example/#using-jinja2-html-templates
@@ -50,6 +53,7 @@ If you have any questions or need further assistance, email us at <a href="mailt
 
 
 # Todo move email function from quiz.py and turn this into a service so that it can be mocked
+@traced()
 def send_email(to_email: EmailStr, name: str, link: str, training_title: str) -> None:
     # Todo clean this up
     mailto = "gsa_smartpay@gsa.gov"
@@ -75,7 +79,7 @@ def send_email(to_email: EmailStr, name: str, link: str, training_title: str) ->
     message["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
     message["To"] = to_email
 
-    with SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
+    with count_outcome(EMAILS_SENT, email="link"), SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
         smtp.starttls()
         if settings.SMTP_USER and settings.SMTP_PASSWORD:
             smtp.login(user=settings.SMTP_USER, password=settings.SMTP_PASSWORD)
@@ -87,6 +91,8 @@ def send_email(to_email: EmailStr, name: str, link: str, training_title: str) ->
             smtp.quit()
 
 
+@task("email")
+@traced()
 def send_gspc_invite_email(to_email: EmailStr, link: str) -> None:
     body = GSPC_INVITE_EMAIL_TEMPLATE.substitute({"link": link})
     message = EmailMessage()
@@ -95,7 +101,7 @@ def send_gspc_invite_email(to_email: EmailStr, link: str) -> None:
     message["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
     message["To"] = to_email
 
-    with SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
+    with count_outcome(EMAILS_SENT, email="gspc_invite"), SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
         smtp.starttls()
         if settings.SMTP_USER and settings.SMTP_PASSWORD:
             smtp.login(user=settings.SMTP_USER, password=settings.SMTP_PASSWORD)
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+from training.api.auth import JWTUser
+from training.config import settings
+from training.data import IdempotencyStore
+
+HEADER = "Idempotency-Key"
+
+
+class IdempotentRequest:
+    '''
+    The request's claim on its Idempotency-Key. The route calls `complete`
+    with its response, which is then stored for repeats of the request.
+    '''
+
+    def __init__(self, key: str | None = None, fingerprint: str | None = None, token: str | None = None):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.token = token
+        self.response: tuple[int, Any] | None = None
+
+    def complete(self, status_code: int, body: Any) -> None:
+        self.response = (status_code, jsonable_encoder(body))
+
+
+class ReplayedResponse(Exception):
+    def __init__(self, status_code: int, body: Any):
+        self.status_code = status_code
+        self.body = body
+
+
+async def replayed_response_handler(request: Request, exc: ReplayedResponse) -> JSONResponse:
+    return JSONResponse(exc.body, status_code=exc.status_code, headers={"Idempotent-Replayed": "true"})
+
+
+class Idempotent:
+    '''
+    Makes a route process each Idempotency-Key sent by a user once, so a
+    double-click or a client retry doesn't repeat its work. Repeats get the
+    first response, and one sent while the first is still being processed
+    waits for it. Requests without the header are processed as usual, as
+    are all requests if Redis can't be reached. It can be used as a
+    dependency in FastAPI routes like:
+
+    @router.post("/somepath")
+    def my_function(idempotency: IdempotentRequest = Depends(Idempotent("somepath"))):
+        ...
+        idempotency.complete(status.HTTP_201_CREATED, result)
+        return result
+    '''
+
+    def __init__(self, scope: str):
+        self.scope = scope
+
+    async def __call__(self, request: Request, user=Depends(JWTUser())) -> AsyncGenerator[IdempotentRequest, None]:
+        header = request.headers.get(HEADER)
+        if header is None:
+            yield IdempotentRequest()
+            return
+        if not 0 < len(header) <= 255:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{HEADER} must be 1 to 255 characters")
+
+        key = f"{self.scope}:{user['id']}:{header}"
+        fingerprint = hashlib.sha256(f"{request.method} {request.url.path} ".encode() + await request.body()).hexdigest()
+        store = IdempotencyStore()
+        try:
+            token = await self._claim(store, key, fingerprint)
+        except RedisError as e:
+            logging.error(f"Error claiming {HEADER}, processing the request without it: {e}")
+            yield IdempotentRequest()
+            return
+
+        idempotent_request = IdempotentRequest(key, fingerprint, token)
+        try:
+            yield idempotent_request
+        finally:
+            try:
+                if idempotent_request.response is not None:
+                    await run_in_threadpool(store.save, key, fingerprint, *idempotent_request.response)
+                else:
+                    await run_in_threadpool(store.release, key, fingerprint, token)
+            except RedisError as e:
+                logging.error(f"Error saving the response for {HEADER}: {e}")
+
+    async def _claim(self, store: IdempotencyStore, key: str, fingerprint: str) -> str:
+        '''
+        Returns the token of the claim on `key`, or raises ReplayedResponse
+        with the response to an earlier request with the key.
+        '''
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        while True:
+            token, record = await run_in_threadpool(store.claim, key, fingerprint)
+            if token is not None:
+                return token
+            if record is None:
+                # The earlier request failed and released the key
+                continue
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{HEADER} was already used for a different request"
+                )
+            if record["state"] == "done":
+                raise ReplayedResponse(record["status_code"], record["body"])
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"A request with this {HEADER} is still being processed"
+                )
+            await asyncio.sleep(0.1)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from training.api.auth import MetricsReader
+from training.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(user=Depends(MetricsReader())):
+    '''
+    Returns the request, database pool, Redis, SMTP, PDF and grading metrics
+    in the Prometheus text format.
+    '''
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,69 @@
+import logging
+import math
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+from training.config import settings
+from training.data import RateLimiter
+from training.metrics import RATE_LIMITED
+
+
+class RateLimit:
+    '''
+    Limits how often each client IP can call a route, with the limit named
+    `<name>:ip` in the RATE_LIMITS setting. It can be used as a dependency
+    in FastAPI routes like:
+
+    @router.post("/somepath", dependencies=[Depends(RateLimit("somepath"))])
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def __call__(self, request: Request) -> None:
+        await check_rate_limit(f"{self.name}:ip", client_ip(request))
+
+
+async def check_rate_limit(name: str, key: str, cost: int = 1) -> None:
+    '''
+    Counts `cost` requests against the limit `name` of the RATE_LIMITS
+    setting for `key`, raising a 429 if it's over the limit. If Redis can't
+    be reached the request is allowed.
+    '''
+    limit = settings.RATE_LIMITS.get(name)
+    if limit is None:
+        return
+    requests, period = limit
+    if cost > requests:
+        RATE_LIMITED.labels(limit=name).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"No more than {requests} at a time"
+        )
+
+    try:
+        retry_after = await run_in_threadpool(RateLimiter().hit, name, key.lower(), requests, period, cost)
+    except RedisError as e:
+        logging.error(f"Error checking rate limit {name}: {e}")
+        return
+    if retry_after:
+        RATE_LIMITED.labels(limit=name).inc()
+        logging.info(f"Rate limit {name} reached for {key}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+
+def client_ip(request: Request) -> str:
+    '''
+    The client's IP: the address that the first of the TRUSTED_PROXY_COUNT
+    proxies added to X-Forwarded-For, since anything before it could have
+    been sent by the client.
+    '''
+    forwarded_for = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",") if address.strip()]
+    if settings.TRUSTED_PROXY_COUNT and forwarded_for:
+        return forwarded_for[-min(settings.TRUSTED_PROXY_COUNT, len(forwarded_for))]
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,12 @@
+'''
+Benchmarks for the hot paths: grading, certificate PDFs, reports, the
+agency list, user search, the sign-in token cache, checking JWTs,
+serializing responses and importing the app. Run them with:
+
+    python -m training.benchmarks [SUITE ...] [--output PATH] [--compare BASELINE]
+
+Results are written to JSON so runs can be compared, `--compare` reports
+the benchmarks whose median got slower than in a baseline run.
+'''
+from .runner import Bench, BenchmarkResult, SkipSuite, SUITES, compare, suite, write_results
+from . import auth, certificate, quiz, repositories, serialization, startup, user_cache
@@ -0,0 +1,38 @@
+import argparse
+import json
+import sys
+
+from training.benchmarks import SUITES, Bench, compare, write_results
+from training.benchmarks.runner import DEFAULT_SIZES
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m training.benchmarks", description="Run the benchmarks and write their timings to JSON.")
+    parser.add_argument("suites", nargs="*", choices=[[]] + list(SUITES), metavar="SUITE", help=f"suites to run, all by default: {', '.join(SUITES)}")
+    parser.add_argument("--output", default="benchmarks.json", help="path to write the results to")
+    parser.add_argument("--compare", metavar="BASELINE", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown of the median that counts as a regression (default 0.1, 10%%)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of quiz completions to run the reports on")
+    parser.add_argument("--rounds", type=int, help="run every benchmark this many rounds instead of its default")
+    args = parser.parse_args()
+
+    bench = Bench(sizes=tuple(args.sizes), rounds=args.rounds)
+    try:
+        bench.run_suites(args.suites or list(SUITES))
+    finally:
+        bench.close()
+    write_results(bench, args.output)
+    print(f"Wrote results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, bench.to_dict(), args.threshold)
+        for key, old, new, regressed in rows:
+            print(f"{key:<90} {old * 1000:10.2f}ms -> {new * 1000:10.2f}ms  {new / old - 1:+7.1%}{'  REGRESSION' if regressed else ''}")
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+'''
+Benchmarks checking a user's JWT, alone and as part of an authenticated
+request, GET /api/v1/certificates/, with and without the cache of verified
+tokens, for compact tokens and for tokens carrying the whole profile of an
+A/OPC who reports on many bureaus. The request runs through the app and its
+middleware with the certificate repository replaced by an in-memory one.
+Compact tokens look the profile up in Redis, so their request is skipped if
+Redis isn't running.
+'''
+from datetime import datetime
+from unittest.mock import patch
+
+import httpx
+import jwt
+from redis.exceptions import ConnectionError
+
+from training.api.auth import decode_token, encode_jwt, token_cache
+from training.api.deps import async_certificate_repository
+from training.config import settings
+from training.data import UserProfileCache
+from training.data.user_cache import redis
+from training.schemas import CertificateListValue, CertificateType, UserJWT
+from .runner import Bench, suite
+
+REPORT_AGENCY_COUNT = 200
+
+# An A/OPC's profile, as it was carried in full by the JWTs
+PROFILE = {
+    "id": 1,
+    "email": "leopold.bloom@example.gov",
+    "name": "Leopold Bloom",
+    "agency_id": 1,
+    "agency": {"id": 1, "name": "General Services Administration", "bureau": "Federal Acquisition Service"},
+    "roles": ["Report"],
+    "report_agencies": [
+        {"id": id, "name": "General Services Administration", "bureau": f"Bureau of Example Affairs {id}"}
+        for id in range(REPORT_AGENCY_COUNT)
+    ],
+    "created_on": "2024-01-24T00:00:00",
+    "created_by": "leopold.bloom@example.gov",
+    "modified_on": None,
+    "modified_by": None,
+}
+
+
+class _AsyncCertificateRepository:
+    def __init__(self, count: int):
+        self.certificates = [
+            CertificateListValue(
+                id=id, user_id=1, user_name="Leopold Bloom", cert_title="Travel Training for Card/Account Holders and Approving Officials",
+                completion_date=datetime(2024, 1, 24), certificate_type=CertificateType.QUIZ,
+            )
+            for id in range(count)
+        ]
+
+    async def get_all_certificates_by_userId(self, user_id: int) -> list[CertificateListValue]:
+        return self.certificates
+
+
+@suite("auth")
+def auth_benchmarks(bench: Bench) -> None:
+    from training.main import app
+
+    user = UserJWT.model_construct(**PROFILE)
+    tokens = {
+        "full": jwt.encode(PROFILE, settings.JWT_SECRET, algorithm="HS256"),
+        "compact": encode_jwt(user),
+    }
+    for format, token in tokens.items():
+        print(f"{format} token: {len(token)} bytes")
+    requests = dict(tokens)
+    try:
+        redis.ping()
+        UserProfileCache().set(user)
+    except ConnectionError as e:
+        print(f"Skipped GET /certificates/ with compact tokens, Redis isn't available: {e}")
+        del requests["compact"]
+
+    client = httpx.AsyncClient(app=app, base_url="http://benchmark")
+    app.dependency_overrides[async_certificate_repository] = lambda: _AsyncCertificateRepository(5)
+
+    def get_certificates(token: str):
+        async def get() -> None:
+            response = await client.get("/api/v1/certificates/", headers={"Authorization": f"Bearer {token}"})
+            response.raise_for_status()
+        return get
+
+    try:
+        for cache in ("off", "on"):
+            token_cache.clear()
+            # Full tokens are the format from before compact ones, compared whatever the date
+            with patch.object(token_cache, "maxsize", token_cache.maxsize if cache == "on" else 0), \
+                    patch.object(settings, "LEGACY_JWT_ACCEPTED_UNTIL", None):
+                for format, token in tokens.items():
+                    bench.run("decode_token", lambda: decode_token(token), rounds=1000, cache=cache, format=format)
+                for format, token in requests.items():
+                    bench.run("GET /certificates/", get_certificates(token), rounds=200, cache=cache, format=format)
+    finally:
+        bench._loop.run_until_complete(client.aclose())
+        app.dependency_overrides.pop(async_certificate_repository, None)
+        token_cache.clear()
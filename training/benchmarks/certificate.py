@@ -0,0 +1,24 @@
+'''
+Benchmarks rendering the certificate PDFs.
+'''
+from datetime import datetime
+
+from training.services import Certificate
+from training.services.certificate import certificates
+from .runner import Bench, suite
+
+
+@suite("certificate")
+def certificate_benchmarks(bench: Bench) -> None:
+    service = Certificate()
+    date = datetime(2024, 1, 24)
+    for training_name, pdf in certificates.items():
+        bench.run(
+            "Certificate.generate_pdf",
+            lambda: service.generate_pdf(training_name, "Leopold Bloom", "General Services Administration", date),
+            template=pdf,
+        )
+    bench.run(
+        "Certificate.generate_gspc_pdf",
+        lambda: service.generate_gspc_pdf("Leopold Bloom", "General Services Administration", date, datetime(2027, 1, 24)),
+    )
@@ -0,0 +1,344 @@
+'''
+Load tests the API with concurrent simulated users, to find the request
+rate where latency starts to climb before the training deadline does it
+for us. Run it with:
+
+    python -m training.benchmarks.load [--users 50] [--duration 60] [--mix trainee=19,admin_export=1] [--url URL]
+
+Each simulated user runs scenarios that mirror real traffic, picked at
+random with the weights given by `--mix`:
+
+- trainee: registers through /get-link, clicks the emailed link
+  (/get-user), loads and submits a quiz, lists their certificates and
+  downloads the certificate PDF if they passed
+- admin_export: downloads the admin training report for an agency
+
+By default the app runs in this process behind httpx's ASGI transport,
+against the local Postgres and Redis, with a stand-in for the SMTP server
+that captures the emailed links. With `--url` the load goes to a running
+server instead, e.g. gunicorn started as in the Procfile, which needs its
+own SMTP sink; the sign-in tokens are then created in Redis directly.
+
+The scenarios write users and quiz completions, so only run it against a
+disposable local database, e.g. one filled by training.database.synthetic.
+It reports the p50/p95/p99 latency and throughput of each step.
+'''
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+from unittest.mock import patch
+from urllib.parse import urlparse
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import select
+from training import models
+from training.api.auth import encode_jwt
+from training.data import UserCache
+from training.database import SessionLocal, engine
+from training.repositories import QuizRepository
+from training.schemas import Quiz, TempUser, UserJWT
+
+# Share of trainees who pass the quiz
+PASS_RATE = 0.8
+
+DEFAULT_MIX = {"trainee": 19, "admin_export": 1}
+
+TOKEN_PATTERN = re.compile(r"[?&]t=([0-9a-f-]{36})")
+
+
+class SMTPStandIn:
+    '''
+    Takes the place of smtplib.SMTP in the app. Messages are dropped after
+    their sign-in token is put in the `mailbox`, keyed by recipient, and each
+    send takes `latency` seconds like a real SMTP relay would.
+    '''
+    mailbox: dict[str, str] = {}
+    latency = 0.0
+    sent = 0
+    _lock = threading.Lock()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "SMTPStandIn":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def starttls(self) -> None:
+        pass
+
+    def login(self, user: str, password: str) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+    def send_message(self, message: Any) -> None:
+        # The app's SMTP calls are blocking and run in the threadpool
+        time.sleep(self.latency)
+        body = message.get_body().get_content()
+        match = TOKEN_PATTERN.search(body)
+        with self._lock:
+            SMTPStandIn.sent += 1
+            if match:
+                self.mailbox[message["To"]] = match.group(1)
+
+
+@dataclass
+class Fixtures:
+    '''
+    What the scenarios need to know about the database: the active quizzes
+    with a passing and a failing submission for each, agency IDs to register
+    users with, and an Admin JWT for the exports.
+    '''
+    quizzes: list[tuple[int, dict, dict]]
+    agency_ids: list[int]
+    admin_jwt: str | None
+
+
+def load_fixtures() -> Fixtures:
+    with SessionLocal() as session:
+        quizzes = []
+        for db_quiz in QuizRepository(session).find_all({"active": True}):
+            quiz = Quiz.model_validate(db_quiz)
+            passing, failing = [], []
+            for question in quiz.content.questions:
+                correct = [choice.id for choice in question.choices if choice.correct]
+                incorrect = [choice.id for choice in question.choices if not choice.correct]
+                passing.append({"question_id": question.id, "response_ids": correct})
+                failing.append({"question_id": question.id, "response_ids": incorrect[:1] or correct})
+            quizzes.append((quiz.id, {"responses": passing}, {"responses": failing}))
+
+        agency_ids = list(session.scalars(select(models.Agency.id)))
+        admin = session.scalars(
+            select(models.User).join(models.User.roles).where(models.Role.name == "Admin").order_by(models.User.id)
+        ).first()
+        admin_jwt = encode_jwt(UserJWT.model_validate(admin)) if admin else None
+    return Fixtures(quizzes, agency_ids, admin_jwt)
+
+
+@dataclass
+class Recorder:
+    '''
+    Collects the latency and outcome of every request, by scenario step.
+    '''
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    scenarios: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, step: str, latency: float, ok: bool) -> None:
+        self.latencies[step].append(latency)
+        if not ok:
+            self.errors[step] += 1
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        steps = {}
+        for step, latencies in self.latencies.items():
+            steps[step] = {"requests": len(latencies), "errors": self.errors[step], "throughput": len(latencies) / elapsed, **_percentiles(latencies)}
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            "elapsed": elapsed,
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "throughput": len(everything) / elapsed,
+            **_percentiles(everything),
+            "scenarios": dict(self.scenarios),
+            "steps": steps,
+        }
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    if len(latencies) < 2:
+        latency = latencies[0] if latencies else 0.0
+        return {"p50": latency, "p95": latency, "p99": latency, "max": latency}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(latencies)}
+
+
+class VirtualUser:
+    '''
+    One simulated user, running scenarios one after another.
+    '''
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, fixtures: Fixtures, rng: random.Random,
+                 think_time: float, in_process: bool):
+        self.client = client
+        self.recorder = recorder
+        self.fixtures = fixtures
+        self.rng = rng
+        self.think_time = think_time
+        self.in_process = in_process
+
+    async def request(self, step: str, method: str, url: str, expected: int = 200, **kwargs: Any) -> httpx.Response | None:
+        '''
+        Sends a request and records it under `step`. Returns the response if
+        it had the `expected` status, so the scenario can carry on.
+        '''
+        if self.think_time:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(step, time.perf_counter() - start, ok=False)
+            return None
+        ok = response.status_code == expected
+        self.recorder.record(step, time.perf_counter() - start, ok=ok)
+        return response if ok else None
+
+    async def trainee(self) -> None:
+        user = {"email": f"loadtest.{uuid4().hex}@example.gov", "name": "Load Test", "agency_id": self.rng.choice(self.fixtures.agency_ids)}
+        dest = {"page_id": "training_travel", "parameters": "", "title": "Travel"}
+        if not await self.request("POST /get-link", "POST", "/api/v1/get-link", expected=201, json={"user": user, "dest": dest}):
+            return
+
+        token = await self._token(user)
+        response = await self.request("GET /get-user/{token}", "GET", f"/api/v1/get-user/{token}")
+        if not response:
+            return
+        user_jwt = response.json()["jwt"]
+        headers = {"Authorization": f"Bearer {user_jwt}"}
+
+        quiz_id, passing, failing = self.rng.choice(self.fixtures.quizzes)
+        if not await self.request("GET /quizzes/{id}", "GET", f"/api/v1/quizzes/{quiz_id}"):
+            return
+        passed = self.rng.random() < PASS_RATE
+        response = await self.request(
+            "POST /quizzes/{id}/submission", "POST", f"/api/v1/quizzes/{quiz_id}/submission",
+            expected=201, json=passing if passed else failing, headers=headers,
+        )
+        if not response:
+            return
+
+        await self.request("GET /certificates/", "GET", "/api/v1/certificates/", headers=headers)
+        if passed:
+            completion_id = response.json()["quiz_completion_id"]
+            await self.request("POST /certificate/{certType}/{id}", "POST", f"/api/v1/certificate/1/{completion_id}", data={"jwtToken": user_jwt})
+
+    async def admin_export(self) -> None:
+        filter = {"agency_id": self.rng.choice(self.fixtures.agency_ids)}
+        await self.request(
+            "POST /users/download-admin-smartpay-training-report", "POST", "/api/v1/users/download-admin-smartpay-training-report",
+            json=filter, headers={"Authorization": f"Bearer {self.fixtures.admin_jwt}"},
+        )
+
+    async def _token(self, user: dict[str, Any]) -> str:
+        if self.in_process:
+            return SMTPStandIn.mailbox.pop(user["email"])
+        # The emailed token can't be read from a remote server, so make one the same way
+        return await asyncio.to_thread(UserCache().set, TempUser.model_validate(user))
+
+
+SCENARIOS: dict[str, Callable[[VirtualUser], Awaitable[None]]] = {
+    "trainee": VirtualUser.trainee,
+    "admin_export": VirtualUser.admin_export,
+}
+
+
+async def run_load(client: httpx.AsyncClient, fixtures: Fixtures, mix: dict[str, int], users: int, duration: float,
+                   ramp_up: float = 0, think_time: float = 0, in_process: bool = True, seed: int | None = None) -> dict[str, Any]:
+    '''
+    Runs `users` simulated users for `duration` seconds, starting them
+    evenly over the first `ramp_up` seconds, and returns the latency and
+    throughput summary.
+    '''
+    recorder = Recorder()
+    names, weights = zip(*mix.items())
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def run_user(i: int) -> None:
+        rng = random.Random(None if seed is None else seed + i)
+        user = VirtualUser(client, recorder, fixtures, rng, think_time, in_process)
+        await asyncio.sleep(ramp_up * i / users)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            await SCENARIOS[name](user)
+            recorder.scenarios[name] += 1
+
+    await asyncio.gather(*(run_user(i) for i in range(users)))
+    return recorder.summary(time.perf_counter() - start)
+
+
+def print_summary(summary: dict[str, Any]) -> None:
+    print(f"{'step':<55} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = sorted(summary["steps"].items()) + [("all", summary)]
+    for step, stats in rows:
+        print(f"{step:<55} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>8.1f} "
+              f"{stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}")
+    print(f"Completed scenarios: {summary['scenarios']} in {summary['elapsed']:.1f}s")
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, choose from {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+async def _main(args: argparse.Namespace, fixtures: Fixtures) -> dict[str, Any]:
+    options = dict(mix=args.mix, users=args.users, duration=args.duration, ramp_up=args.ramp_up, think_time=args.think_time, seed=args.seed)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return await run_load(client, fixtures, in_process=False, **options)
+
+    from training.main import app
+    SMTPStandIn.latency = args.smtp_latency
+    with (patch("training.api.email.SMTP", SMTPStandIn), patch("training.services.quiz.SMTP", SMTPStandIn),
+          patch("training.services.gspc.SMTP", SMTPStandIn)):
+        async with httpx.AsyncClient(app=app, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_load(client, fixtures, in_process=True, **options)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m training.benchmarks.load", description="Load test the API with simulated users.")
+    parser.add_argument("--users", type=int, default=50, help="concurrent simulated users (default 50)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run for (default 60)")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds over which to start the users (default 0)")
+    parser.add_argument("--think-time", type=float, default=0, help="average seconds a user waits before each request (default 0)")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX, help="scenario weights (default trainee=19,admin_export=1)")
+    parser.add_argument("--url", help="base URL of a running server, instead of running the app in this process")
+    parser.add_argument("--smtp-latency", type=float, default=0.05, help="seconds each email takes the SMTP stand-in to send (default 0.05)")
+    parser.add_argument("--timeout", type=float, default=60, help="request timeout in seconds (default 60)")
+    parser.add_argument("--seed", type=int, help="seed for the random choices of the users")
+    parser.add_argument("--output", help="path to write the summary to as JSON")
+    parser.add_argument("--force", action="store_true", help="run even if the database or server isn't on this machine")
+    args = parser.parse_args()
+
+    local = ("localhost", "127.0.0.1", "::1")
+    if not args.force:
+        if engine.url.host not in local:
+            parser.error(f"DB_URI points at {engine.url.host}, the load test writes to it. Use --force to run anyway.")
+        if args.url and urlparse(args.url).hostname not in local:
+            parser.error(f"{args.url} isn't on this machine. Use --force to run anyway.")
+
+    fixtures = load_fixtures()
+    if "trainee" in args.mix and not fixtures.quizzes:
+        parser.error("The trainee scenario needs active quizzes, load them or run python -m training.database.synthetic")
+    if "admin_export" in args.mix and not fixtures.admin_jwt:
+        parser.error("The admin_export scenario needs an Admin user, run python -m training.database.seed")
+
+    summary = asyncio.run(_main(args, fixtures))
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote summary to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+'''
+Benchmarks QuizService.grade on quizzes of realistic sizes. The repositories
+are replaced with in-memory ones so only the grading, validation and, for
+passing submissions, the certificate PDF are timed. Emails aren't sent.
+'''
+from datetime import datetime
+from types import SimpleNamespace
+
+from training import models, schemas
+from training.services import QuizService
+from training.services.certificate import certificates
+from .runner import Bench, suite
+
+# The current quizzes have 10 to 25 questions
+QUESTION_COUNTS = (10, 25, 100)
+CHOICE_COUNT = 4
+
+
+class _Session:
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+class _QuizRepository:
+    def __init__(self, quiz: models.Quiz):
+        self.quiz = quiz
+
+    async def find_by_id(self, id: int) -> models.Quiz:
+        return self.quiz
+
+
+class _QuizCompletionRepository:
+    async def create(self, quiz_completion: schemas.QuizCompletionCreate) -> SimpleNamespace:
+        return SimpleNamespace(id=1)
+
+
+class _ReportSummaryRepository:
+    async def add_passed(self, user_id: int, quiz_id: int) -> None:
+        pass
+
+
+class _QuizAnalysisRepository:
+    async def add_completion(self, quiz_id: int, passed: bool, questions: list[schemas.QuizGradeQuestion]) -> None:
+        pass
+
+
+class _UserRepository:
+    async def find_by_id(self, id: int) -> SimpleNamespace:
+        return SimpleNamespace(id=id, name="Leopold Bloom", email="leopold.bloom@example.gov")
+
+
+class _CertificateRepository:
+    def __init__(self, quiz: models.Quiz):
+        self.quiz = quiz
+
+    async def get_certificate_by_id(self, id: int) -> schemas.UserCertificate:
+        return schemas.UserCertificate(
+            id=id, user_id=1, user_name="Leopold Bloom", quiz_id=self.quiz.id, quiz_name=self.quiz.name,
+            agency="General Services Administration", completion_date=datetime(2024, 1, 24),
+        )
+
+
+def make_quiz(question_count: int) -> models.Quiz:
+    questions = [
+        {
+            "id": question_id,
+            "text": f"Question {question_id}",
+            "type": "MultipleChoiceSingleSelect",
+            "choices": [
+                {"id": choice_id, "text": f"Choice {choice_id}", "correct": choice_id == question_id % CHOICE_COUNT}
+                for choice_id in range(CHOICE_COUNT)
+            ],
+        }
+        for question_id in range(question_count)
+    ]
+    return models.Quiz(
+        id=1, name=next(iter(certificates)), topic="Travel", audience="AccountHoldersApprovingOfficials",
+        active=True, content={"questions": questions},
+    )
+
+
+def make_submission(quiz: models.Quiz, passing: bool) -> schemas.QuizSubmission:
+    responses = []
+    for question in quiz.content["questions"]:
+        correct = [choice["id"] for choice in question["choices"] if choice["correct"]]
+        responses.append({"question_id": question["id"], "response_ids": correct if passing else [(correct[0] + 1) % CHOICE_COUNT]})
+    return schemas.QuizSubmission.model_validate({"responses": responses})
+
+
+def make_service(quiz: models.Quiz) -> QuizService:
+    service = QuizService(_Session())  # type: ignore[arg-type]
+    service.quiz_repo = _QuizRepository(quiz)  # type: ignore[assignment]
+    service.quiz_completion_repo = _QuizCompletionRepository()  # type: ignore[assignment]
+    service.user_repo = _UserRepository()  # type: ignore[assignment]
+    service.certificate_repo = _CertificateRepository(quiz)  # type: ignore[assignment]
+    service.report_summary_repo = _ReportSummaryRepository()  # type: ignore[assignment]
+    service.quiz_analysis_repo = _QuizAnalysisRepository()  # type: ignore[assignment]
+    service.email_certificate = lambda *args: None  # type: ignore[method-assign]
+    return service
+
+
+@suite("quiz")
+def quiz_benchmarks(bench: Bench) -> None:
+    for question_count in QUESTION_COUNTS:
+        quiz = make_quiz(question_count)
+        service = make_service(quiz)
+        for passing in (False, True):
+            submission = make_submission(quiz, passing)
+            bench.run(
+                "QuizService.grade",
+                lambda: service.grade(quiz.id, 1, submission),
+                rounds=10 if passing else 100,
+                questions=question_count,
+                passed=passing,
+            )
@@ -0,0 +1,151 @@
+'''
+Benchmarks the report, agency and user search queries against Postgres.
+
+The report benchmarks fill the database with synthetic users and quiz
+completions, 10k, 100k and 1M completions by default, inside a transaction
+that's rolled back afterwards, so they can be run against a development
+database without leaving anything behind.
+'''
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+from training.database import SessionLocal, engine
+from training.repositories import AgencyRepository, ReportCompletionRepository, ReportSummaryRepository, UserRepository
+from training.schemas import SmartPayTrainingReportFilter
+from training.services.certificate import certificates
+from .runner import Bench, SkipSuite, suite
+
+# Each synthetic user has about this many completions
+COMPLETIONS_PER_USER = 4
+
+# A typical submission to a 15 question quiz
+RESPONSES = json.dumps({"responses": [{"question_id": i, "response_ids": [i % 4]} for i in range(15)]})
+
+
+@dataclass
+class SyntheticData:
+    users: int
+    completions: int
+    report_user_id: int
+    agency_id: int
+    bureau_id: int
+
+
+@contextmanager
+def synthetic_data(session: Session, completions: int) -> Iterator[SyntheticData]:
+    '''
+    Adds a quiz per certificate, users spread across all of the agencies,
+    `completions` quiz completions spread across those and a Report user for
+    the agency with the most bureaus. Everything is rolled back on exit.
+    '''
+    users = max(1, completions // COMPLETIONS_PER_USER)
+    try:
+        # Loading a million rows takes longer than the default statement timeout
+        session.execute(text("SET LOCAL statement_timeout = 0"))
+        for name in certificates:
+            session.execute(text(
+                "INSERT INTO quizzes (name, topic, audience, active, content) "
+                "VALUES (:name, 'Travel', 'AccountHoldersApprovingOfficials', true, '{\"questions\": []}')"
+            ), {"name": name})
+        session.execute(text('''
+            WITH agency AS (SELECT array_agg(id ORDER BY id) AS ids FROM agencies)
+            INSERT INTO users (email, name, agency_id, created_by, created_on)
+            SELECT 'benchmark.user' || i || '@example.gov', 'Benchmark User ' || i,
+                   agency.ids[1 + i % cardinality(agency.ids)], 'benchmark', now()
+            FROM agency, generate_series(1, :users) AS i
+        '''), {"users": users})
+        session.execute(text('''
+            WITH quiz AS (SELECT array_agg(id) AS ids FROM quizzes),
+                 benchmark_user AS (SELECT array_agg(id) AS ids FROM users WHERE created_by = 'benchmark')
+            INSERT INTO quiz_completions (quiz_id, user_id, passed, submit_ts, responses)
+            SELECT quiz.ids[1 + i % cardinality(quiz.ids)], benchmark_user.ids[1 + i % cardinality(benchmark_user.ids)],
+                   i % 4 <> 0, now() - (i % 730) * interval '1 day', CAST(:responses AS jsonb)
+            FROM quiz, benchmark_user, generate_series(1, :completions) AS i
+        '''), {"completions": completions, "responses": RESPONSES})
+
+        agency_name, agency_id, bureau_id = session.execute(text('''
+            SELECT name, min(id) FILTER (WHERE bureau IS NULL), max(id)
+            FROM agencies GROUP BY name ORDER BY count(*) DESC LIMIT 1
+        ''')).one()
+        report_user_id = session.execute(text(
+            "INSERT INTO users (email, name, agency_id, created_by, created_on) "
+            "VALUES ('benchmark.report@example.gov', 'Benchmark Report', :agency_id, 'benchmark', now()) RETURNING id"
+        ), {"agency_id": agency_id}).scalar_one()
+        session.execute(text(
+            "INSERT INTO users_x_roles (user_id, role_id) SELECT :user_id, id FROM roles WHERE name = 'Report'"
+        ), {"user_id": report_user_id})
+        session.execute(text(
+            "INSERT INTO report_users_x_agencies (user_id, agency_id) SELECT :user_id, id FROM agencies WHERE name = :name"
+        ), {"user_id": report_user_id, "name": agency_name})
+        ReportCompletionRepository(session).backfill()
+        ReportSummaryRepository(session).rebuild()
+        # Give the planner statistics for the new rows, as autovacuum would in production
+        session.execute(text("ANALYZE users, quiz_completions, report_completions, report_summaries"))
+
+        yield SyntheticData(users, completions, report_user_id, agency_id, bureau_id)
+    finally:
+        session.rollback()
+
+
+def require_database() -> None:
+    try:
+        with engine.connect():
+            pass
+    except exc.OperationalError as e:
+        raise SkipSuite(f"Postgres isn't available: {e.orig}")
+
+
+@suite("agencies")
+def agency_benchmarks(bench: Bench) -> None:
+    require_database()
+    with SessionLocal() as session:
+        bench.run("AgencyRepository.get_agencies_with_bureaus", AgencyRepository(session).get_agencies_with_bureaus, rounds=100)
+
+
+@suite("reports")
+def report_benchmarks(bench: Bench) -> None:
+    require_database()
+    for size in bench.sizes:
+        rounds = 5 if size < 1_000_000 else 3
+        with SessionLocal() as session, synthetic_data(session, size) as data:
+            repo = UserRepository(session)
+            bench.run(
+                "UserRepository.get_admin_smartpay_training_report",
+                lambda: repo.get_admin_smartpay_training_report(SmartPayTrainingReportFilter()),
+                rounds=rounds, completions=size, filter="none",
+            )
+            bench.run(
+                "UserRepository.get_admin_smartpay_training_report",
+                lambda: repo.get_admin_smartpay_training_report(SmartPayTrainingReportFilter(agency_id=data.agency_id)),
+                rounds=rounds, completions=size, filter="agency",
+            )
+            bench.run(
+                "UserRepository.get_user_quiz_completion_report",
+                lambda: repo.get_user_quiz_completion_report(SmartPayTrainingReportFilter(), data.report_user_id),
+                rounds=rounds, completions=size, filter="none",
+            )
+            bench.run(
+                "UserRepository.get_user_quiz_completion_report",
+                lambda: repo.get_user_quiz_completion_report(SmartPayTrainingReportFilter(bureau_id=data.bureau_id), data.report_user_id),
+                rounds=rounds, completions=size, filter="bureau",
+            )
+            bench.run(
+                "UserRepository.get_user_quiz_completion_summary",
+                lambda: repo.get_user_quiz_completion_summary(SmartPayTrainingReportFilter(), data.report_user_id),
+                rounds=rounds, completions=size, filter="none",
+            )
+            # The search is over the users, there's one for every few completions
+            bench.run(
+                "UserRepository.get_users",
+                lambda: repo.get_users("benchmark.user1@", 1),
+                completions=size, search="one",
+            )
+            bench.run(
+                "UserRepository.get_users",
+                lambda: repo.get_users("example.gov", 2),
+                completions=size, search="all",
+            )
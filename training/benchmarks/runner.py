@@ -0,0 +1,182 @@
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+# Report sizes, in quiz completions
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+SUITES: dict[str, Callable[["Bench"], None]] = {}
+
+
+class SkipSuite(Exception):
+    '''
+    Raised by a suite when a service it needs, like Postgres or Redis, isn't
+    available.
+    '''
+
+
+def suite(name: str) -> Callable[[Callable[["Bench"], None]], Callable[["Bench"], None]]:
+    '''
+    Registers a function that runs a group of benchmarks with `Bench.run`.
+    '''
+    def decorator(func: Callable[["Bench"], None]) -> Callable[["Bench"], None]:
+        SUITES[name] = func
+        return func
+    return decorator
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict[str, Any]
+    timings: list[float]
+    # Peak bytes allocated by one call, when measured
+    peak_memory: int | None = None
+
+    @property
+    def key(self) -> str:
+        '''
+        Identifies the benchmark across runs, e.g. `grade[questions=25]`.
+        '''
+        if not self.params:
+            return self.name
+        params = ",".join(f"{name}={value}" for name, value in sorted(self.params.items()))
+        return f"{self.name}[{params}]"
+
+    def to_dict(self) -> dict[str, Any]:
+        timings = sorted(self.timings)
+        result = {
+            "name": self.name,
+            "params": self.params,
+            "rounds": len(timings),
+            "min": timings[0],
+            "max": timings[-1],
+            "mean": statistics.fmean(timings),
+            "median": statistics.median(timings),
+            "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "p95": timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))],
+        }
+        if self.peak_memory is not None:
+            result["peak_memory"] = self.peak_memory
+        return result
+
+
+@dataclass
+class Bench:
+    '''
+    Times benchmarks and collects their results. `rounds` overrides the
+    number of rounds every benchmark runs, e.g. 1 for a quick smoke run.
+    '''
+    sizes: tuple[int, ...] = DEFAULT_SIZES
+    rounds: int | None = None
+    results: list[BenchmarkResult] = field(default_factory=list)
+    skipped: dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        # Async benchmarks share a loop, so async engine connections stay usable between rounds
+        self._loop = asyncio.new_event_loop()
+
+    def run(self, name: str, func: Callable[[], Any], rounds: int = 20, warmup: int = 1, memory: bool = False,
+            **params: Any) -> BenchmarkResult:
+        '''
+        Calls `func` `warmup` times and then times `rounds` calls. When `func`
+        returns an awaitable, like a coroutine, it's run to completion.
+        `memory` also measures the peak memory allocated by one more call,
+        which is run under tracemalloc so it isn't timed. `params` describe
+        the benchmark's inputs, like the quiz size or number of completions.
+        '''
+        def call() -> None:
+            result = func()
+            if inspect.isawaitable(result):
+                self._loop.run_until_complete(result)
+
+        for _ in range(warmup):
+            call()
+        timings = []
+        for _ in range(self.rounds or rounds):
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+
+        peak_memory = None
+        if memory:
+            tracemalloc.start()
+            try:
+                call()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        return self.record(name, timings, peak_memory, **params)
+
+    def record(self, name: str, timings: list[float], peak_memory: int | None = None, **params: Any) -> BenchmarkResult:
+        '''
+        Adds the results of a benchmark timed some other way than `run`, like
+        in another process.
+        '''
+        result = BenchmarkResult(name, params, timings, peak_memory)
+        self.results.append(result)
+        stats = result.to_dict()
+        peak = f"  peak {peak_memory / 1024:10.1f}KiB" if peak_memory is not None else ""
+        print(f"{result.key:<90} median {stats['median'] * 1000:10.2f}ms  p95 {stats['p95'] * 1000:10.2f}ms{peak}  ({stats['rounds']} rounds)")
+        return result
+
+    def run_suites(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                SUITES[name](self)
+            except SkipSuite as e:
+                print(f"Skipped {name}: {e}")
+                self.skipped[name] = str(e)
+
+    def close(self) -> None:
+        self._loop.close()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "created_on": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": [result.to_dict() for result in self.results],
+            "skipped": self.skipped,
+        }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[tuple[str, float, float, bool]]:
+    '''
+    Compares the medians of the benchmarks in two runs' JSON results. Returns
+    (key, baseline median, current median, regressed) for the benchmarks in
+    both runs, where regressed means the median grew by more than `threshold`,
+    e.g. 0.1 for 10%.
+    '''
+    def by_key(run: dict[str, Any]) -> dict[str, float]:
+        return {BenchmarkResult(r["name"], r["params"], []).key: r["median"] for r in run["results"]}
+
+    old = by_key(baseline)
+    rows = []
+    for key, median in by_key(current).items():
+        if key in old:
+            rows.append((key, old[key], median, median > old[key] * (1 + threshold)))
+    return rows
+
+
+def write_results(bench: Bench, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(bench.to_dict(), f, indent=2)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
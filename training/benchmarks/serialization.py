@@ -0,0 +1,100 @@
+'''
+Benchmarks serializing the responses of the big read endpoints, /agencies,
+/quizzes, /certificates/ and /users, the way FastAPI does by default
+(validating the response model, converting it to dicts and lists and
+encoding them with json), the same with orjson, and with ModelSerializer.
+Each is timed and its peak memory measured, on realistic payloads built in
+memory.
+'''
+from collections.abc import Callable
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from training import models
+from training.api.responses import ModelSerializer
+from training.schemas import AgencyWithBureaus, CertificateListValue, CertificateType, QuizPublic, UserSearchResult
+from .quiz import make_quiz
+from .runner import Bench, suite
+
+AGENCY_COUNT = 100
+BUREAUS_PER_AGENCY = 10
+QUIZ_COUNT = 10
+CERTIFICATE_COUNT = 50
+# A page of the user search
+USER_COUNT = 25
+
+
+def make_agencies() -> list[dict[str, Any]]:
+    # As AgencyRepository.get_agencies_with_bureaus returns them
+    return [
+        {
+            "id": agency_id,
+            "name": f"Agency {agency_id}",
+            "bureaus": [{"id": agency_id * 100 + n, "name": f"Bureau {n} of Agency {agency_id}"} for n in range(BUREAUS_PER_AGENCY)],
+        }
+        for agency_id in range(AGENCY_COUNT)
+    ]
+
+
+def make_quizzes() -> list[models.Quiz]:
+    return [make_quiz(25) for _ in range(QUIZ_COUNT)]
+
+
+def make_certificates() -> list[SimpleNamespace]:
+    # Like the rows of the certificate queries
+    return [
+        SimpleNamespace(
+            id=id, user_id=1, user_name="Leopold Bloom", cert_title="Travel Training for Card/Account Holders and Approving Officials",
+            completion_date=datetime(2024, 1, 24), certificate_type=CertificateType.QUIZ.value,
+        )
+        for id in range(CERTIFICATE_COUNT)
+    ]
+
+
+def make_user_search_result() -> UserSearchResult:
+    agency = models.Agency(id=1, name="General Services Administration", bureau="Federal Acquisition Service")
+    users = [
+        models.User(
+            id=id, email=f"user{id}@example.gov", name=f"User {id}", agency_id=agency.id, agency=agency,
+            roles=[models.Role(id=1, name="Report")], report_agencies=[agency] * 20,
+            created_on=datetime(2024, 1, 24), created_by="admin@example.gov",
+        )
+        for id in range(USER_COUNT)
+    ]
+    # As UserRepository.get_users returns it
+    return UserSearchResult(users=users, total_count=1000)
+
+
+def fastapi_path(type_: Any, response_class: type[JSONResponse]) -> Callable[[Any], Any]:
+    '''
+    Serializes a response the way FastAPI does for a route with a
+    response_model that returns the content rather than a Response.
+    '''
+    field = create_response_field(name="response", type_=type_, mode="serialization")
+
+    async def serialize(content: Any) -> bytes:
+        return response_class(await serialize_response(field=field, response_content=content)).body
+    return serialize
+
+
+@suite("serialization")
+def serialization_benchmarks(bench: Bench) -> None:
+    endpoints = [
+        ("/agencies", list[AgencyWithBureaus], make_agencies()),
+        ("/quizzes", list[QuizPublic], make_quizzes()),
+        ("/certificates/", list[CertificateListValue], make_certificates()),
+        ("/users", UserSearchResult, make_user_search_result()),
+    ]
+    for endpoint, type_, content in endpoints:
+        paths = {
+            "fastapi": fastapi_path(type_, JSONResponse),
+            "orjson": fastapi_path(type_, ORJSONResponse),
+            "model": ModelSerializer(type_).dump_json,
+        }
+        for path, serialize in paths.items():
+            bench.run("serialize", lambda: serialize(content), rounds=200, memory=True, endpoint=endpoint, path=path)
@@ -0,0 +1,56 @@
+'''
+Benchmarks importing the app, `training.main`, in a fresh interpreter, which
+is most of the time a web worker takes to boot. Python's `-X importtime`
+reports how long each module took to import, the app's total is checked
+against IMPORT_TIME_BUDGET and the slowest of its imports are listed.
+'''
+import subprocess
+import sys
+
+from .runner import Bench, suite
+
+MODULE = "training.main"
+
+# Seconds that importing the app may take. It takes about 1.1s on a
+# developer laptop, mostly FastAPI, SQLAlchemy and pydantic. The budget
+# leaves room for slower CI machines but not for another heavy dependency.
+IMPORT_TIME_BUDGET = 2.0
+
+# Heavy modules that the app only imports when it needs them, so importing
+# the app mustn't import them
+LAZY_MODULES = ("fitz", "cfenv")
+
+
+def import_times(module: str = MODULE) -> dict[str, float]:
+    '''
+    Imports `module` in a new interpreter and returns the seconds each of
+    the modules it imported took, including the modules they imported.
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+@suite("startup")
+def startup_benchmarks(bench: Bench) -> None:
+    runs = [import_times() for _ in range(bench.rounds or 5)]
+    result = bench.record("import", [times[MODULE] for times in runs], module=MODULE)
+
+    median = result.to_dict()["median"]
+    if median > IMPORT_TIME_BUDGET:
+        print(f"OVER BUDGET: importing {MODULE} took {median:.2f}s, the budget is {IMPORT_TIME_BUDGET:.2f}s")
+    for module in LAZY_MODULES:
+        if module in runs[0]:
+            print(f"{MODULE} imports {module}, which should only be imported on first use")
+
+    slowest = sorted(((time, name) for name, time in runs[0].items() if "." not in name and name != "training"), reverse=True)
+    print("Slowest imports:")
+    for time, name in slowest[:10]:
+        print(f"  {name:<40} {time * 1000:8.1f}ms")
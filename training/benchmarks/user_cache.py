@@ -0,0 +1,28 @@
+'''
+Benchmarks a UserCache round trip, the set, get and delete of a sign-in
+token, against Redis.
+'''
+from redis.exceptions import ConnectionError
+
+from training.data import UserCache
+from training.data.user_cache import redis
+from training.schemas import TempUser
+from .runner import Bench, SkipSuite, suite
+
+
+@suite("user_cache")
+def user_cache_benchmarks(bench: Bench) -> None:
+    try:
+        redis.ping()
+    except ConnectionError as e:
+        raise SkipSuite(f"Redis isn't available: {e}")
+
+    cache = UserCache()
+    user = TempUser(email="leopold.bloom@example.gov", name="Leopold Bloom", agency_id=1)
+
+    def round_trip() -> None:
+        token = cache.set(user)
+        cache.get(token)
+        cache.delete(token)
+
+    bench.run("UserCache round trip", round_trip, rounds=1000)
@@ -0,0 +1,187 @@
+'''
+Compresses responses with Brotli or gzip, whichever the client prefers of
+those it accepts.
+
+Only responses of the COMPRESSION_CONTENT_TYPES, like JSON and the CSV
+reports, are compressed, and only once they're COMPRESSION_MINIMUM_SIZE
+bytes, since smaller ones don't get much smaller. Responses that already
+have a Content-Encoding, and the PDFs, which are compressed themselves, are
+sent as they are.
+
+The agency and quiz lists are the same for every user and rarely change, so
+their compressed bodies are cached, keyed by a hash of the body, and
+compressed at the highest level once instead of for every request.
+'''
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+
+import brotli
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from training.config import settings
+from training.metrics import route_template
+
+# In order of preference
+ENCODINGS = ("br", "gzip")
+
+# Levels for responses compressed per request, which are a good trade of
+# speed for size, and for cached bodies, which are compressed once
+BROTLI_QUALITY = 4
+BROTLI_CACHED_QUALITY = 11
+GZIP_LEVEL = 6
+GZIP_CACHED_LEVEL = 9
+
+# Bodies this big are compressed in the threadpool rather than on the event loop
+THREADPOOL_SIZE = 256 * 1024
+
+
+def accepted_encoding(accept_encoding: str) -> str | None:
+    '''
+    Returns the preferred encoding of ENCODINGS that an Accept-Encoding
+    header accepts, or None.
+    '''
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+
+    accepted = [encoding for encoding in ENCODINGS if qualities.get(encoding, qualities.get("*", 0.0)) > 0]
+    if not accepted:
+        return None
+    return max(accepted, key=lambda encoding: qualities.get(encoding, qualities.get("*", 0.0)))
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_CACHED_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    '''
+    Compresses a streamed response a chunk at a time, flushing each chunk so
+    the client gets it as soon as it's sent.
+    '''
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._gzip.compress(chunk) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._gzip.flush()
+
+
+class CompressionMiddleware:
+    '''
+    Compresses the responses to clients that send an Accept-Encoding header.
+    The compressed bodies of `cached_routes`, given as route templates like
+    `/api/v1/agencies`, are cached.
+    '''
+    def __init__(
+        self,
+        app: ASGIApp,
+        cached_routes: tuple[str, ...] = (),
+        minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE,
+        content_types: list[str] = settings.COMPRESSION_CONTENT_TYPES,
+        cache_size: int = settings.COMPRESSION_CACHE_SIZE,
+    ) -> None:
+        self.app = app
+        self.cached_routes = set(cached_routes)
+        self.minimum_size = minimum_size
+        self.content_types = set(content_types)
+        self.cache_size = cache_size
+        # Only used on the event loop, so it doesn't need a lock
+        self._cache: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        compressor: _StreamCompressor | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                if self._compressible(message):
+                    # Held until the first body message shows how big the response is
+                    start = message
+                else:
+                    await send(message)
+                return
+            if message["type"] == "http.response.body" and compressor is not None:
+                more_body = message.get("more_body", False)
+                message["body"] = compressor.compress(message.get("body", b"")) + (b"" if more_body else compressor.finish())
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(scope=start)
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # A streamed response, compressed as it's sent
+                compressor = _StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                del headers["Content-Length"]
+                message["body"] = compressor.compress(body)
+            elif len(body) >= self.minimum_size:
+                message["body"] = await self._compress(scope, body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(message["body"]))
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.content_types and "content-encoding" not in headers
+
+    async def _compress(self, scope: Scope, body: bytes, encoding: str) -> bytes:
+        if route_template(scope) not in self.cached_routes or self.cache_size <= 0:
+            if len(body) >= THREADPOOL_SIZE:
+                return await run_in_threadpool(compress, body, encoding)
+            return compress(body, encoding)
+
+        key = (encoding, hashlib.sha256(body).digest())
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            return compressed
+        compressed = await run_in_threadpool(compress, body, encoding, True)
+        self._cache[key] = compressed
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return compressed
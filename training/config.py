@@ -1,8 +1,9 @@
+import os
+from datetime import datetime
 from typing import Tuple, Type
 from pydantic import EmailStr
 from pydantic.fields import FieldInfo
 from typing import Dict, Any
-from cfenv import AppEnv
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict
 
 
@@ -20,6 +21,11 @@ class VcapSettingsSource(PydanticBaseSettingsSource):
         '''
         Parse settings from the VCAP_SERVICES environment variable.
         '''
+        # Only set on cloud.gov, so cfenv isn't imported anywhere else
+        if "VCAP_SERVICES" not in os.environ:
+            return {}
+        from cfenv import AppEnv
+
         appenv = AppEnv()
         config = {}
 
@@ -83,6 +89,106 @@ class Settings(BaseSettings):
     REDIS_PASSWORD: str
     REDIS_TLS: bool = False
     DB_URI: str
+    # Optional read replica. Report and listing queries use it when set,
+    # otherwise they fall back to DB_URI.
+    DB_REPLICA_URI: str | None = None
+
+    # Connection pool settings, per worker process. Each gunicorn worker
+    # (NUM_WORKERS per instance) can open up to DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # connections, which needs to fit within the RDS connection limit.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before giving up
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    # Seconds after which connections are replaced
+    DB_POOL_RECYCLE: int = 1800
+    # Log a warning when a request waits longer than this many seconds for a connection
+    DB_POOL_WAIT_WARNING: float = 1.0
+
+    # Postgres statement timeouts in milliseconds. Interactive routes use the
+    # default, report downloads get a longer one. 0 disables the timeout.
+    DB_STATEMENT_TIMEOUT: int = 15000
+    DB_REPORT_STATEMENT_TIMEOUT: int = 120000
+    # Statements slower than this many milliseconds are logged with the route
+    # that ran them. 0 disables the log.
+    DB_SLOW_QUERY_THRESHOLD: int = 500
+
+    # The number of verified JWTs whose claims are kept in memory, so each
+    # token's signature is only checked once. 0 turns the cache off.
+    JWT_CACHE_SIZE: int = 4096
+    # The JWTs only carry the user's id and roles. The rest of their profile
+    # is kept in Redis for this many seconds after it's read from the
+    # database, and dropped when the user is edited.
+    USER_PROFILE_CACHE_TTL: int = 60 * 60
+    # Seconds the JWTs issued at sign-in are valid for
+    JWT_TTL: int = 60 * 60 * 8
+    # JWTs issued before the compact format carry the whole user and don't
+    # expire. They're accepted until this time, after which their users have
+    # to sign in again. None accepts them indefinitely.
+    LEGACY_JWT_ACCEPTED_UNTIL: datetime | None = datetime.fromisoformat("2026-12-01T00:00:00+00:00")
+
+    # Bearer token Prometheus uses to scrape /metrics. Admin users can also
+    # read /metrics with their own JWT.
+    METRICS_TOKEN: str | None = None
+
+    # Tracing is off by default. Set to "console" to write spans to stdout or
+    # "file" to append them to TRACING_FILE, one JSON object per line.
+    TRACING_EXPORTER: str | None = None
+    TRACING_FILE: str = "traces.jsonl"
+
+    # Profiling: admins can profile a request by sending their JWT in an
+    # X-Profile header. A fraction of all requests, between 0 and 1, can also
+    # be profiled at random. Profiles are kept in Redis for PROFILE_TTL seconds.
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_TTL: int = 60 * 60 * 24 * 7
+
+    # Responses of these content types are compressed with Brotli or gzip,
+    # when the client accepts it, once they're at least
+    # COMPRESSION_MINIMUM_SIZE bytes. The compressed bodies of the agency and
+    # quiz lists, which rarely change, are cached for the
+    # COMPRESSION_CACHE_SIZE most recent bodies.
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_CONTENT_TYPES: list[str] = ["application/json", "application/csv", "text/csv", "text/plain"]
+    COMPRESSION_CACHE_SIZE: int = 32
+
+    # Task queue: jobs are kept in Redis and run by the worker process. A job
+    # that raises is retried after TASK_RETRY_BACKOFF seconds, doubling with
+    # each attempt up to TASK_RETRY_BACKOFF_MAX, and moved to its queue's dead
+    # letters after TASK_MAX_ATTEMPTS attempts. A job that isn't finished
+    # within TASK_VISIBILITY_TIMEOUT seconds, e.g. because its worker was
+    # stopped, is run again. Each worker runs TASK_WORKER_CONCURRENCY jobs at
+    # a time.
+    TASK_MAX_ATTEMPTS: int = 5
+    TASK_RETRY_BACKOFF: int = 30
+    TASK_RETRY_BACKOFF_MAX: int = 60 * 60
+    TASK_VISIBILITY_TIMEOUT: int = 5 * 60
+    TASK_WORKER_CONCURRENCY: int = 4
+
+    # Rate limits, as [requests, seconds], by route and by what the requests
+    # are counted per. Requests over a limit get a 429 with a Retry-After
+    # header. GSPC invites are counted per invited email. Set a limit to
+    # null to turn it off.
+    RATE_LIMITS: dict[str, tuple[int, int] | None] = {
+        "get-link:email": (5, 15 * 60),
+        "get-link:ip": (50, 15 * 60),
+        "gspc-invite:user": (1000, 60 * 60),
+        "gspc-invite:ip": (20, 60 * 60),
+    }
+    # Quiz and GSPC submissions sent with an Idempotency-Key header are only
+    # processed once per key and user: repeats within IDEMPOTENCY_TTL seconds
+    # get the first response again. A repeat sent while the first is still
+    # being processed waits up to IDEMPOTENCY_WAIT seconds for its response.
+    # An unfinished request holds its key for at most IDEMPOTENCY_LOCK_TTL
+    # seconds, in case its process stops.
+    IDEMPOTENCY_TTL: int = 60 * 60 * 24
+    IDEMPOTENCY_LOCK_TTL: int = 60
+    IDEMPOTENCY_WAIT: float = 10.0
+
+    # The number of proxies in front of the app that add to X-Forwarded-For,
+    # used to find the client's IP for the rate limits. cloud.gov has its load
+    # balancer and router. 0 uses the address of the connection.
+    TRUSTED_PROXY_COUNT: int = 2
 
     # Authentication settings. The client ID is normally parsed from
     # VCAP_SERVICES in Cloud Foundry. The authority URL should be set in the
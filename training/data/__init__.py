@@ -1 +1,6 @@
 from .user_cache import UserCache
+from .profile_store import ProfileStore
+from .task_queue import TaskQueue
+from .rate_limiter import RateLimiter
+from .idempotency_store import IdempotencyStore
+from .user_profile_cache import UserProfileCache
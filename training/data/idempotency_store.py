@@ -0,0 +1,59 @@
+import json
+from typing import Any
+from uuid import uuid4
+
+from training.config import settings
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from .user_cache import redis
+
+# Deletes the key only while it still holds the caller's pending record
+_RELEASE = '''
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+'''
+
+
+class IdempotencyStore:
+    '''
+    Accessor methods for the responses to requests sent with an
+    Idempotency-Key, kept in the redis cache. A request claims its key with
+    a pending record, which expires after IDEMPOTENCY_LOCK_TTL seconds, and
+    replaces it with the response once it's done. Each record holds a
+    fingerprint of the request, so a key can't be reused for another one.
+    '''
+
+    PREFIX = "idempotency"
+
+    def __init__(self):
+        self._release = redis.register_script(_RELEASE)
+
+    def claim(self, key: str, fingerprint: str) -> tuple[str | None, dict[str, Any] | None]:
+        '''
+        Claims `key` for a request. Returns a token to save or release the
+        claim with, or, if the key is already taken, None and its record.
+        '''
+        token = str(uuid4())
+        pending = json.dumps({"state": "pending", "fingerprint": fingerprint, "token": token})
+        with count_outcome(REDIS_OPERATIONS, operation="idempotency_claim"):
+            if redis.set(self._key(key), pending, nx=True, px=settings.IDEMPOTENCY_LOCK_TTL * 1000):
+                return token, None
+            record = redis.get(self._key(key))
+        # None if the other request released the key in the meantime
+        return None, json.loads(record) if record else None
+
+    def save(self, key: str, fingerprint: str, status_code: int, body: Any) -> None:
+        record = {"state": "done", "fingerprint": fingerprint, "status_code": status_code, "body": body}
+        with count_outcome(REDIS_OPERATIONS, operation="idempotency_save"):
+            redis.set(self._key(key), json.dumps(record), ex=settings.IDEMPOTENCY_TTL)
+
+    def release(self, key: str, fingerprint: str, token: str) -> None:
+        '''
+        Frees the key of a request that failed, so it can be retried.
+        '''
+        pending = json.dumps({"state": "pending", "fingerprint": fingerprint, "token": token})
+        self._release(keys=[self._key(key)], args=[pending])
+
+    def _key(self, key: str) -> str:
+        return f"{self.PREFIX}:{key}"
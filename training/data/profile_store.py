@@ -0,0 +1,45 @@
+import time
+from typing import Literal
+
+from training.config import settings
+from training.schemas import RequestProfile
+from .user_cache import redis
+
+
+class ProfileStore:
+    '''
+    Accessor methods for request profiles kept in the redis cache, so they can
+    be downloaded from any instance. Each profile is stored as a cProfile
+    dump, loadable with pstats or snakeviz, and as a text report.
+    '''
+
+    PROFILE_TTL = settings.PROFILE_TTL
+    INDEX_KEY = "profiles"
+
+    def save(self, profile: RequestProfile, prof: bytes, text: str) -> None:
+        key = self._key(profile.id)
+        created = profile.created_on.timestamp()
+        pipeline = redis.pipeline()
+        pipeline.hset(key, mapping={"summary": profile.model_dump_json(), "prof": prof, "text": text})
+        pipeline.expire(key, self.PROFILE_TTL)
+        pipeline.zadd(self.INDEX_KEY, {profile.id: created})
+        pipeline.zremrangebyscore(self.INDEX_KEY, 0, time.time() - self.PROFILE_TTL)
+        pipeline.execute()
+
+    def list(self) -> list[RequestProfile]:
+        '''
+        Returns the stored profiles, newest first.
+        '''
+        ids = redis.zrevrange(self.INDEX_KEY, 0, -1)
+        if not ids:
+            return []
+        pipeline = redis.pipeline()
+        for id in ids:
+            pipeline.hget(self._key(id.decode()), "summary")
+        return [RequestProfile.model_validate_json(summary) for summary in pipeline.execute() if summary]
+
+    def get(self, id: str, format: Literal["prof", "text"]) -> bytes | None:
+        return redis.hget(self._key(id), format)
+
+    def _key(self, id: str) -> str:
+        return f"profile:{id}"
@@ -0,0 +1,46 @@
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from .user_cache import redis
+
+# GCRA, a token bucket that only needs to store one timestamp per key: the
+# theoretical arrival time, when the bucket would be full again. A request
+# of cost n is allowed if the bucket has room for n more requests, otherwise
+# the script returns the seconds until it will. Redis's clock is used so all
+# of the instances agree.
+_HIT = '''
+local limit, period, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local interval = period / limit
+local tat = math.max(tonumber(redis.call("GET", KEYS[1])) or now, now)
+local new_tat = tat + interval * cost
+local allowed_at = new_tat - period
+if allowed_at > now then
+    return tostring(allowed_at - now)
+end
+redis.call("SET", KEYS[1], tostring(new_tat), "PX", math.ceil((new_tat - now) * 1000))
+return "0"
+'''
+
+
+class RateLimiter:
+    '''
+    Accessor methods for the rate limit counters kept in the redis cache. A
+    limit of `limit` requests per `period` seconds allows a burst of up to
+    `limit` requests, after which one more is allowed every period / limit
+    seconds.
+    '''
+
+    PREFIX = "rate-limit"
+
+    def __init__(self):
+        self._hit = redis.register_script(_HIT)
+
+    def hit(self, name: str, key: str, limit: int, period: int, cost: int = 1) -> float:
+        '''
+        Counts a request of `cost` against the limit `name` for `key`, and
+        returns 0 if it's allowed, or else the seconds until it would be.
+        Rejected requests aren't counted.
+        '''
+        with count_outcome(REDIS_OPERATIONS, operation="rate_limit"):
+            retry_after = self._hit(keys=[f"{self.PREFIX}:{name}:{key}"], args=[limit, period, cost])
+        return float(retry_after)
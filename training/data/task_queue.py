@@ -0,0 +1,159 @@
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from training.config import settings
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from training.schemas import TaskJob
+from .user_cache import redis
+
+# Moves the queue's delayed jobs that are due and the running jobs whose
+# visibility timeout has passed back to the queue, then claims the oldest
+# job: it's added to the running jobs until ARGV[2] and its attempts are
+# counted. Retried jobs go to the back of the queue, jobs whose worker
+# stopped go to the front. The job hashes aren't in KEYS, which is fine on
+# a single Redis instance.
+_CLAIM = '''
+local due = redis.call("ZRANGEBYSCORE", KEYS[2], "-inf", ARGV[1], "LIMIT", 0, 100)
+for _, id in ipairs(due) do
+    redis.call("ZREM", KEYS[2], id)
+    redis.call("LPUSH", KEYS[1], id)
+end
+local expired = redis.call("ZRANGEBYSCORE", KEYS[3], "-inf", ARGV[1], "LIMIT", 0, 100)
+for _, id in ipairs(expired) do
+    redis.call("ZREM", KEYS[3], id)
+    redis.call("RPUSH", KEYS[1], id)
+end
+local id = redis.call("RPOP", KEYS[1])
+if not id then
+    return false
+end
+redis.call("ZADD", KEYS[3], ARGV[2], id)
+redis.call("HINCRBY", ARGV[3] .. id, "attempts", 1)
+return id
+'''
+
+
+class TaskQueue:
+    '''
+    Accessor methods for the named job queues kept in the redis cache, which
+    the worker process (training.tasks.worker) runs the jobs from. Each queue
+    has a list of jobs ready to run, a sorted set of jobs waiting for a retry,
+    a sorted set of jobs being run with their visibility deadline, and a list
+    of dead letters, the jobs that used up their attempts. A job is run at
+    least once: if its worker stops before the job is finished, it's run
+    again once its visibility timeout passes.
+    '''
+
+    PREFIX = "tasks"
+
+    def __init__(self):
+        self._claim = redis.register_script(_CLAIM)
+
+    def enqueue(self, task: str, queue: str, args: list, max_attempts: int = settings.TASK_MAX_ATTEMPTS) -> str:
+        return self.enqueue_many(task, queue, [args], max_attempts)[0]
+
+    def enqueue_many(self, task: str, queue: str, args_list: list[list], max_attempts: int = settings.TASK_MAX_ATTEMPTS) -> list[str]:
+        '''
+        Adds a job for each of the argument lists in one round trip, and
+        returns their ids.
+        '''
+        enqueued_on = datetime.now()
+        jobs = [
+            TaskJob(id=str(uuid4()), task=task, queue=queue, args=list(args), max_attempts=max_attempts, enqueued_on=enqueued_on)
+            for args in args_list
+        ]
+        pipeline = redis.pipeline()
+        for job in jobs:
+            pipeline.hset(self._job_key(job.id), mapping={"job": job.model_dump_json(exclude={"attempts", "error"}), "attempts": 0})
+            pipeline.lpush(self._key(queue, "ready"), job.id)
+        with count_outcome(REDIS_OPERATIONS, operation="enqueue"):
+            pipeline.execute()
+        return [job.id for job in jobs]
+
+    def claim(self, queue: str, visibility_timeout: int = settings.TASK_VISIBILITY_TIMEOUT) -> TaskJob | None:
+        '''
+        Claims the next job of the queue for `visibility_timeout` seconds, or
+        returns None if there's none ready.
+        '''
+        now = time.time()
+        id = self._claim(
+            keys=[self._key(queue, "ready"), self._key(queue, "delayed"), self._key(queue, "running")],
+            args=[now, now + visibility_timeout, self._job_key("")]
+        )
+        if id is None:
+            return None
+        id = id.decode()
+        job = self.get(id)
+        if job is None:
+            # Finished by a worker that outlived its visibility timeout
+            redis.zrem(self._key(queue, "running"), id)
+        return job
+
+    def get(self, id: str) -> TaskJob | None:
+        fields = redis.hgetall(self._job_key(id))
+        if not fields:
+            return None
+        job = TaskJob.model_validate_json(fields[b"job"])
+        job.attempts = int(fields[b"attempts"])
+        job.error = fields[b"error"].decode() if b"error" in fields else None
+        return job
+
+    def complete(self, job: TaskJob) -> None:
+        pipeline = redis.pipeline()
+        pipeline.zrem(self._key(job.queue, "running"), job.id)
+        pipeline.delete(self._job_key(job.id))
+        pipeline.execute()
+
+    def retry(self, job: TaskJob, delay: float, error: str) -> None:
+        '''
+        Puts the job back on its queue once `delay` seconds have passed.
+        '''
+        pipeline = redis.pipeline()
+        pipeline.zrem(self._key(job.queue, "running"), job.id)
+        pipeline.hset(self._job_key(job.id), "error", error)
+        pipeline.zadd(self._key(job.queue, "delayed"), {job.id: time.time() + delay})
+        pipeline.execute()
+
+    def dead_letter(self, job: TaskJob, error: str) -> None:
+        '''
+        Moves the job to its queue's dead letters, where it's kept until it's
+        requeued.
+        '''
+        pipeline = redis.pipeline()
+        pipeline.zrem(self._key(job.queue, "running"), job.id)
+        pipeline.hset(self._job_key(job.id), "error", error)
+        pipeline.lpush(self._key(job.queue, "dead"), job.id)
+        pipeline.execute()
+
+    def dead_letters(self, queue: str) -> list[TaskJob]:
+        '''
+        Returns the queue's dead letters, newest first.
+        '''
+        jobs = [self.get(id.decode()) for id in redis.lrange(self._key(queue, "dead"), 0, -1)]
+        return [job for job in jobs if job is not None]
+
+    def requeue_dead(self, queue: str) -> int:
+        '''
+        Puts the queue's dead letters back on the queue with their attempts
+        reset, and returns how many there were.
+        '''
+        count = 0
+        while (id := redis.rpoplpush(self._key(queue, "dead"), self._key(queue, "ready"))) is not None:
+            redis.hset(self._job_key(id.decode()), "attempts", 0)
+            count += 1
+        return count
+
+    def counts(self, queue: str) -> dict[str, int]:
+        pipeline = redis.pipeline()
+        pipeline.llen(self._key(queue, "ready"))
+        pipeline.zcard(self._key(queue, "delayed"))
+        pipeline.zcard(self._key(queue, "running"))
+        pipeline.llen(self._key(queue, "dead"))
+        return dict(zip(("ready", "delayed", "running", "dead"), pipeline.execute()))
+
+    def _key(self, queue: str, name: str) -> str:
+        return f"{self.PREFIX}:{queue}:{name}"
+
+    def _job_key(self, id: str) -> str:
+        return f"{self.PREFIX}:job:{id}"
@@ -4,6 +4,8 @@ from typing import Optional
 from redis import Redis
 
 from training.config import settings
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from training.tracing import traced
 from training.schemas import TempUser, UserCreate
 
 
@@ -24,19 +26,25 @@ class UserCache:
 
     CACHE_TTL = settings.EMAIL_TOKEN_TTL
 
+    @traced()
     def get(self, token: str) -> Optional[UserCreate]:
-        user = redis.get(token)
+        with count_outcome(REDIS_OPERATIONS, operation="get"):
+            user = redis.get(token)
         if user:
             user = json.loads(user)
             return UserCreate.model_validate(user)
 
+    @traced()
     def set(self, user: TempUser) -> str:
         token = str(uuid4())
         user_str = user.model_dump_json()
         # try/except here
-        redis.set(token, user_str)
-        redis.expire(token, self.CACHE_TTL)
+        with count_outcome(REDIS_OPERATIONS, operation="set"):
+            redis.set(token, user_str)
+            redis.expire(token, self.CACHE_TTL)
         return token
 
+    @traced()
     def delete(self, token: str):
-        redis.delete(token)
+        with count_outcome(REDIS_OPERATIONS, operation="delete"):
+            redis.delete(token)
@@ -0,0 +1,41 @@
+import json
+from typing import Any
+
+from training.config import settings
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from training.schemas import UserJWT
+from training.tracing import traced
+from .user_cache import redis
+
+
+class UserProfileCache:
+    '''
+    Accessor methods for signed in users' profiles kept in the redis cache.
+    The JWTs we issue only carry a user's id and roles, the rest of the user,
+    like their name, agency and report agencies, is looked up here. Profiles
+    are deleted when the user is edited and otherwise expire after
+    USER_PROFILE_CACHE_TTL seconds.
+    '''
+
+    PREFIX = "user-profile"
+    CACHE_TTL = settings.USER_PROFILE_CACHE_TTL
+
+    @traced()
+    def get(self, user_id: int) -> dict[str, Any] | None:
+        with count_outcome(REDIS_OPERATIONS, operation="get"):
+            profile = redis.get(self._key(user_id))
+        if profile:
+            return json.loads(profile)
+
+    @traced()
+    def set(self, user: UserJWT) -> None:
+        with count_outcome(REDIS_OPERATIONS, operation="set"):
+            redis.set(self._key(user.id), user.model_dump_json(), ex=self.CACHE_TTL)
+
+    @traced()
+    def delete(self, user_id: int) -> None:
+        with count_outcome(REDIS_OPERATIONS, operation="delete"):
+            redis.delete(self._key(user_id))
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.PREFIX}:{user_id}"
@@ -1 +1,4 @@
-from .database import db_uri, engine, SessionLocal
+from .database import (db_uri, engine, SessionLocal, replica_engine, ReplicaSessionLocal, checkout,
+                       pool_metrics, replica_pool_metrics)
+from .async_database import (async_engine, AsyncSessionLocal, async_replica_engine, AsyncReplicaSessionLocal,
+                             async_checkout, async_pool_metrics, async_replica_pool_metrics)
@@ -0,0 +1,76 @@
+import logging
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from training.config import settings
+from .database import PoolMetrics, db_uri
+
+
+def _create_async_engine(uri: str, pooled: bool = True) -> AsyncEngine:
+    '''
+    Creates an asyncpg engine for `uri`. Unpooled engines open a connection
+    per checkout, for callers that don't keep a single event loop running.
+    '''
+    url = make_url(uri).set(drivername="postgresql+asyncpg")
+    # asyncpg takes the SSL mode as a connect argument rather than in the URI
+    ssl = url.query.get("sslmode", "prefer")
+    url = url.difference_update_query(["sslmode"])
+    if pooled:
+        pool_options = {
+            'pool_size': settings.DB_POOL_SIZE,
+            'max_overflow': settings.DB_MAX_OVERFLOW,
+            'pool_timeout': settings.DB_POOL_TIMEOUT,
+            'pool_pre_ping': settings.DB_POOL_PRE_PING,
+            'pool_recycle': settings.DB_POOL_RECYCLE,
+        }
+    else:
+        pool_options = {'poolclass': NullPool}
+    return create_async_engine(
+        url,
+        **pool_options,
+        connect_args={
+            'ssl': ssl,
+            'server_settings': {'statement_timeout': str(settings.DB_STATEMENT_TIMEOUT)},
+        },
+    )
+
+
+# The async engines have their own pools, separate from the sync engines used
+# by the routes that still run in the threadpool.
+async_engine = _create_async_engine(db_uri)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if settings.DB_REPLICA_URI:
+    async_replica_engine = _create_async_engine(settings.DB_REPLICA_URI.replace("postgres://", "postgresql://"))
+else:
+    async_replica_engine = async_engine
+
+AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+
+async_pool_metrics = PoolMetrics(async_engine.sync_engine, "async_primary")
+async_replica_pool_metrics = (
+    PoolMetrics(async_replica_engine.sync_engine, "async_replica") if async_replica_engine is not async_engine else async_pool_metrics
+)
+
+
+async def async_checkout(session: AsyncSession) -> None:
+    '''
+    Checks a connection out of the pool for `session`, recording how long that
+    took. The async counterpart of `checkout`.
+    '''
+    bind = session.get_bind()
+    metrics = async_replica_pool_metrics if bind is async_replica_engine.sync_engine else async_pool_metrics
+    start = time.perf_counter()
+    try:
+        await session.connection()
+    except exc.TimeoutError:
+        metrics.record_timeout()
+        logging.error(f"Timed out waiting for a DB connection: {bind.pool.status()}")
+        raise
+    wait = time.perf_counter() - start
+    metrics.record_checkout(wait)
+    if wait > settings.DB_POOL_WAIT_WARNING:
+        logging.warning(f"Waited {wait:.2f}s for a DB connection: {bind.pool.status()}")
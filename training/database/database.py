@@ -1,12 +1,151 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import logging
+import os
+import time
+from threading import Lock
+from sqlalchemy import Connection, Engine, create_engine, event, exc, text
+from sqlalchemy.orm import Session, sessionmaker
 from training.config import settings
+from training import metrics
 
 
 # cloud.gov provides the URI in postgres:// format, but SQLAlchemy requires
 # PostgreSQL URIs to use postgresql://
 db_uri = settings.DB_URI.replace("postgres://", "postgresql://")
 
-engine = create_engine(db_uri, connect_args={'sslmode': 'prefer'})
+
+def _create_engine(uri: str) -> Engine:
+    return create_engine(
+        uri,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            'sslmode': 'prefer',
+            'options': f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}',
+        },
+    )
+
+
+engine = _create_engine(db_uri)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Read-only queries that can tolerate replication lag (reports and listings)
+# can use the replica. Without one, these sessions use the primary.
+if settings.DB_REPLICA_URI:
+    replica_engine = _create_engine(settings.DB_REPLICA_URI.replace("postgres://", "postgresql://"))
+else:
+    replica_engine = engine
+
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+
+class PoolMetrics:
+    '''
+    Counts how long sessions wait to check a connection out of the pool.
+    These are per worker process. The same measurements are also exported to
+    /metrics, labeled with the pool `name`.
+    '''
+    def __init__(self, engine: Engine, name: str) -> None:
+        self._engine = engine
+        self._lock = Lock()
+        self.name = name
+        self._gauges_pid: int | None = None
+        self.reset()
+
+        checked_out = metrics.DB_CONNECTIONS_CHECKED_OUT.labels(pool=name)
+
+        def on_checkout(*args) -> None:
+            self._set_pool_gauges()
+            checked_out.inc()
+
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", lambda *args: checked_out.dec())
+
+    def _set_pool_gauges(self) -> None:
+        '''
+        Sets the pool size gauges, which are summed across workers, once in
+        each process that uses the pool. They aren't set when the pool is
+        created because gunicorn creates it in the master, before forking the
+        workers, and a forked worker's gauges start over at 0.
+        '''
+        pid = os.getpid()
+        if self._gauges_pid != pid:
+            self._gauges_pid = pid
+            metrics.DB_POOL_SIZE.labels(pool=self.name).set(settings.DB_POOL_SIZE)
+            metrics.DB_POOL_MAX_OVERFLOW.labels(pool=self.name).set(settings.DB_MAX_OVERFLOW)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_checkout(self, wait: float) -> None:
+        self._set_pool_gauges()
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        metrics.DB_POOL_WAIT.labels(pool=self.name).observe(wait)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+        metrics.DB_POOL_TIMEOUTS.labels(pool=self.name).inc()
+
+    def snapshot(self) -> dict:
+        pool = self._engine.pool
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "pool_size": pool.size(),  # type: ignore
+                "checked_out": pool.checkedout(),  # type: ignore
+                "overflow": pool.overflow(),  # type: ignore
+            }
+
+
+pool_metrics = PoolMetrics(engine, "primary")
+replica_pool_metrics = PoolMetrics(replica_engine, "replica") if replica_engine is not engine else pool_metrics
+
+
+def checkout(session: Session, statement_timeout: int | None = None) -> None:
+    '''
+    Checks a connection out of the pool for `session`, recording how long that
+    took. If `statement_timeout` (milliseconds) is given it replaces the
+    default statement timeout for every transaction the session runs.
+    '''
+    bind = session.get_bind()
+    metrics = replica_pool_metrics if bind is replica_engine else pool_metrics
+    start = time.perf_counter()
+    try:
+        connection = session.connection()
+    except exc.TimeoutError:
+        metrics.record_timeout()
+        logging.error(f"Timed out waiting for a DB connection: {bind.pool.status()}")
+        raise
+    wait = time.perf_counter() - start
+    metrics.record_checkout(wait)
+    if wait > settings.DB_POOL_WAIT_WARNING:
+        logging.warning(f"Waited {wait:.2f}s for a DB connection: {bind.pool.status()}")
+
+    if statement_timeout is not None:
+        _set_statement_timeout(connection, statement_timeout)
+        # Repositories may commit part way through a request, so apply it again
+        # to each new transaction
+        event.listen(
+            session, "after_begin",
+            lambda session, transaction, connection: _set_statement_timeout(connection, statement_timeout)
+        )
+
+
+def _set_statement_timeout(connection: Connection, statement_timeout: int) -> None:
+    # This is the transaction-local form of SET, so the setting does not leak
+    # to the next user of the pooled connection.
+    connection.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {"timeout": str(statement_timeout)})
@@ -0,0 +1,119 @@
+'''
+Per-request SQL statistics. Listeners on every engine count the statements a
+request runs and the time spent in them, which QueryStatsMiddleware reports
+in a `Server-Timing` header. Statements slower than DB_SLOW_QUERY_THRESHOLD
+are logged along with the route that ran them.
+'''
+import logging
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from training.config import settings
+from training.metrics import DB_QUERIES_PER_REQUEST, route_template
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    # The ASGI scope of the request running the statements, if any
+    scope: Scope | None = field(default=None, repr=False)
+    # Only kept when collecting queries for tests
+    statements: list[str] | None = None
+
+    @property
+    def route(self) -> str:
+        # The route is read when it's needed, since it isn't known until the
+        # router has matched the request
+        if self.scope is None:
+            return "outside a request"
+        return f"{self.scope['method']} {route_template(self.scope)}"
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+# Sync routes run in the threadpool with a copy of the request's context, so
+# they update the same QueryStats object.
+_request_stats: ContextVar[QueryStats | None] = ContextVar("request_query_stats", default=None)
+_collectors: list[QueryStats] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for collector in _collectors:
+        collector.record(statement, duration)
+
+    if settings.DB_SLOW_QUERY_THRESHOLD and duration * 1000 > settings.DB_SLOW_QUERY_THRESHOLD:
+        route = stats.route if stats is not None else "outside a request"
+        logging.warning(f"Slow query ({duration * 1000:.0f}ms) from {route}: {statement}")
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context) -> None:
+    # after_cursor_execute isn't called for failed statements
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+@contextmanager
+def collect_queries() -> Generator[QueryStats, None, None]:
+    '''
+    Collects every statement run in this process while the block runs, from
+    any thread. Meant for tests and benchmarks rather than live requests.
+    '''
+    stats = QueryStats(statements=[])
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+class QueryStatsMiddleware:
+    '''
+    Counts the statements each request runs and adds them to the response in
+    a `Server-Timing` header, like `db;dur=12.5;desc="4 queries"`.
+    '''
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope=scope)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            DB_QUERIES_PER_REQUEST.labels(method=scope["method"], route=route_template(scope)).observe(stats.count)
@@ -0,0 +1,55 @@
+'''
+Fills the report_completions table the training reports are served from,
+and recounts the report_summaries counters from it.
+
+Completions are added to the table as they're graded, so this is only
+needed after data is loaded or changed in bulk, outside of the API:
+
+    python -m training.database.refresh_reports [--rebuild] [--item-analysis]
+
+By default the passed completions that are missing from the table are
+added. With `--rebuild` every row is replaced, which also picks up renamed
+agencies and quizzes. The summary counters are always recounted.
+
+With `--item-analysis` the quizzes' item analysis is also recounted from
+the responses of every completion, against each quiz's current content.
+'''
+import argparse
+import time
+
+from sqlalchemy import select, text
+from training import models
+from training.database import SessionLocal
+from training.repositories import QuizAnalysisRepository, ReportCompletionRepository, ReportSummaryRepository
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill the report_completions table from the quiz completions.")
+    parser.add_argument("--rebuild", action="store_true", help="replace every row rather than adding the missing ones")
+    parser.add_argument("--item-analysis", action="store_true", help="also recount the item analysis of every quiz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        # Millions of completions take longer than the default statement timeout
+        session.execute(text("SET LOCAL statement_timeout = 0"))
+        repo = ReportCompletionRepository(session)
+        if args.rebuild:
+            count = repo.rebuild()
+            print(f"Rebuilt report_completions with {count} rows")
+        else:
+            count = repo.backfill()
+            print(f"Added {count} rows to report_completions")
+        count = ReportSummaryRepository(session).rebuild()
+        print(f"Rebuilt report_summaries with {count} rows")
+        if args.item_analysis:
+            analysis = QuizAnalysisRepository(session)
+            for quiz_id, name in session.execute(select(models.Quiz.id, models.Quiz.name).order_by(models.Quiz.id)):
+                print(f"Counted {analysis.rebuild(quiz_id)} completions of {name} for the item analysis")
+        session.commit()
+
+    print(f"Done in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
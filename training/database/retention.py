@@ -0,0 +1,121 @@
+'''
+Maintenance of the partitioned quiz_completions table.
+
+quiz_completions is partitioned by year on submit_ts. This job adds the
+partitions for the coming years, so new completions never land in the
+default partition, and moves failed attempts older than the retention
+period, with their JSONB responses, to the quiz_completions_archive table:
+
+    python -m training.database.retention [--older-than-days 730] [--dry-run]
+
+Passed completions are kept, they back the certificates and reports. The
+archive is a table in the same database rather than a file, since a
+cloud.gov task's disk is thrown away when the task exits. The rows are
+moved in batches, each deleted and inserted into the archive in one
+transaction, so if the job stops part way nothing is lost and the next run
+carries on from where it was.
+
+Run it on a schedule, e.g. monthly as a cloud.gov task. Autovacuum reclaims
+the space of the deleted rows partition by partition.
+'''
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from training.database import SessionLocal
+
+# Failed attempts are kept in the database for two years
+RETENTION_DAYS = 730
+
+BATCH_SIZE = 10_000
+
+
+def ensure_partitions(session: Session, years_ahead: int = 1) -> list[str]:
+    '''
+    Adds the yearly partitions from this year through `years_ahead` years
+    from now that don't exist yet, and returns their names.
+    '''
+    this_year = session.execute(text("SELECT CAST(extract(year FROM now()) AS integer)")).scalar_one()
+    existing = set(session.scalars(text(
+        "SELECT CAST(inhrelid::regclass AS text) FROM pg_inherits WHERE inhparent = 'quiz_completions'::regclass"
+    )))
+    added = []
+    for year in range(this_year, this_year + years_ahead + 1):
+        name = f"quiz_completions_y{year}"
+        if name not in existing:
+            # Fails if the default partition already has rows for the year, move them out first
+            session.execute(text(
+                f"CREATE TABLE {name} PARTITION OF quiz_completions FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            ))
+            added.append(name)
+    return added
+
+
+def count_archivable(session: Session, before: datetime) -> int:
+    return session.execute(
+        text("SELECT count(*) FROM quiz_completions WHERE NOT passed AND submit_ts < :before"), {"before": before}
+    ).scalar_one()
+
+
+def archive_failed(session: Session, before: datetime, batch_size: int = BATCH_SIZE) -> int:
+    '''
+    Moves the failed completions submitted before `before` to the
+    quiz_completions_archive table and returns how many were moved. Each
+    batch is committed once it's moved.
+    '''
+    # Oldest first, with the partition key in the condition so only the old partitions are touched
+    statement = text('''
+        WITH moved AS (
+            DELETE FROM quiz_completions
+            WHERE (id, submit_ts) IN (
+                SELECT id, submit_ts FROM quiz_completions
+                WHERE NOT passed AND submit_ts < :before
+                ORDER BY submit_ts
+                LIMIT :batch_size
+            )
+            AND submit_ts < :before
+            RETURNING id, quiz_id, user_id, passed, submit_ts, responses
+        )
+        INSERT INTO quiz_completions_archive (id, quiz_id, user_id, passed, submit_ts, responses)
+        SELECT id, quiz_id, user_id, passed, submit_ts, responses FROM moved
+    ''')
+    archived = 0
+    while True:
+        moved = session.execute(statement, {"before": before, "batch_size": batch_size}).rowcount
+        session.commit()
+        if not moved:
+            return archived
+        archived += moved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add quiz_completions partitions and archive old failed attempts.")
+    parser.add_argument("--older-than-days", type=int, default=RETENTION_DAYS,
+                        help=f"archive failed attempts older than this (default {RETENTION_DAYS})")
+    parser.add_argument("--years-ahead", type=int, default=1, help="add partitions through this many years from now (default 1)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"rows deleted per transaction (default {BATCH_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="print what would be done without changing anything")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    before = datetime.now() - timedelta(days=args.older_than_days)
+
+    with SessionLocal() as session:
+        if args.dry_run:
+            print(f"Would archive {count_archivable(session, before)} failed attempts submitted before {before:%Y-%m-%d}")
+            return
+
+        for name in ensure_partitions(session, args.years_ahead):
+            print(f"Added partition {name}")
+        session.commit()
+
+        archived = archive_failed(session, before, args.batch_size)
+        print(f"Archived {archived} failed attempts submitted before {before:%Y-%m-%d}")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
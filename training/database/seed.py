@@ -1,104 +1,206 @@
+'''
+Bulk loader for the initial data in data/seedsdata.yaml.
+
+Used for initial loading only, it can not handle record updates. For data
+updates, please use DB migration scripts instead.
+
+The loader reads the current state of the database with a handful of
+queries, works out which seed records are missing, and writes them with
+multi-row `INSERT ... ON CONFLICT DO NOTHING` statements inside a single
+transaction. Run it with:
+
+    python -m training.database.seed [--dry-run] [--source PATH]
+
+With `--dry-run` the records that would be added are printed but nothing is
+written to the database.
+'''
+import argparse
 import os
+import time
+from typing import Any
 
 import yaml
-from training import models
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from training import models, schemas
 from training.database import SessionLocal
-from training.schemas import AgencyCreate, UserCreate, RoleCreate
-from training.repositories import AgencyRepository, UserRepository, RoleRepository
-
-# used initial loading only, it can not handle record update properly. For data update, please use DB migration scripts instead
-seed_source = os.path.join(os.path.dirname(__file__), "..", "..", "data", "seedsdata.yaml")
-with open(seed_source) as f:
-    data = yaml.safe_load(f)
-agency_repo = AgencyRepository(SessionLocal())
-
-for item in data["agencies"]:
-    agency = AgencyCreate(name=item['name'], bureau=item['bureau'])
-    print("Agency:", agency.name, "Bureau:", agency.bureau, end=" - ")
-    if agency_repo.find_by_name(agency):
-        print("already exists, skipping")
-    else:
-        agency_repo.create(agency)
-        print("added")
-
-role_repo = RoleRepository(SessionLocal())
-
-for item in data["roles"]:
-    role = RoleCreate(name=item['name'])
-    print("role:", role.name, end=" - ")
-    if role_repo.find_by_name(role.name):
-        print("already exists, skipping")
-    else:
-        role_repo.create(role)
-        print("added")
-
-user_repo = UserRepository(SessionLocal())
-
-for item in data["admins"]:
-    fas = AgencyCreate(name="U.S. General Services Administration", bureau="Federal Acquisition Service")
-    smartpay_agency = agency_repo.find_by_name(fas)
-    user = UserCreate(name=item['name'], email=item['email'], agency_id=smartpay_agency.id)
-    print("User:", user.name, "Email:", user.email, "Agency_id:", smartpay_agency.id, end=" - ")
-    if user_repo.find_by_email(user.email):
-        print("already exists, skipping user add")
-    else:
-        user_repo.create(user)
-        print("added")
-    user_for_edit = user_repo.find_by_email(user.email)
-    admin_role_exists = any(role.name == "Admin" for role in user_for_edit.roles)
-    if admin_role_exists:
-        print("Admin role already exisits, skipping")
-    else:
-        role = user_repo._session.query(models.Role).filter(models.Role.name == "Admin").first()
-        user_for_edit.roles.append(role)
-        user_repo._session.commit()
-        print("Admin role added")
-
-# AOPCs data (initial load usage only)
-for item in data["AOPSs"]:
-    # find user's agency
-    user_agency = user_repo._session.query(models.Agency).filter(models.Agency.name == item['agency'], models.Agency.bureau == item['bureau']).first()
-    user = UserCreate(name=item['name'], email=item['email'], agency_id=user_agency.id)
-    print("AOPC User:", user.name, "email:", user.email, "user_agency:", user_agency.name, "user_bureau:", user_agency.bureau, end=" - ")
-    continue_aopc_data_loading = True
-    # if AOPC already exisiting, nitial load is done previously, skip the rest of process to advoid potential data conflicts since admin can modify AOPCs via UI
-    if user_repo.find_by_email(user.email):
-        print("already exists, skipping the process")
-        continue_aopc_data_loading = False
-    else:
-        user_repo.create(user)
-        continue_aopc_data_loading = True
-        print("added")
-
-    if continue_aopc_data_loading:
-        user_for_edit = user_repo.find_by_email(user.email)
-        report_role_exists = any(role.name == "Report" for role in user_for_edit.roles)
-        if report_role_exists:
-            print("Report role already exisits, skipping")
-        else:
-            role = user_repo._session.query(models.Role).filter(models.Role.name == "Report").first()
-            user_for_edit.roles.append(role)
-            user_repo._session.commit()
-            print("Report role added")
-        for objAgency in item['reporting_agencies']:
-            # check if report_bureau's value is "All", if yes, load all bureaus for this agency for reporting access
-            if objAgency['report_bureau'] == "All":
-                # if use "models.Agency.bureau is not None", parent agency is returned. seems SQLAchemy store string value of 'None' instead of object null.
-                user_report_agencies = user_repo._session.query(models.Agency).filter(models.Agency.name == objAgency['report_agency'],
-                                                                                      models.Agency.bureau != 'None').all()
-                for obj in user_report_agencies:
-                    if (obj in user_for_edit.report_agencies):
-                        print("Report Agency: ", obj.name, "Report bureau: ", obj.bureau,  " already exists, skipping")
-                    else:
-                        user_for_edit.report_agencies.append(obj)
-                        user_repo._session.commit()
-                        print("Report Agency: ", obj.name, "Report bureau: ", obj.bureau,  " added")
+
+SEED_SOURCE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "seedsdata.yaml")
+
+# Admins are all loaded into this agency
+ADMIN_AGENCY = ("U.S. General Services Administration", "Federal Acquisition Service")
+
+# Rows per INSERT statement
+BATCH_SIZE = 500
+
+
+def load_seed_data(source: str = SEED_SOURCE) -> dict:
+    # The libyaml based loader is much faster than the pure python one, when available
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(source) as f:
+        return yaml.load(f, Loader=loader)
+
+
+def seed(session: Session, data: dict, dry_run: bool = False) -> dict[str, list[tuple]]:
+    '''
+    Adds the records in `data` that are missing from the database and returns
+    the diff that was (or, in a dry run, would be) applied, keyed by table name.
+    Records are identified by their natural keys (agency name and bureau, role
+    name, user email) so the diff can be computed before any IDs exist.
+    '''
+    diff = diff_seed_data(session, data)
+    if not dry_run:
+        apply_diff(session, diff)
+    return diff
+
+
+def diff_seed_data(session: Session, data: dict) -> dict[str, list[tuple]]:
+    existing_agencies = set(session.execute(select(models.Agency.name, models.Agency.bureau)).tuples())
+    existing_roles = set(session.scalars(select(models.Role.name)))
+
+    new_agencies = _unique([(item["name"], item["bureau"]) for item in data["agencies"]], existing_agencies)
+    new_roles = _unique([item["name"] for item in data["roles"]], existing_roles)
+    all_agencies = existing_agencies | set(new_agencies)
+
+    emails = [item["email"].lower() for item in data["admins"] + data["AOPSs"]]
+    existing_users = set(session.scalars(select(models.User.email).where(models.User.email.in_(emails))))
+    existing_user_roles = set(session.execute(
+        select(models.User.email, models.Role.name)
+        .join(models.UserXRole, models.UserXRole.user_id == models.User.id)
+        .join(models.Role, models.UserXRole.role_id == models.Role.id)
+        .where(models.User.email.in_(emails))
+    ).tuples())
+
+    new_users = []
+    new_user_roles = []
+    new_report_agencies = []
+    seen_users = set(existing_users)
+
+    for item in data["admins"]:
+        email = item["email"].lower()
+        if email not in seen_users:
+            seen_users.add(email)
+            new_users.append((email, item["name"], *ADMIN_AGENCY))
+        if (email, "Admin") not in existing_user_roles and (email, "Admin") not in new_user_roles:
+            new_user_roles.append((email, "Admin"))
+
+    # AOPCs that already exist are skipped entirely, since admins can modify
+    # their reporting access through the UI after the initial load
+    for item in data["AOPSs"]:
+        email = item["email"].lower()
+        if email in seen_users:
+            continue
+        seen_users.add(email)
+        new_users.append((email, item["name"], item["agency"], item["bureau"]))
+        new_user_roles.append((email, "Report"))
+        for report_agency in item["reporting_agencies"]:
+            if report_agency["report_bureau"] == "All":
+                # All bureaus of the agency, but not the parent agency itself
+                agencies = sorted(
+                    (a for a in all_agencies if a[0] == report_agency["report_agency"] and a[1] is not None),
+                    key=lambda a: a[1]
+                )
             else:
-                user_report_agency = user_repo._session.query(models.Agency).filter(models.Agency.name == objAgency['report_agency'],
-                                                                                    models.Agency.bureau == objAgency['report_bureau']).first()
-                if (user_report_agency in user_for_edit.report_agencies):
-                    print("Report Agency: ", user_report_agency.name, "Report bureau: ", user_report_agency.bureau,  " already exists, skipping")
-                else:
-                    user_for_edit.report_agencies.append(user_report_agency)
-                    user_repo._session.commit()
-                    print("Report Agency: ", user_report_agency.name, "Report bureau: ", user_report_agency.bureau,  " added")
+                agencies = [(report_agency["report_agency"], report_agency["report_bureau"])]
+            for name, bureau in agencies:
+                if (email, name, bureau) not in new_report_agencies:
+                    new_report_agencies.append((email, name, bureau))
+
+    return {
+        "agencies": new_agencies,
+        "roles": new_roles,
+        "users": new_users,
+        "users_x_roles": new_user_roles,
+        "report_users_x_agencies": new_report_agencies,
+    }
+
+
+def apply_diff(session: Session, diff: dict[str, list[tuple]]) -> None:
+    '''
+    Writes a diff produced by `diff_seed_data` in one transaction.
+    '''
+    _insert(session, models.Agency, [{"name": name, "bureau": bureau} for name, bureau in diff["agencies"]])
+    _insert(session, models.Role, [{"name": name} for name in diff["roles"]])
+
+    agency_ids = {(name, bureau): id for name, bureau, id in
+                  session.execute(select(models.Agency.name, models.Agency.bureau, models.Agency.id))}
+    role_ids = dict(session.execute(select(models.Role.name, models.Role.id)).all())
+
+    # Validated like users added through the API, so a malformed email fails
+    # the load rather than being written
+    users = [
+        schemas.UserCreate(email=email, name=name, agency_id=agency_ids[(agency, bureau)])
+        for email, name, agency, bureau in diff["users"]
+    ]
+    _insert(session, models.User, [
+        {"email": user.email, "name": user.name, "agency_id": user.agency_id, "created_by": user.name}
+        for user in users
+    ])
+
+    emails = {row[0] for row in diff["users_x_roles"] + diff["report_users_x_agencies"]}
+    user_ids = dict(session.execute(
+        select(models.User.email, models.User.id).where(models.User.email.in_(emails))
+    ).all())
+
+    _insert(session, models.UserXRole, [
+        {"user_id": user_ids[email], "role_id": role_ids[role]}
+        for email, role in diff["users_x_roles"]
+    ])
+    _insert(session, models.ReportUserXAgency, [
+        {"user_id": user_ids[email], "agency_id": agency_ids[(name, bureau)]}
+        for email, name, bureau in diff["report_users_x_agencies"]
+    ])
+    session.commit()
+
+
+def _unique(keys: list, existing: set) -> list:
+    # Keeps the seed file order, dropping existing and duplicate keys
+    new_keys = []
+    seen = set(existing)
+    for key in keys:
+        if key not in seen:
+            seen.add(key)
+            new_keys.append(key)
+    return new_keys
+
+
+def _insert(session: Session, model: type[models.Base], rows: list[dict[str, Any]]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.execute(insert(model).values(rows[start:start + BATCH_SIZE]).on_conflict_do_nothing())
+
+
+def print_diff(diff: dict[str, list[tuple]]) -> None:
+    for table, rows in diff.items():
+        for row in rows:
+            print(f"+ {table}:", " / ".join(str(value) for value in (row if isinstance(row, tuple) else (row,))))
+    for table, rows in diff.items():
+        print(f"{table}: {len(rows)} to add")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load initial seed data into the database.")
+    parser.add_argument("--dry-run", action="store_true", help="print the records that would be added without writing them")
+    parser.add_argument("--source", default=SEED_SOURCE, help="path to the seed data yaml file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = load_seed_data(args.source)
+    loaded = time.perf_counter()
+
+    with SessionLocal() as session:
+        diff = diff_seed_data(session, data)
+        diffed = time.perf_counter()
+        print_diff(diff)
+        if args.dry_run:
+            print("Dry run, no changes written")
+        else:
+            apply_diff(session, diff)
+    done = time.perf_counter()
+
+    print(f"Read seed file in {loaded - start:.3f}s, computed diff in {diffed - loaded:.3f}s, "
+          f"wrote changes in {done - diffed:.3f}s, total {done - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+'''
+Fills a local database with production-scale synthetic data to run
+benchmarks, load tests and query plans against.
+
+The agency tree and roles come from data/seedsdata.yaml. On top of that it
+adds a quiz for each certificate, users spread across the agencies, quiz
+completions with JSONB responses, and GSPC invites and completions. The
+bulk tables are loaded with COPY, which is many times faster than INSERTs
+at these volumes. Run it with:
+
+    python -m training.database.synthetic [--users N] [--quiz-completions N] ...
+
+The data is added to whatever is already there. It refuses to write to a
+database that isn't on this machine unless `--force` is given.
+'''
+import argparse
+import io
+import json
+import random
+import time
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import Connection, select, text
+from sqlalchemy.orm import Session
+from training import models
+from training.database import SessionLocal, engine
+from training.database.seed import load_seed_data, seed
+from training.repositories import QuizAnalysisRepository, ReportCompletionRepository, ReportSummaryRepository
+from training.services.certificate import certificates
+
+# Rows per COPY statement
+COPY_BATCH_SIZE = 100_000
+
+# Questions in each synthetic quiz, and choices per question
+QUESTIONS_PER_QUIZ = 15
+CHOICES_PER_QUESTION = 4
+
+# Questions in the GSPC submission
+GSPC_QUESTIONS = 6
+
+# Distinct response documents generated per quiz, which the completions share
+RESPONSE_VARIANTS = 16
+
+# Share of quiz completions that pass
+PASS_RATE = 0.8
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+    "Maria", "Wei", "Aisha", "Juan", "Priya", "Mohammed", "Olga", "Kenji", "Fatima", "Leopold",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Nguyen", "Patel", "Kim", "Chen", "Okafor", "Kowalski", "Ivanova", "Tanaka", "Bloom",
+]
+
+
+@dataclass
+class SyntheticCounts:
+    users: int
+    quiz_completions: int
+    gspc_invites: int
+    gspc_completions: int
+    # The data is spread over this many years, ending now
+    years: int = 3
+
+
+def generate(connection: Connection, counts: SyntheticCounts, rng: random.Random) -> dict[str, int]:
+    '''
+    Adds the synthetic data in the transaction of `connection`, which is
+    left for the caller to commit. The agencies and roles must already be
+    loaded. Returns the number of rows added to each table.
+    '''
+    if counts.users < 1 and (counts.quiz_completions or counts.gspc_completions or counts.gspc_invites):
+        raise ValueError("Completions and invites need at least one user")
+    end = datetime.now(timezone.utc).timestamp()
+    start = end - counts.years * 365 * 24 * 60 * 60
+    # COPYing millions of rows takes longer than the default statement timeout
+    connection.execute(text("SET LOCAL statement_timeout = 0"))
+
+    quizzes = _quizzes(connection)
+    agency_ids = list(connection.scalars(select(models.Agency.id).order_by(models.Agency.id)))
+    # A few large agencies have most of the card holders
+    agency_weights = [1 / rank for rank in range(1, len(agency_ids) + 1)]
+    rng.shuffle(agency_weights)
+
+    first_user_id = _reserve_ids(connection, "users", counts.users)
+    created = array("d", (rng.uniform(start, end) for _ in range(counts.users)))
+    added = {}
+
+    def users() -> Iterator[str]:
+        agencies = rng.choices(agency_ids, agency_weights, k=counts.users)
+        for i in range(counts.users):
+            id = first_user_id + i
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield f"{id},{first.lower()}.{last.lower()}.{id}@example.gov,{first} {last},{agencies[i]},{_timestamp(created[i])},synthetic\n"
+
+    added["users"] = _copy(connection, "users", ["id", "email", "name", "agency_id", "created_on", "created_by"], users())
+
+    def quiz_completions() -> Iterator[str]:
+        for _ in range(counts.quiz_completions):
+            user = rng.randrange(counts.users)
+            quiz_id, passing, failing = rng.choice(quizzes)
+            passed = rng.random() < PASS_RATE
+            responses = rng.choice(passing if passed else failing)
+            yield f"{quiz_id},{first_user_id + user},{passed},{_timestamp(rng.uniform(created[user], end))},{responses}\n"
+
+    added["quiz_completions"] = _copy(
+        connection, "quiz_completions", ["quiz_id", "user_id", "passed", "submit_ts", "responses"], quiz_completions()
+    )
+
+    def gspc_invites() -> Iterator[str]:
+        for _ in range(counts.gspc_invites):
+            id = first_user_id + rng.randrange(counts.users)
+            invited = rng.uniform(start, end)
+            yield f"invitee.{id}@example.gov,{_timestamp(invited)},{_expiration(invited)}\n"
+
+    added["gspc_invite"] = _copy(connection, "gspc_invite", ["email", "created_date", "certification_expiration_date"], gspc_invites())
+
+    gspc_passing = [_csv_quote(_gspc_responses(rng, passed=True)) for _ in range(RESPONSE_VARIANTS)]
+    gspc_failing = [_csv_quote(_gspc_responses(rng, passed=False)) for _ in range(RESPONSE_VARIANTS)]
+
+    def gspc_completions() -> Iterator[str]:
+        for _ in range(counts.gspc_completions):
+            user = rng.randrange(counts.users)
+            submitted = rng.uniform(created[user], end)
+            passed = rng.random() < PASS_RATE
+            responses = rng.choice(gspc_passing if passed else gspc_failing)
+            yield f"{first_user_id + user},{passed},{_expiration(submitted)},{_timestamp(submitted)},{responses}\n"
+
+    added["gspc_completions"] = _copy(
+        connection, "gspc_completions", ["user_id", "passed", "certification_expiration_date", "submit_ts", "responses"], gspc_completions()
+    )
+
+    # The training reports read the passed completions from report_completions
+    session = Session(bind=connection)
+    added["report_completions"] = ReportCompletionRepository(session).backfill()
+    ReportSummaryRepository(session).rebuild()
+    # The item analysis reads counters kept per quiz
+    analysis = QuizAnalysisRepository(session)
+    for quiz_id, _, _ in quizzes:
+        analysis.rebuild(quiz_id)
+
+    # Give the planner statistics for the new rows
+    connection.execute(text(
+        "ANALYZE users, quiz_completions, report_completions, report_summaries, "
+        "quiz_version_stats, quiz_question_stats, quiz_choice_stats, gspc_invite, gspc_completions"
+    ))
+    return added
+
+
+def _quizzes(connection: Connection) -> list[tuple[int, list[str], list[str]]]:
+    '''
+    Adds a quiz for each certificate that doesn't have one and returns each
+    quiz's ID with passing and failing response documents for its questions,
+    quoted for CSV.
+    '''
+    existing = {name: (id, content) for name, id, content in
+                connection.execute(select(models.Quiz.name, models.Quiz.id, models.Quiz.content))}
+    rng = random.Random(0)
+    quizzes = []
+    for name in certificates:
+        if name not in existing:
+            content = _quiz_content(rng)
+            id = connection.execute(text(
+                "INSERT INTO quizzes (name, topic, audience, active, content) "
+                "VALUES (:name, :topic, :audience, true, CAST(:content AS jsonb)) RETURNING id"
+            ), {
+                "name": name,
+                "topic": next(topic for topic in ("Travel", "Purchase", "Fleet") if topic in name),
+                "audience": "ProgramCoordinators" if "Coordinators" in name else "AccountHoldersApprovingOfficials",
+                "content": json.dumps(content),
+            }).scalar_one()
+            existing[name] = (id, content)
+        id, content = existing[name]
+        quizzes.append((
+            id,
+            [_csv_quote(_quiz_responses(rng, content, passed=True)) for _ in range(RESPONSE_VARIANTS)],
+            [_csv_quote(_quiz_responses(rng, content, passed=False)) for _ in range(RESPONSE_VARIANTS)],
+        ))
+    return quizzes
+
+
+def _quiz_content(rng: random.Random) -> dict[str, Any]:
+    return {"questions": [
+        {
+            "id": question_id,
+            "text": f"Question {question_id + 1}",
+            "type": "MultipleChoiceSingleSelect",
+            "choices": [
+                {"id": choice_id, "text": f"Choice {choice_id + 1}", "correct": choice_id == correct}
+                for choice_id in range(CHOICES_PER_QUESTION)
+            ],
+        }
+        for question_id, correct in enumerate(rng.randrange(CHOICES_PER_QUESTION) for _ in range(QUESTIONS_PER_QUIZ))
+    ]}
+
+
+def _quiz_responses(rng: random.Random, content: dict[str, Any], passed: bool) -> str:
+    # 75% is a pass, so a failing submission gets at least a quarter of the questions wrong
+    questions = content["questions"]
+    wrong = set(rng.sample(range(len(questions)), rng.randint(0, len(questions) // 4) if passed else len(questions) // 4 + 1))
+    responses = []
+    for question in questions:
+        correct = [choice["id"] for choice in question["choices"] if choice["correct"]]
+        incorrect = [choice["id"] for choice in question["choices"] if not choice["correct"]]
+        response = incorrect[:1] if question["id"] in wrong and incorrect else correct
+        responses.append({"question_id": question["id"], "response_ids": response})
+    return json.dumps({"responses": responses})
+
+
+def _gspc_responses(rng: random.Random, passed: bool) -> str:
+    # A GSPC submission passes only when every answer is correct
+    wrong = -1 if passed else rng.randrange(GSPC_QUESTIONS)
+    return json.dumps({"responses": [
+        {"question_id": i, "question": f"Question {i + 1}", "response_id": int(i != wrong), "response": "Yes" if i != wrong else "No", "correct": i != wrong}
+        for i in range(GSPC_QUESTIONS)
+    ]})
+
+
+def _reserve_ids(connection: Connection, table: str, count: int) -> int:
+    '''
+    Moves the ID sequence of `table` past `count` IDs, so the rows can be
+    copied with known IDs, and returns the first of them.
+    '''
+    last = connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 0) FROM {table}) + :count)"
+    ), {"count": max(count, 1)}).scalar_one()
+    return last - count + 1
+
+
+def _copy(connection: Connection, table: str, columns: list[str], lines: Iterable[str]) -> int:
+    '''
+    Streams CSV `lines` into `table` with COPY, COPY_BATCH_SIZE rows at a
+    time, and returns the number of rows copied.
+    '''
+    started = time.perf_counter()
+    copied = 0
+    lines = iter(lines)
+    cursor = connection.connection.cursor()
+    try:
+        while batch := list(islice(lines, COPY_BATCH_SIZE)):
+            buffer = io.StringIO("".join(batch))
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            copied += len(batch)
+            print(f"{table}: {copied:,} rows", end="\r", flush=True)
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - started
+    print(f"{table}: {copied:,} rows in {elapsed:.1f}s ({copied / max(elapsed, 1e-9):,.0f} rows/s)")
+    return copied
+
+
+def _csv_quote(value: str) -> str:
+    # The lines are formatted by hand, csv.writer is much slower at quoting the same JSON documents over and over
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _expiration(ts: float) -> date:
+    # GSPC certifications are valid for about two years
+    return (datetime.fromtimestamp(ts, timezone.utc) + timedelta(days=730)).date()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fill a local database with production-scale synthetic data.")
+    parser.add_argument("--users", type=int, default=2_000_000, help="users to add (default 2,000,000)")
+    parser.add_argument("--quiz-completions", type=int, default=20_000_000, help="quiz completions to add (default 20,000,000)")
+    parser.add_argument("--gspc-invites", type=int, default=200_000, help="GSPC invites to add (default 200,000)")
+    parser.add_argument("--gspc-completions", type=int, default=100_000, help="GSPC completions to add (default 100,000)")
+    parser.add_argument("--years", type=int, default=3, help="years the data is spread over, ending now (default 3)")
+    parser.add_argument("--random-seed", type=int, default=0, help="seed for the random generator, the same seed generates the same data")
+    parser.add_argument("--force", action="store_true", help="write to the database even if it isn't on this machine")
+    args = parser.parse_args()
+
+    if engine.url.host not in ("localhost", "127.0.0.1", "::1") and not args.force:
+        parser.error(f"DB_URI points at {engine.url.host}, not a local database. Use --force to write to it anyway.")
+
+    start = time.perf_counter()
+    with SessionLocal() as session:
+        seed(session, load_seed_data())
+
+    counts = SyntheticCounts(args.users, args.quiz_completions, args.gspc_invites, args.gspc_completions, args.years)
+    with engine.begin() as connection:
+        generate(connection, counts, random.Random(args.random_seed))
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
 import logging
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from training.config import settings
 from training.api.api import api_router
+from training.api.idempotency import ReplayedResponse, replayed_response_handler
+from training.api.metrics import router as metrics_router
+from training.compression import CompressionMiddleware
+from training.metrics import MetricsMiddleware
+from training.database.query_stats import QueryStatsMiddleware
+from training.tracing import TracingMiddleware, configure_tracing
+from training.profiling import ProfilingMiddleware
 
 app = FastAPI(
-    title=settings.PROJECT_NAME
+    title=settings.PROJECT_NAME,
+    default_response_class=ORJSONResponse
 )
 origins = [
     "http://localhost",
@@ -26,7 +35,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# The agency and quiz lists' compressed bodies are cached
+app.add_middleware(CompressionMiddleware, cached_routes=(f"{settings.API_V1_STR}/agencies", f"{settings.API_V1_STR}/quizzes"))
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Added last so it's the outermost middleware and its span covers the others
+app.add_middleware(TracingMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_exception_handler(ReplayedResponse, replayed_response_handler)
+app.include_router(metrics_router)
+
+configure_tracing()
 
 logging.basicConfig(
     level=settings.LOG_LEVEL,
@@ -0,0 +1,174 @@
+'''
+Prometheus metrics for the API, exposed on the authenticated /metrics
+endpoint.
+
+Each gunicorn worker keeps its own metrics. When PROMETHEUS_MULTIPROC_DIR
+is set (see gunicorn.conf.py) the workers write them to files in that
+directory and /metrics reports the totals across all of the workers on the
+instance, rather than only the worker that happened to serve the scrape.
+'''
+import os
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Buckets for the database and request latencies, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = Counter(
+    "training_http_requests_total",
+    "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "training_http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "training_http_requests_in_progress",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_SIZE = Gauge(
+    "training_db_pool_size",
+    "Connections each pool keeps open, summed across workers",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_OVERFLOW = Gauge(
+    "training_db_pool_max_overflow",
+    "Extra connections each pool can open under load, summed across workers",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_CONNECTIONS_CHECKED_OUT = Gauge(
+    "training_db_connections_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "training_db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "training_db_pool_timeouts_total",
+    "Checkouts that timed out waiting for a free connection",
+    ["pool"],
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "training_db_queries_per_request",
+    "SQL statements run per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+
+REDIS_OPERATIONS = Counter(
+    "training_redis_operations_total",
+    "Redis operations by outcome",
+    ["operation", "outcome"],
+)
+RATE_LIMITED = Counter(
+    "training_rate_limited_total",
+    "Requests rejected by a rate limit",
+    ["limit"],
+)
+EMAILS_SENT = Counter(
+    "training_emails_sent_total",
+    "Emails sent through SMTP by outcome",
+    ["email", "outcome"],
+)
+PDF_RENDER_DURATION = Histogram(
+    "training_pdf_render_seconds",
+    "Time spent rendering certificate PDFs",
+    ["certificate"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+GRADING_DURATION = Histogram(
+    "training_grading_seconds",
+    "Time spent grading a submission, including saving it and emailing any certificate",
+    ["submission"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def count_outcome(counter: Counter, **labels: str) -> Generator[None, None, None]:
+    '''
+    Counts the wrapped block under `outcome="success"`, or `outcome="error"`
+    if it raises.
+    '''
+    try:
+        yield
+    except Exception:
+        counter.labels(**labels, outcome="error").inc()
+        raise
+    counter.labels(**labels, outcome="success").inc()
+
+
+class MetricsMiddleware:
+    '''
+    Records the count and latency of every HTTP request. Requests are labeled
+    with the route template, like `/api/v1/quizzes/{id}`, rather than the
+    path so the number of series stays bounded.
+    '''
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            labels = {
+                "method": scope["method"],
+                "route": route_template(scope),
+                "status": str(status_code),
+            }
+            HTTP_REQUESTS.labels(**labels).inc()
+            HTTP_REQUEST_DURATION.labels(**labels).observe(duration)
+
+
+def route_template(scope: Scope) -> str:
+    '''
+    Returns the template of the route that matched the request, or
+    "unmatched" when no route did.
+    '''
+    # The router adds the matched route to the scope
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+def render_metrics() -> bytes:
+    '''
+    Returns the metrics in the Prometheus text format.
+    '''
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
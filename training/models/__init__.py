@@ -3,8 +3,14 @@ from .agency import Agency
 from .user import User
 from .quiz import Quiz
 from .quiz_completion import QuizCompletion
+from .quiz_completion_archive import QuizCompletionArchive
 from .role import Role
 from .user_x_role import UserXRole
 from .report_user_x_agency import ReportUserXAgency
 from .gspc_invite import GspcInvite
 from .gspc_completion import GspcCompletion
+from .report_completion import ReportCompletion
+from .report_summary import ReportSummary
+from .quiz_version_stats import QuizVersionStats
+from .quiz_question_stats import QuizQuestionStats
+from .quiz_choice_stats import QuizChoiceStats
@@ -0,0 +1,15 @@
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey
+
+
+# How many times each choice of a quiz version's questions was selected, for
+# the item analysis.
+class QuizChoiceStats(Base):
+    __tablename__ = "quiz_choice_stats"
+
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), primary_key=True)
+    version: Mapped[str] = mapped_column(primary_key=True)
+    question_id: Mapped[int] = mapped_column(primary_key=True)
+    choice_id: Mapped[int] = mapped_column(primary_key=True)
+    selected: Mapped[int] = mapped_column()
@@ -5,12 +5,16 @@ from sqlalchemy import ForeignKey, func
 from typing import Any
 
 
+# The table is partitioned by year on submit_ts, with a primary key of
+# (id, submit_ts). The ids are unique on their own, so the model is mapped
+# by id alone. See training.database.retention.
 class QuizCompletion(Base):
     __tablename__ = "quiz_completions"
+    __table_args__ = {"postgresql_partition_by": "RANGE (submit_ts)"}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     passed: Mapped[bool] = mapped_column()
     submit_ts: Mapped[datetime] = mapped_column(server_default=func.now())
     responses: Mapped[dict[str, Any]] = mapped_column()
@@ -0,0 +1,20 @@
+from datetime import datetime
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import func
+from typing import Any
+
+
+# Failed quiz completions moved out of quiz_completions by the retention job,
+# see training.database.retention. Nothing reads them in the app, so the
+# table has no foreign keys or indexes beyond its primary key.
+class QuizCompletionArchive(Base):
+    __tablename__ = "quiz_completions_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    quiz_id: Mapped[int] = mapped_column()
+    user_id: Mapped[int] = mapped_column()
+    passed: Mapped[bool] = mapped_column()
+    submit_ts: Mapped[datetime] = mapped_column()
+    responses: Mapped[dict[str, Any]] = mapped_column()
+    archived_on: Mapped[datetime] = mapped_column(server_default=func.now())
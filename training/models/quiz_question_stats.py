@@ -0,0 +1,15 @@
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey
+
+
+# How many responses each question of a quiz version had, and how many were
+# correct, for the item analysis.
+class QuizQuestionStats(Base):
+    __tablename__ = "quiz_question_stats"
+
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), primary_key=True)
+    version: Mapped[str] = mapped_column(primary_key=True)
+    question_id: Mapped[int] = mapped_column(primary_key=True)
+    responses: Mapped[int] = mapped_column()
+    correct: Mapped[int] = mapped_column()
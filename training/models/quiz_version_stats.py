@@ -0,0 +1,14 @@
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey
+
+
+# Completion counts per quiz version, for the item analysis. A version is
+# the md5 of the quiz's content, see QuizAnalysisRepository.
+class QuizVersionStats(Base):
+    __tablename__ = "quiz_version_stats"
+
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), primary_key=True)
+    version: Mapped[str] = mapped_column(primary_key=True)
+    completions: Mapped[int] = mapped_column()
+    passed: Mapped[int] = mapped_column()
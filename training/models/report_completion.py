@@ -0,0 +1,31 @@
+from datetime import datetime
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, ForeignKeyConstraint, Index
+
+
+# One row per passed quiz completion, with the user, agency and quiz details
+# the training reports show, so the reports don't have to join them. Rows are
+# added when a completion is saved and updated when the user is edited, see
+# ReportCompletionRepository.
+class ReportCompletion(Base):
+    __tablename__ = "report_completions"
+
+    quiz_completion_id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    agency_id: Mapped[int] = mapped_column(ForeignKey("agencies.id"))
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"))
+    user_name: Mapped[str] = mapped_column()
+    user_email: Mapped[str] = mapped_column()
+    agency_name: Mapped[str] = mapped_column()
+    bureau: Mapped[str] = mapped_column(nullable=True)
+    quiz_name: Mapped[str] = mapped_column()
+    submit_ts: Mapped[datetime] = mapped_column()
+
+    __table_args__ = (
+        # quiz_completions is partitioned, its primary key includes submit_ts
+        ForeignKeyConstraint(["quiz_completion_id", "submit_ts"], ["quiz_completions.id", "quiz_completions.submit_ts"]),
+        # The order the reports are sorted in
+        Index("ix_report_completions_report_order", "agency_name", bureau.asc().nulls_first(), submit_ts.desc()),
+        Index("ix_report_completions_agency_id_submit_ts", "agency_id", "submit_ts"),
+    )
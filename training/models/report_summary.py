@@ -0,0 +1,17 @@
+from datetime import date
+from training.models import Base
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey
+
+
+# The number of passed quiz completions per agency (or bureau), quiz and
+# month, for the report summary. Counted as quizzes are graded, and rebuilt
+# from report_completions, see ReportSummaryRepository.
+class ReportSummary(Base):
+    __tablename__ = "report_summaries"
+
+    agency_id: Mapped[int] = mapped_column(ForeignKey("agencies.id"), primary_key=True)
+    quiz_id: Mapped[int] = mapped_column(ForeignKey("quizzes.id"), primary_key=True)
+    # The first day of the month
+    month: Mapped[date] = mapped_column(primary_key=True)
+    passed: Mapped[int] = mapped_column()
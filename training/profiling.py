@@ -0,0 +1,199 @@
+'''
+On-demand profiling of individual requests in production.
+
+A request is profiled when it carries an `X-Profile` header holding the JWT
+of an Admin user, or when it's picked at random at PROFILE_SAMPLE_RATE. The
+route's endpoint then runs under cProfile, the response gets an
+`X-Profile-Id` header, and the profile is saved with ProfileStore for admins
+to download from /api/v1/profiles.
+
+Sync endpoints are profiled in the threadpool thread that runs them. Async
+endpoints are profiled on the event loop, so their profiles can include
+other requests that were being served at the same time. Only one request
+per worker is profiled at a time, since cProfile can't run two profilers at
+once; a request picked while another is being profiled is served without
+one.
+'''
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+from uuid import uuid4
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from training.api.auth import decode_token
+from training.config import settings
+from training.data import ProfileStore
+from training.metrics import route_template
+from training.schemas import RequestProfile
+
+# Number of functions in the text report
+TEXT_REPORT_LIMIT = 60
+
+
+@dataclass
+class _ProfiledRequest:
+    sampled: bool
+    id: str = field(default_factory=lambda: str(uuid4()))
+    profiler: cProfile.Profile | None = None
+
+
+_current_request: ContextVar[_ProfiledRequest | None] = ContextVar("profiled_request", default=None)
+
+# Held while an endpoint runs under cProfile, by a threadpool thread or the event loop
+_profiler_lock = threading.Lock()
+
+
+def _start_profiler(request: _ProfiledRequest) -> bool:
+    '''
+    Starts profiling `request`, unless another request is being profiled.
+    '''
+    if not _profiler_lock.acquire(blocking=False):
+        logging.info(f"Not profiling request {request.id}, another request is being profiled")
+        return False
+    try:
+        request.profiler = cProfile.Profile()
+        request.profiler.enable()
+    except BaseException:
+        request.profiler = None
+        _profiler_lock.release()
+        raise
+    return True
+
+
+def _stop_profiler(request: _ProfiledRequest) -> None:
+    try:
+        request.profiler.disable()  # type: ignore[union-attr]
+    finally:
+        _profiler_lock.release()
+
+
+def profiled(endpoint: Callable) -> Callable:
+    '''
+    Wraps a route endpoint so that it runs under cProfile when the current
+    request is being profiled.
+    '''
+    # Including a router copies its routes, which would wrap them again
+    if getattr(endpoint, "_profiled", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            request = _current_request.get()
+            if request is None or not _start_profiler(request):
+                return await endpoint(*args, **kwargs)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _stop_profiler(request)
+        async_wrapper._profiled = True  # type: ignore[attr-defined]
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        request = _current_request.get()
+        # Sync endpoints run in the threadpool and cProfile only sees the
+        # thread it's enabled in, so it's enabled here rather than in the middleware
+        if request is None or not _start_profiler(request):
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _stop_profiler(request)
+    wrapper._profiled = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    '''
+    Route class for routers whose endpoints can be profiled:
+
+        router = APIRouter(route_class=ProfiledRoute)
+    '''
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class ProfilingMiddleware:
+    '''
+    Picks the requests to profile and saves their profiles once the response
+    has been sent.
+    '''
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.store = ProfileStore()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = self._profile_request(scope)
+        if request is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile_id(message: Message) -> None:
+            # Only if the endpoint ran under the profiler, which it has by the time the response starts
+            if message["type"] == "http.response.start" and request.profiler is not None:
+                MutableHeaders(scope=message).append("X-Profile-Id", request.id)
+            await send(message)
+
+        token = _current_request.set(request)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - start
+            _current_request.reset(token)
+            if request.profiler is not None:
+                await run_in_threadpool(self._save, scope, request, duration)
+
+    def _profile_request(self, scope: Scope) -> _ProfiledRequest | None:
+        token = Headers(scope=scope).get("x-profile")
+        if token:
+            if _is_admin(token):
+                return _ProfiledRequest(sampled=False)
+            logging.warning("Ignoring X-Profile header without an Admin JWT")
+        if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            return _ProfiledRequest(sampled=True)
+        return None
+
+    def _save(self, scope: Scope, request: _ProfiledRequest, duration: float) -> None:
+        profile = RequestProfile(
+            id=request.id,
+            method=scope["method"],
+            route=route_template(scope),
+            duration_ms=duration * 1000,
+            sampled=request.sampled,
+            created_on=datetime.now(timezone.utc),
+        )
+        text = io.StringIO()
+        stats = pstats.Stats(request.profiler, stream=text)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TEXT_REPORT_LIMIT)
+        try:
+            # The same format as pstats.Stats.dump_stats
+            self.store.save(profile, prof=marshal.dumps(stats.stats), text=text.getvalue())  # type: ignore[attr-defined]
+            logging.info(f"Saved profile {profile.id} of {profile.method} {profile.route} ({profile.duration_ms:.0f}ms)")
+        except Exception as e:
+            logging.error(f"Error saving profile {profile.id}: {e}")
+
+
+def _is_admin(token: str) -> bool:
+    user = decode_token(token)
+    return user is not None and "Admin" in user.get("roles", [])
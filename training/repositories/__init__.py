@@ -1,8 +1,11 @@
 from .agency import AgencyRepository
-from .user import UserRepository
-from .quiz import QuizRepository
-from .quiz_completion import QuizCompletionRepository
-from .certificate import CertificateRepository
+from .user import UserRepository, AsyncUserRepository
+from .quiz import QuizRepository, AsyncQuizRepository
+from .report_completion import ReportCompletionRepository, AsyncReportCompletionRepository
+from .report_summary import ReportSummaryRepository, AsyncReportSummaryRepository
+from .quiz_completion import QuizCompletionRepository, AsyncQuizCompletionRepository
+from .quiz_analysis import QuizAnalysisRepository, AsyncQuizAnalysisRepository
+from .certificate import CertificateRepository, AsyncCertificateRepository
 from .role import RoleRepository
 from .gspc_invite import GspcInviteRepository
 from .gspc_completion import GspcCompletionRepository
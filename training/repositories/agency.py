@@ -17,14 +17,29 @@ class AgencyRepository(BaseRepository[models.Agency]):
         db_agency = self.find_by_name(agency)
         if db_agency:
             raise Exception("record already exists in DB")
-        if agency.bureau and agency.bureau.strip() == '':
-            bureau_value = None
-        else:
-            bureau_value = agency.bureau
-        return self.save(models.Agency(name=agency.name, bureau=bureau_value))
+        return self.save(self._to_model(agency))
+
+    def create_many(self, agencies: list[schemas.AgencyCreate]) -> list[models.Agency]:
+        '''
+        Creates several agencies with a single existence check and a single
+        batched insert. Like `create`, raises if any of them already exist.
+        '''
+        keys = [(agency.name, _bureau(agency.bureau)) for agency in agencies]
+        existing = set(
+            (row.name, row.bureau) for row in
+            self._session.query(models.Agency.name, models.Agency.bureau).filter(models.Agency.name.in_(set(name for name, _ in keys)))
+        )
+        # Also the same agency given twice
+        if len(set(keys)) < len(keys) or any(key in existing for key in keys):
+            raise Exception("record already exists in DB")
+        return self.save_many([self._to_model(agency) for agency in agencies])
+
+    def _to_model(self, agency: schemas.AgencyCreate) -> models.Agency:
+        return models.Agency(name=agency.name, bureau=_bureau(agency.bureau))
 
     def find_by_name(self, agency: schemas.AgencyCreate) -> models.Agency | None:
-        return self._session.query(models.Agency).filter(models.Agency.name == agency.name, models.Agency.bureau == agency.bureau).first()
+        bureau = _bureau(agency.bureau)
+        return self._session.query(models.Agency).filter(models.Agency.name == agency.name, models.Agency.bureau == bureau).first()
 
     def get_agencies_with_bureaus(self) -> list[AgencyWithBureaus]:
         '''
@@ -56,3 +71,10 @@ class AgencyRepository(BaseRepository[models.Agency]):
                 'bureaus': [{"id": b.id, "name": b.bureau} for b in group]
             })
         return transform_angecies
+
+
+def _bureau(bureau: str | None) -> str | None:
+    # Agencies without a bureau are stored with a null one
+    if bureau is None or bureau.strip() == '':
+        return None
+    return bureau
@@ -0,0 +1,57 @@
+from typing import Any, Generic, Type, TypeVar
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from training import models
+from training.tracing import trace_methods
+
+
+T = TypeVar("T", bound=models.Base)
+
+
+@trace_methods
+class AsyncBaseRepository(Generic[T]):
+    '''
+    The asyncio counterpart of BaseRepository, for routes that run on the
+    event loop. Relationships can not be lazy loaded from an AsyncSession, so
+    queries that need them must load them eagerly.
+    '''
+
+    def __init__(self, session: AsyncSession, model: Type[T]):
+        self._session = session
+        self._model = model
+
+    def __init_subclass__(cls, **kwargs):
+        # Each repository call gets its own tracing span
+        super().__init_subclass__(**kwargs)
+        trace_methods(cls)
+
+    async def save(self, item: T, commit: bool = True) -> T:
+        self._session.add(item)
+        if not commit:
+            await self._session.flush()
+            return item
+        await self._session.commit()
+        await self._session.refresh(item)
+        return item
+
+    async def save_many(self, items: list[T], commit: bool = True) -> list[T]:
+        self._session.add_all(items)
+        await self._session.flush()
+        if commit:
+            await self.commit()
+        return items
+
+    async def commit(self) -> None:
+        await self._session.commit()
+
+    async def find_by_id(self, id: int) -> T | None:
+        return (await self._session.scalars(select(self._model).filter_by(id=id))).first()
+
+    async def find_all(self, filters: dict[str, Any] = {}) -> list[T]:
+        query = select(self._model)
+        for key, value in filters.items():
+            query = query.filter(getattr(self._model, key) == value)
+        return list((await self._session.scalars(query)).all())
+
+    async def delete_by_id(self, id: int) -> None:
+        await self._session.execute(delete(self._model).filter_by(id=id))
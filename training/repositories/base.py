@@ -1,23 +1,75 @@
 from typing import Any, Generic, Type, TypeVar
+from sqlalchemy import inspect, select, tuple_
 from sqlalchemy.orm import Session
 from training import models
+from training.tracing import trace_methods
 
 
 T = TypeVar("T", bound=models.Base)
 
 
+@trace_methods
 class BaseRepository(Generic[T]):
 
     def __init__(self, session: Session, model: Type[T]):
         self._session = session
         self._model = model
 
-    def save(self, item: T) -> T:
+    def __init_subclass__(cls, **kwargs):
+        # Each repository call gets its own tracing span
+        super().__init_subclass__(**kwargs)
+        trace_methods(cls)
+
+    def save(self, item: T, commit: bool = True) -> T:
+        '''
+        Adds a single item. With `commit=False` the item is only flushed, so it
+        gets its ID but the commit is left to the caller (see `commit`).
+        '''
         self._session.add(item)
+        if not commit:
+            self._session.flush()
+            return item
         self._session.commit()
         self._session.refresh(item)
         return item
 
+    def save_many(self, items: list[T], commit: bool = True) -> list[T]:
+        '''
+        Adds several items in one flush. SQLAlchemy sends the INSERTs as
+        multi-row statements and fills in the new IDs from RETURNING, so this
+        costs one round-trip per batch and a single commit, rather than an
+        INSERT, COMMIT and refreshing SELECT per item. The committed items are
+        reloaded with one SELECT, so reading them doesn't lazy load each one.
+        '''
+        self._session.add_all(items)
+        self._session.flush()
+        if commit:
+            identities = [inspect(item).identity for item in items]
+            self.commit()
+            self._reload(identities)
+        return items
+
+    def _reload(self, identities: list[tuple]) -> None:
+        '''
+        Loads the rows with the given primary keys, which refreshes the
+        session's expired instances of them in one query.
+        '''
+        if not identities:
+            return
+        primary_key = inspect(self._model).primary_key
+        if len(primary_key) == 1:
+            condition = primary_key[0].in_([identity[0] for identity in identities])
+        else:
+            condition = tuple_(*primary_key).in_(identities)
+        self._session.scalars(select(self._model).where(condition)).all()
+
+    def commit(self) -> None:
+        '''
+        Commits the work deferred by `save(..., commit=False)` and
+        `save_many(..., commit=False)`.
+        '''
+        self._session.commit()
+
     def find_by_id(self, id: int) -> T | None:
         return self._session.query(self._model).filter_by(id=id).first()
 
@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select, literal, select
 from training import models
 from training.schemas import UserCertificate, GspcCertificate, CertificateType, CertificateListValue
+from .async_base import AsyncBaseRepository
 from .base import BaseRepository
 
 
@@ -11,49 +13,75 @@ class CertificateRepository(BaseRepository[models.QuizCompletion]):
         super().__init__(session, models.QuizCompletion)
 
     def get_certificate_by_id(self, id: int) -> UserCertificate | None:
-
-        result = (self._session.query(models.QuizCompletion.id.label("id"), models.User.id.label("user_id"),
-                                      models.User.name.label("user_name"), models.Quiz.id.label("quiz_id"),
-                                      models.Agency.name.label("agency"), models.Quiz.name.label("quiz_name"),
-                                      models.QuizCompletion.submit_ts.label("completion_date")
-                                      )
-                               .join(models.User, models.QuizCompletion.user_id == models.User.id)
-                               .join(models.Agency, models.User.agency_id == models.Agency.id)
-                               .join(models.Quiz, models.QuizCompletion.quiz_id == models.Quiz.id)
-                               .filter(models.QuizCompletion.passed, models.QuizCompletion.id == id)
-                               .first())
-        return result
+        return self._session.execute(_certificate_by_id_query(id)).first()
 
     def get_all_certificates_by_userId(self, user_id: int) -> list[CertificateListValue]:
-        quiz_results = (self._session.query(models.QuizCompletion.id.label("id"), models.User.id.label("user_id"),
-                                            models.User.name.label("user_name"), models.Quiz.name.label("cert_title"),
-                                            models.QuizCompletion.submit_ts.label("completion_date"),
-                                            literal(CertificateType.QUIZ.value).label('certificate_type'))
-                            .join(models.User, models.QuizCompletion.user_id == models.User.id)
-                            .join(models.Agency, models.User.agency_id == models.Agency.id)
-                            .join(models.Quiz, models.QuizCompletion.quiz_id == models.Quiz.id)
-                            .filter(models.QuizCompletion.passed, models.User.id == user_id).all())
-
-        gspc_results = (self._session.query(models.GspcCompletion.id.label("id"), models.User.id.label("user_id"),
-                                            models.User.name.label("user_name"), literal("GSA SmartPay Program Certification (GSPC)").label('cert_title'),
-                                            models.GspcCompletion.submit_ts.label("completion_date"),
-                                            literal(CertificateType.GSPC.value).label('certificate_type'))
-                            .join(models.User, models.GspcCompletion.user_id == models.User.id)
-                            .join(models.Agency, models.User.agency_id == models.Agency.id)
-                            .filter(models.GspcCompletion.passed, models.User.id == user_id).all())
-
-        results = quiz_results + gspc_results
-        sorted_results = sorted(results, key=lambda x: x.completion_date, reverse=False)
-        return sorted_results
+        quiz_results = self._session.execute(_quiz_certificates_query(user_id)).all()
+        gspc_results = self._session.execute(_gspc_certificates_query(user_id)).all()
+        return _sort_certificates(quiz_results + gspc_results)
 
     def get_gspc_certificate_by_id(self, id: int) -> GspcCertificate | None:
+        return self._session.execute(_gspc_certificate_by_id_query(id)).first()
+
+
+class AsyncCertificateRepository(AsyncBaseRepository[models.QuizCompletion]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.QuizCompletion)
+
+    async def get_certificate_by_id(self, id: int) -> UserCertificate | None:
+        return (await self._session.execute(_certificate_by_id_query(id))).first()
+
+    async def get_all_certificates_by_userId(self, user_id: int) -> list[CertificateListValue]:
+        quiz_results = (await self._session.execute(_quiz_certificates_query(user_id))).all()
+        gspc_results = (await self._session.execute(_gspc_certificates_query(user_id))).all()
+        return _sort_certificates(quiz_results + gspc_results)
+
+
+# The queries are shared by the sync and async repositories
+
+def _certificate_by_id_query(id: int) -> Select:
+    return (select(models.QuizCompletion.id.label("id"), models.User.id.label("user_id"),
+                   models.User.name.label("user_name"), models.Quiz.id.label("quiz_id"),
+                   models.Agency.name.label("agency"), models.Quiz.name.label("quiz_name"),
+                   models.QuizCompletion.submit_ts.label("completion_date")
+                   )
+            .join(models.User, models.QuizCompletion.user_id == models.User.id)
+            .join(models.Agency, models.User.agency_id == models.Agency.id)
+            .join(models.Quiz, models.QuizCompletion.quiz_id == models.Quiz.id)
+            .filter(models.QuizCompletion.passed, models.QuizCompletion.id == id))
+
+
+def _quiz_certificates_query(user_id: int) -> Select:
+    return (select(models.QuizCompletion.id.label("id"), models.User.id.label("user_id"),
+                   models.User.name.label("user_name"), models.Quiz.name.label("cert_title"),
+                   models.QuizCompletion.submit_ts.label("completion_date"),
+                   literal(CertificateType.QUIZ.value).label('certificate_type'))
+            .join(models.User, models.QuizCompletion.user_id == models.User.id)
+            .join(models.Agency, models.User.agency_id == models.Agency.id)
+            .join(models.Quiz, models.QuizCompletion.quiz_id == models.Quiz.id)
+            .filter(models.QuizCompletion.passed, models.User.id == user_id))
+
+
+def _gspc_certificates_query(user_id: int) -> Select:
+    return (select(models.GspcCompletion.id.label("id"), models.User.id.label("user_id"),
+                   models.User.name.label("user_name"), literal("GSA SmartPay Program Certification (GSPC)").label('cert_title'),
+                   models.GspcCompletion.submit_ts.label("completion_date"),
+                   literal(CertificateType.GSPC.value).label('certificate_type'))
+            .join(models.User, models.GspcCompletion.user_id == models.User.id)
+            .join(models.Agency, models.User.agency_id == models.Agency.id)
+            .filter(models.GspcCompletion.passed, models.User.id == user_id))
+
+
+def _gspc_certificate_by_id_query(id: int) -> Select:
+    return (select(models.GspcCompletion.id.label("id"), models.User.id.label("user_id"),
+                   models.User.name.label("user_name"), models.Agency.name.label("agency"),
+                   models.GspcCompletion.submit_ts.label("completion_date"),
+                   models.GspcCompletion.certification_expiration_date.label("certification_expiration_date"))
+            .join(models.User, models.GspcCompletion.user_id == models.User.id)
+            .join(models.Agency, models.User.agency_id == models.Agency.id)
+            .filter(models.GspcCompletion.passed, models.GspcCompletion.id == id))
+
 
-        result = (self._session.query(models.GspcCompletion.id.label("id"), models.User.id.label("user_id"),
-                                      models.User.name.label("user_name"), models.Agency.name.label("agency"),
-                                      models.GspcCompletion.submit_ts.label("completion_date"),
-                                      models.GspcCompletion.certification_expiration_date.label("certification_expiration_date"))
-                  .join(models.User, models.GspcCompletion.user_id == models.User.id)
-                  .join(models.Agency, models.User.agency_id == models.Agency.id)
-                  .filter(models.GspcCompletion.passed, models.GspcCompletion.id == id)
-                  .first())
-        return result
+def _sort_certificates(results: list) -> list:
+    return sorted(results, key=lambda x: x.completion_date, reverse=False)
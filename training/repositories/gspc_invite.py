@@ -14,3 +14,9 @@ class GspcInviteRepository(BaseRepository[models.GspcInvite]):
             email=email,
             certification_expiration_date=certification_expiration_date
         ))
+
+    def create_many(self, emails: list[str], certification_expiration_date: datetime) -> list[models.GspcInvite]:
+        return self.save_many([
+            models.GspcInvite(email=email, certification_expiration_date=certification_expiration_date)
+            for email in emails
+        ])
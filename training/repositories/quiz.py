@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from training import models, schemas
+from .async_base import AsyncBaseRepository
 from .base import BaseRepository
 
 
@@ -32,3 +34,9 @@ class QuizRepository(BaseRepository[models.Quiz]):
         ))
 
         return new_quiz
+
+
+class AsyncQuizRepository(AsyncBaseRepository[models.Quiz]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.Quiz)
@@ -0,0 +1,199 @@
+from sqlalchemy import Text, cast, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from training import models, schemas
+from .async_base import AsyncBaseRepository
+from .base import BaseRepository
+
+# The answers of a quiz's stored completions, one row per question, and the
+# current answer key, read from the JSONB in bulk for the rebuild
+_ANSWERS = '''
+    WITH quiz AS (
+        SELECT id, md5(CAST(content AS text)) AS version, content FROM quizzes WHERE id = :quiz_id
+    ), answer_key AS (
+        SELECT CAST(question->>'id' AS integer) AS question_id,
+               COALESCE(jsonb_agg(choice->'id') FILTER (WHERE CAST(choice->>'correct' AS boolean)), '[]') AS correct_ids
+        FROM quiz, jsonb_array_elements(quiz.content->'questions') AS question, jsonb_array_elements(question->'choices') AS choice
+        GROUP BY 1
+    ), answers AS (
+        SELECT CAST(response->>'question_id' AS integer) AS question_id, response->'response_ids' AS response_ids
+        FROM quiz_completions, jsonb_array_elements(quiz_completions.responses->'responses') AS response
+        WHERE quiz_completions.quiz_id = :quiz_id
+    )
+'''
+
+_REBUILD_QUESTIONS = text(_ANSWERS + '''
+    INSERT INTO quiz_question_stats (quiz_id, version, question_id, responses, correct)
+    SELECT quiz.id, quiz.version, answer_key.question_id, count(*),
+           count(*) FILTER (WHERE answers.response_ids @> answer_key.correct_ids AND answer_key.correct_ids @> answers.response_ids)
+    FROM quiz, answers JOIN answer_key ON answers.question_id = answer_key.question_id
+    GROUP BY 1, 2, 3
+''')
+
+_REBUILD_CHOICES = text(_ANSWERS + '''
+    INSERT INTO quiz_choice_stats (quiz_id, version, question_id, choice_id, selected)
+    SELECT quiz.id, quiz.version, answer_key.question_id, CAST(choice_id AS integer), count(*)
+    FROM quiz, answers JOIN answer_key ON answers.question_id = answer_key.question_id,
+         LATERAL (SELECT DISTINCT choice_id FROM jsonb_array_elements_text(answers.response_ids) AS choice_id) AS selected
+    GROUP BY 1, 2, 3, 4
+''')
+
+_REBUILD_VERSION = text('''
+    INSERT INTO quiz_version_stats (quiz_id, version, completions, passed)
+    SELECT quizzes.id, md5(CAST(quizzes.content AS text)), count(*), count(*) FILTER (WHERE quiz_completions.passed)
+    FROM quizzes JOIN quiz_completions ON quiz_completions.quiz_id = quizzes.id
+    WHERE quizzes.id = :quiz_id
+    GROUP BY 1, 2
+''')
+
+
+class QuizAnalysisRepository(BaseRepository[models.QuizVersionStats]):
+    '''
+    Item analysis of the quizzes: how often each question is answered
+    correctly and each choice is selected, and the pass rate, per version of
+    the quiz's content. The counters are added to as quizzes are graded, see
+    AsyncQuizAnalysisRepository, so reading them doesn't scan the responses.
+    '''
+
+    def __init__(self, session: Session):
+        super().__init__(session, models.QuizVersionStats)
+
+    def get_analysis(self, quiz_id: int) -> schemas.QuizAnalysis | None:
+        row = self._session.execute(select(models.Quiz, _version(models.Quiz)).where(models.Quiz.id == quiz_id)).one_or_none()
+        if row is None:
+            return None
+        db_quiz, current_version = row
+        content = schemas.QuizContent.model_validate(db_quiz.content)
+
+        questions: dict[str, dict[int, models.QuizQuestionStats]] = {}
+        for question in self._session.scalars(select(models.QuizQuestionStats).where(models.QuizQuestionStats.quiz_id == quiz_id)):
+            questions.setdefault(question.version, {})[question.question_id] = question
+        choices: dict[tuple[str, int], dict[int, int]] = {}
+        for choice in self._session.scalars(select(models.QuizChoiceStats).where(models.QuizChoiceStats.quiz_id == quiz_id)):
+            choices.setdefault((choice.version, choice.question_id), {})[choice.choice_id] = choice.selected
+        versions = {
+            version.version: version
+            for version in self._session.scalars(select(models.QuizVersionStats).where(models.QuizVersionStats.quiz_id == quiz_id))
+        }
+        # The current version is listed even before it has any completions
+        versions.setdefault(current_version, models.QuizVersionStats(version=current_version, completions=0, passed=0))
+
+        results = []
+        for version in versions.values():
+            version_questions = []
+            if version.version == current_version:
+                # Every question and choice, with their text
+                for question in content.questions:
+                    stats = questions.get(version.version, {}).get(question.id)
+                    selected = choices.get((version.version, question.id), {})
+                    responses, correct = (stats.responses, stats.correct) if stats else (0, 0)
+                    version_questions.append(_question(question.id, responses, correct, [
+                        _choice(choice.id, selected.get(choice.id, 0), responses, choice.text, choice.correct) for choice in question.choices
+                    ], question.text))
+            else:
+                for question_id, stats in sorted(questions.get(version.version, {}).items()):
+                    selected = choices.get((version.version, question_id), {})
+                    version_questions.append(_question(question_id, stats.responses, stats.correct, [
+                        _choice(choice_id, count, stats.responses) for choice_id, count in sorted(selected.items())
+                    ]))
+            results.append(schemas.QuizVersionAnalysis(
+                version=version.version,
+                current=version.version == current_version,
+                completions=version.completions,
+                passed=version.passed,
+                pass_rate=_rate(version.passed, version.completions),
+                questions=version_questions
+            ))
+
+        # The current version first
+        results.sort(key=lambda v: not v.current)
+        return schemas.QuizAnalysis(quiz_id=db_quiz.id, name=db_quiz.name, versions=results)
+
+    def rebuild(self, quiz_id: int) -> int:
+        '''
+        Recounts the quiz's current version from every stored completion of
+        the quiz in a few set-based statements over the JSONB responses, and
+        returns the number of completions. Completions don't record the
+        content they were graded against, so they're all counted against the
+        current version; the counters of other versions are left alone.
+        '''
+        version = self._session.scalar(select(_version(models.Quiz)).where(models.Quiz.id == quiz_id))
+        for model in (models.QuizChoiceStats, models.QuizQuestionStats, models.QuizVersionStats):
+            self._session.execute(delete(model).where(model.quiz_id == quiz_id, model.version == version))
+        self._session.execute(_REBUILD_QUESTIONS, {"quiz_id": quiz_id})
+        self._session.execute(_REBUILD_CHOICES, {"quiz_id": quiz_id})
+        self._session.execute(_REBUILD_VERSION, {"quiz_id": quiz_id})
+        completions = self._session.scalar(
+            select(models.QuizVersionStats.completions).where(models.QuizVersionStats.quiz_id == quiz_id, models.QuizVersionStats.version == version)
+        )
+        return completions or 0
+
+
+class AsyncQuizAnalysisRepository(AsyncBaseRepository[models.QuizVersionStats]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.QuizVersionStats)
+
+    async def add_completion(self, quiz_id: int, passed: bool, questions: list[schemas.QuizGradeQuestion]) -> None:
+        '''
+        Counts a graded completion against the quiz's current version, in the
+        current transaction. QuizService commits it straight away, separately
+        from the completion, since every submission of the quiz locks the
+        same rows.
+        '''
+        version = await self._session.scalar(select(_version(models.Quiz)).where(models.Quiz.id == quiz_id))
+        if version is None:
+            return
+
+        await self._session.execute(_upsert(models.QuizVersionStats, [
+            {"quiz_id": quiz_id, "version": version, "completions": 1, "passed": int(passed)}
+        ]))
+        if questions:
+            await self._session.execute(_upsert(models.QuizQuestionStats, [
+                {"quiz_id": quiz_id, "version": version, "question_id": question.question_id, "responses": 1, "correct": int(question.correct)}
+                for question in questions
+            ]))
+        selected = [
+            {"quiz_id": quiz_id, "version": version, "question_id": question.question_id, "choice_id": choice_id, "selected": 1}
+            for question in questions
+            for choice_id in sorted(set(question.selected_ids))
+        ]
+        if selected:
+            await self._session.execute(_upsert(models.QuizChoiceStats, selected))
+
+
+def _version(quiz):
+    # Changing a quiz's content in any way starts a new version
+    return func.md5(cast(quiz.content, Text))
+
+
+def _upsert(model, rows: list[dict]):
+    '''
+    Inserts the rows, adding their counts to the rows that already exist.
+    '''
+    table = model.__table__
+    statement = insert(table).values(rows)
+    counters = [column.name for column in table.columns if not column.primary_key]
+    return statement.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={name: table.c[name] + statement.excluded[name] for name in counters}
+    )
+
+
+def _rate(count: int, total: int) -> float:
+    return count / total if total else 0.0
+
+
+def _question(
+    question_id: int, responses: int, correct: int, choices: list[schemas.QuizChoiceAnalysis], text: str | None = None
+) -> schemas.QuizQuestionAnalysis:
+    return schemas.QuizQuestionAnalysis(
+        question_id=question_id, text=text, responses=responses, correct=correct, difficulty=_rate(correct, responses), choices=choices
+    )
+
+
+def _choice(choice_id: int, selected: int, responses: int, text: str | None = None, correct: bool | None = None) -> schemas.QuizChoiceAnalysis:
+    return schemas.QuizChoiceAnalysis(
+        choice_id=choice_id, text=text, correct=correct, selected=selected, selection_rate=_rate(selected, responses)
+    )
@@ -1,6 +1,9 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from training import models, schemas
+from .async_base import AsyncBaseRepository
 from .base import BaseRepository
+from .report_completion import AsyncReportCompletionRepository, ReportCompletionRepository
 
 
 class QuizCompletionRepository(BaseRepository[models.QuizCompletion]):
@@ -9,9 +12,33 @@ class QuizCompletionRepository(BaseRepository[models.QuizCompletion]):
         super().__init__(session, models.QuizCompletion)
 
     def create(self, quiz_completion: schemas.QuizCompletionCreate) -> models.QuizCompletion:
-        return self.save(models.QuizCompletion(
-            quiz_id=quiz_completion.quiz_id,
-            user_id=quiz_completion.user_id,
-            passed=quiz_completion.passed,
-            responses=quiz_completion.responses
-        ))
+        db_quiz_completion = self.save(_to_model(quiz_completion), commit=False)
+        if db_quiz_completion.passed:
+            # The reports read passed completions from the fact table, add the row in the same transaction
+            ReportCompletionRepository(self._session).add(db_quiz_completion.id)
+        self.commit()
+        self._session.refresh(db_quiz_completion)
+        return db_quiz_completion
+
+
+class AsyncQuizCompletionRepository(AsyncBaseRepository[models.QuizCompletion]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.QuizCompletion)
+
+    async def create(self, quiz_completion: schemas.QuizCompletionCreate) -> models.QuizCompletion:
+        db_quiz_completion = await self.save(_to_model(quiz_completion), commit=False)
+        if db_quiz_completion.passed:
+            await AsyncReportCompletionRepository(self._session).add(db_quiz_completion.id)
+        await self.commit()
+        await self._session.refresh(db_quiz_completion)
+        return db_quiz_completion
+
+
+def _to_model(quiz_completion: schemas.QuizCompletionCreate) -> models.QuizCompletion:
+    return models.QuizCompletion(
+        quiz_id=quiz_completion.quiz_id,
+        user_id=quiz_completion.user_id,
+        passed=quiz_completion.passed,
+        responses=quiz_completion.responses
+    )
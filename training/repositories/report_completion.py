@@ -0,0 +1,88 @@
+from sqlalchemy import Select, delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from training import models
+from .async_base import AsyncBaseRepository
+from .base import BaseRepository
+
+_COLUMNS = ["quiz_completion_id", "user_id", "agency_id", "quiz_id", "user_name", "user_email", "agency_name", "bureau", "quiz_name", "submit_ts"]
+
+
+class ReportCompletionRepository(BaseRepository[models.ReportCompletion]):
+    '''
+    Maintains the report_completions fact table. Completions add their row
+    as they're saved, `backfill` and `rebuild` are for data that's changed in
+    bulk, see training.database.refresh_reports.
+    '''
+
+    def __init__(self, session: Session):
+        super().__init__(session, models.ReportCompletion)
+
+    def add(self, quiz_completion_id: int) -> None:
+        self._session.execute(_insert_facts(models.QuizCompletion.id == quiz_completion_id))
+
+    def update_user(self, user_id: int) -> None:
+        '''
+        Copies the user's current name, email and agency to their rows.
+        '''
+        self._session.execute(
+            update(models.ReportCompletion)
+            .where(models.ReportCompletion.user_id == models.User.id, models.User.agency_id == models.Agency.id, models.User.id == user_id)
+            .values(
+                user_name=models.User.name,
+                user_email=models.User.email,
+                agency_id=models.Agency.id,
+                agency_name=models.Agency.name,
+                bureau=models.Agency.bureau,
+            )
+        )
+
+    def backfill(self) -> int:
+        '''
+        Adds the passed completions that don't have a row yet and returns how
+        many were added.
+        '''
+        return self._session.execute(_insert_facts().on_conflict_do_nothing()).rowcount
+
+    def rebuild(self) -> int:
+        '''
+        Replaces every row, picking up renamed agencies and quizzes, and
+        returns the number of rows.
+        '''
+        self._session.execute(delete(models.ReportCompletion))
+        return self._session.execute(_insert_facts()).rowcount
+
+
+class AsyncReportCompletionRepository(AsyncBaseRepository[models.ReportCompletion]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.ReportCompletion)
+
+    async def add(self, quiz_completion_id: int) -> None:
+        await self._session.execute(_insert_facts(models.QuizCompletion.id == quiz_completion_id))
+
+
+def _insert_facts(*where):
+    return insert(models.ReportCompletion).from_select(_COLUMNS, _facts_query(*where))
+
+
+def _facts_query(*where) -> Select:
+    return (
+        select(
+            models.QuizCompletion.id,
+            models.User.id,
+            models.Agency.id,
+            models.Quiz.id,
+            models.User.name,
+            models.User.email,
+            models.Agency.name,
+            models.Agency.bureau,
+            models.Quiz.name,
+            models.QuizCompletion.submit_ts,
+        )
+        .join(models.User, models.QuizCompletion.user_id == models.User.id)
+        .join(models.Agency, models.User.agency_id == models.Agency.id)
+        .join(models.Quiz, models.QuizCompletion.quiz_id == models.Quiz.id)
+        .where(models.QuizCompletion.passed, *where)
+    )
@@ -0,0 +1,103 @@
+from sqlalchemy import Date, cast, delete, func, literal, nullsfirst, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from training import models
+from training.schemas import QuizCompletionSummaryData, SmartPayTrainingReportFilter
+from .async_base import AsyncBaseRepository
+from .base import BaseRepository
+
+
+class ReportSummaryRepository(BaseRepository[models.ReportSummary]):
+    '''
+    Reads and rebuilds the report_summaries counters. They're counted up as
+    quizzes are graded, see AsyncReportSummaryRepository, and are derived
+    from report_completions, so they can always be rebuilt from it.
+    '''
+
+    def __init__(self, session: Session):
+        super().__init__(session, models.ReportSummary)
+
+    def get_summary(self, filter: SmartPayTrainingReportFilter, agency_ids: list[int] | None) -> list[QuizCompletionSummaryData]:
+        '''
+        Returns the counts for the given agencies, or all of them. The
+        completion dates in the filter are rounded to their month.
+        '''
+        query = (
+            select(models.Agency.name, models.Agency.bureau, models.Quiz.name, models.ReportSummary.month, models.ReportSummary.passed)
+            .join(models.Agency, models.ReportSummary.agency_id == models.Agency.id)
+            .join(models.Quiz, models.ReportSummary.quiz_id == models.Quiz.id)
+        )
+
+        if agency_ids is not None:
+            query = query.where(models.ReportSummary.agency_id.in_(agency_ids))
+
+        if filter.completion_date_start is not None:
+            query = query.where(models.ReportSummary.month >= filter.completion_date_start.date().replace(day=1))
+
+        if filter.completion_date_end is not None:
+            query = query.where(models.ReportSummary.month <= filter.completion_date_end.date().replace(day=1))
+
+        if filter.quiz_names:
+            query = query.where(models.Quiz.name.in_(filter.quiz_names))
+
+        rows = self._session.execute(query.order_by(
+            models.Agency.name.asc(),
+            nullsfirst(models.Agency.bureau.asc()),
+            models.Quiz.name.asc(),
+            models.ReportSummary.month.asc()
+        ))
+        return [
+            QuizCompletionSummaryData(agency=agency, bureau=bureau, quiz=quiz, month=month, passed=passed)
+            for agency, bureau, quiz, month, passed in rows
+        ]
+
+    def refresh(self, agency_ids: list[int]) -> None:
+        '''
+        Recounts the given agencies, e.g. after users move between them.
+        '''
+        self._session.execute(delete(models.ReportSummary).where(models.ReportSummary.agency_id.in_(agency_ids)))
+        self._session.execute(_insert_counts(models.ReportCompletion.agency_id.in_(agency_ids)))
+
+    def rebuild(self) -> int:
+        '''
+        Recounts every agency and returns the number of counters.
+        '''
+        self._session.execute(delete(models.ReportSummary))
+        return self._session.execute(_insert_counts()).rowcount
+
+
+class AsyncReportSummaryRepository(AsyncBaseRepository[models.ReportSummary]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.ReportSummary)
+
+    async def add_passed(self, user_id: int, quiz_id: int) -> None:
+        '''
+        Counts a passed completion of the quiz by the user this month, in the
+        current transaction. QuizService commits it straight away, separately
+        from the completion, since every pass of the quiz by the agency this
+        month locks the same row.
+        '''
+        summary = models.ReportSummary
+        statement = insert(summary).from_select(
+            ["agency_id", "quiz_id", "month", "passed"],
+            select(models.User.agency_id, literal(quiz_id), _month(func.now()), literal(1)).where(models.User.id == user_id)
+        )
+        await self._session.execute(statement.on_conflict_do_update(
+            index_elements=[summary.agency_id, summary.quiz_id, summary.month],
+            set_={"passed": summary.passed + 1}
+        ))
+
+
+def _month(timestamp):
+    return cast(func.date_trunc("month", timestamp), Date)
+
+
+def _insert_counts(*where):
+    fact = models.ReportCompletion
+    month = _month(fact.submit_ts)
+    return insert(models.ReportSummary).from_select(
+        ["agency_id", "quiz_id", "month", "passed"],
+        select(fact.agency_id, fact.quiz_id, month, func.count()).where(*where).group_by(fact.agency_id, fact.quiz_id, month)
+    )
@@ -1,10 +1,16 @@
-from sqlalchemy import nullsfirst, or_
-from sqlalchemy.orm import Session
+import logging
+from redis.exceptions import RedisError
+from sqlalchemy import nullsfirst, or_, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from training import models, schemas
-from training.schemas import UserQuizCompletionReportData, UserSearchResult, SmartPayTrainingReportFilter
+from training.data import UserProfileCache
+from training.schemas import QuizCompletionSummaryData, UserQuizCompletionReportData, UserSearchResult, SmartPayTrainingReportFilter
+from .async_base import AsyncBaseRepository
 from .base import BaseRepository
+from .report_completion import ReportCompletionRepository
+from .report_summary import ReportSummaryRepository
 from datetime import datetime
-from collections import namedtuple
 
 
 class UserRepository(BaseRepository[models.User]):
@@ -13,7 +19,10 @@ class UserRepository(BaseRepository[models.User]):
         super().__init__(session, models.User)
 
     def create(self, user: schemas.UserCreate) -> models.User:
-        return self.save(models.User(email=user.email.lower(), name=user.name, agency_id=user.agency_id, created_by=user.name))
+        return self.save(_to_model(user))
+
+    def create_many(self, users: list[schemas.UserCreate]) -> list[models.User]:
+        return self.save_many([_to_model(user) for user in users])
 
     def find_by_email(self, email: str) -> models.User | None:
         return self._session.query(models.User).filter(models.User.email == email.lower()).first()
@@ -36,15 +45,19 @@ class UserRepository(BaseRepository[models.User]):
                     # if Report role is not in DB, add it to DB (should not happen if data is prepopulated properly via seed.py and no direct DB removal)
                     role = models.Role(name="Report")
                     self._session.add(role)
-                    self._session.commit()
                     db_user.roles.append(role)
         else:
             # if report_agencies_list =[], it will remove all user associated agencies and thus remove user report role.
             if len(report_role_exist) > 0:
                 db_user.roles = [obj for obj in db_user.roles if obj.name != "Report"]
         db_user.report_agencies.clear()
+        # Load all of the agencies in one query rather than one per agency
+        agencies = {
+            agency.id: agency for agency in
+            self._session.query(models.Agency).filter(models.Agency.id.in_(report_agencies_list))
+        }
         for agency_id in report_agencies_list:
-            agency = self._session.query(models.Agency).filter(models.Agency.id == agency_id).first()
+            agency = agencies.get(agency_id)
             if agency:
                 db_user.report_agencies.append(agency)
             else:
@@ -52,145 +65,99 @@ class UserRepository(BaseRepository[models.User]):
         db_user.modified_by = modified_by
         db_user.modified_on = datetime.now()
         self._session.commit()
+        _drop_cached_profile(user_id)
         return db_user
 
     def get_user_quiz_completion_report(self, filter: SmartPayTrainingReportFilter, report_user_id: int) -> list[UserQuizCompletionReportData]:
-        report_data = namedtuple("ReportData", ["name", "email", "agency", "bureau", "quiz", "completion_date"])
-        report_user = self.find_by_id(report_user_id)
+        return self._report(filter, self._report_user_agency_ids(filter, report_user_id))
 
-        # Build the query
-        query = (
-            self._session.query(
-                models.User.name,
-                models.User.email,
-                models.Agency.name,
-                models.Agency.bureau,
-                models.Quiz.name,
-                models.QuizCompletion.submit_ts
-            )
-            .select_from(models.User)
-            .join(models.Agency)
-            .join(models.QuizCompletion)
-            .join(models.Quiz)
-            .filter(models.QuizCompletion.passed)
-        )
+    def get_user_quiz_completion_summary(self, filter: SmartPayTrainingReportFilter, report_user_id: int) -> list[QuizCompletionSummaryData]:
+        '''
+        The number of passed completions per agency, bureau, quiz and month,
+        for the agencies the Report user has access to.
+        '''
+        return ReportSummaryRepository(self._session).get_summary(filter, self._report_user_agency_ids(filter, report_user_id))
+
+    def _report_user_agency_ids(self, filter: SmartPayTrainingReportFilter, report_user_id: int) -> list[int]:
+        report_user = self.find_by_id(report_user_id)
 
         if report_user and report_user.report_agencies:
-            # Dynamically add filters based on the properties of the SmartPayTrainingReportFilter
+            allowed_agency_ids = [obj.id for obj in report_user.report_agencies]
             if filter.bureau_id is not None:
-                query = query.filter(models.User.agency_id == filter.bureau_id)
+                return [filter.bureau_id]
             elif filter.agency_id is not None:
                 # if agency is selected and not the bureau, return all records associated to agency/bureau the user has access to
-                all_agencies = self._session.query(models.Agency).all()
-                selected_agency = [agency for agency in all_agencies if agency.id == filter.agency_id][0]
-                selected_agency_bureaus_ids = [agency.id for agency in all_agencies if agency.name == selected_agency.name]
-                allowed_agency_ids = [obj.id for obj in report_user.report_agencies]
-                filter_agencies = [x for x in allowed_agency_ids if x in selected_agency_bureaus_ids]
-                query = query.filter(models.User.agency_id.in_(filter_agencies))
+                selected_agency_bureaus_ids = self._agency_bureau_ids(filter.agency_id)
+                return [x for x in allowed_agency_ids if x in selected_agency_bureaus_ids]
             else:
-                allowed_agency_ids = [obj.id for obj in report_user.report_agencies]
-                query = query.filter(models.User.agency_id.in_(allowed_agency_ids))
-
-            if filter.completion_date_start is not None:
-                query = query.filter(models.QuizCompletion.submit_ts >= filter.completion_date_start)
-
-            if filter.completion_date_end is not None:
-                query = query.filter(models.QuizCompletion.submit_ts <= filter.completion_date_end)
-
-            if filter.quiz_names:
-                query = query.filter(models.Quiz.name.in_(filter.quiz_names))
-
-            raw_results = query.order_by(
-                models.Agency.name.asc(),
-                nullsfirst(models.Agency.bureau.asc()),
-                models.QuizCompletion.submit_ts.desc()
-            ).all()
-
-            # Map the results to the Pydantic model using the `ReportData` namedtuple
-            result = [
-                UserQuizCompletionReportData(
-                    name=row.name,
-                    email=row.email,
-                    agency=row.agency,
-                    bureau=row.bureau,
-                    quiz=row.quiz,
-                    completion_date=row.completion_date
-                )
-                for row in map(report_data._make, raw_results)
-            ]
-
-            return result
+                return allowed_agency_ids
         else:
             raise ValueError("Invalid Report User")
 
     def get_admin_smartpay_training_report(self, filter: SmartPayTrainingReportFilter) -> list[UserQuizCompletionReportData]:
-        report_data = namedtuple("ReportData", ["name", "email", "agency", "bureau", "quiz", "completion_date"])
-
-        # Build the query
-        query = (
-            self._session.query(
-                models.User.name,
-                models.User.email,
-                models.Agency.name,
-                models.Agency.bureau,
-                models.Quiz.name,
-                models.QuizCompletion.submit_ts
-            )
-            .select_from(models.User)
-            .join(models.Agency)
-            .join(models.QuizCompletion)
-            .join(models.Quiz)
-            .filter(models.QuizCompletion.passed)
-        )
-
-        # Dynamically add filters based on the properties of the SmartPayTrainingReportFilter
+        agency_ids = None
         if filter.bureau_id is not None:
-            query = query.filter(models.User.agency_id == filter.bureau_id)
+            agency_ids = [filter.bureau_id]
         elif filter.agency_id is not None:
             # if agency is selected and not the bureau, return all records associated to agency/bureau
-            all_agencies = self._session.query(models.Agency).all()
-            selected_agency = [agency for agency in all_agencies if agency.id == filter.agency_id][0]
-            selected_agency_bureaus_ids = [agency.id for agency in all_agencies if agency.name == selected_agency.name]
-            query = query.filter(models.User.agency_id.in_(selected_agency_bureaus_ids))
+            agency_ids = self._agency_bureau_ids(filter.agency_id)
+        return self._report(filter, agency_ids)
+
+    def _agency_bureau_ids(self, agency_id: int) -> list[int]:
+        # The IDs of the agency and all of its bureaus
+        all_agencies = self._session.query(models.Agency).all()
+        selected_agency = [agency for agency in all_agencies if agency.id == agency_id][0]
+        return [agency.id for agency in all_agencies if agency.name == selected_agency.name]
+
+    def _report(self, filter: SmartPayTrainingReportFilter, agency_ids: list[int] | None) -> list[UserQuizCompletionReportData]:
+        '''
+        Reads the passed completions from the report_completions fact table,
+        for the given agencies or all of them, sorted by agency, bureau and
+        newest first.
+        '''
+        fact = models.ReportCompletion
+        query = self._session.query(fact.user_name, fact.user_email, fact.agency_name, fact.bureau, fact.quiz_name, fact.submit_ts)
+
+        if agency_ids is not None:
+            query = query.filter(fact.agency_id.in_(agency_ids))
 
         if filter.completion_date_start is not None:
-            query = query.filter(models.QuizCompletion.submit_ts >= filter.completion_date_start)
+            query = query.filter(fact.submit_ts >= filter.completion_date_start)
 
         if filter.completion_date_end is not None:
-            query = query.filter(models.QuizCompletion.submit_ts <= filter.completion_date_end)
+            query = query.filter(fact.submit_ts <= filter.completion_date_end)
 
         if filter.quiz_names:
-            query = query.filter(models.Quiz.name.in_(filter.quiz_names))
+            query = query.filter(fact.quiz_name.in_(filter.quiz_names))
 
         raw_results = query.order_by(
-            models.Agency.name.asc(),
-            nullsfirst(models.Agency.bureau.asc()),
-            models.QuizCompletion.submit_ts.desc()
+            fact.agency_name.asc(),
+            nullsfirst(fact.bureau.asc()),
+            fact.submit_ts.desc()
         ).all()
 
-        # Map the results to the Pydantic model using the `ReportData` namedtuple
-        result = [
+        return [
             UserQuizCompletionReportData(
-                name=row.name,
-                email=row.email,
-                agency=row.agency,
+                name=row.user_name,
+                email=row.user_email,
+                agency=row.agency_name,
                 bureau=row.bureau,
-                quiz=row.quiz,
-                completion_date=row.completion_date
+                quiz=row.quiz_name,
+                completion_date=row.submit_ts
             )
-            for row in map(report_data._make, raw_results)
+            for row in raw_results
         ]
 
-        return result
-
     def get_users(self, searchText: str, page_number: int) -> UserSearchResult:
         # current UI only support search by user name and email. The search field it is required field.
         if (searchText and searchText.strip() != '' and page_number > 0):
             count = self._session.query(models.User).filter(or_(models.User.name.ilike(f"%{searchText}%"), models.User.email.ilike(f"%{searchText}%"))).count()
             page_size = 25
             offset = (page_number - 1) * page_size
-            search_results = self._session.query(models.User).filter(
-                or_(models.User.name.ilike(f"%{searchText}%"), models.User.email.ilike(f"%{searchText}%"))).limit(page_size).offset(offset).all()
+            # The results are serialized with their relationships, load them up front rather than per user
+            search_results = _with_relationships(self._session.query(models.User)).filter(
+                or_(models.User.name.ilike(f"%{searchText}%"), models.User.email.ilike(f"%{searchText}%"))
+            ).order_by(models.User.id).limit(page_size).offset(offset).all()
             user_search_result = UserSearchResult(users=search_results, total_count=count)
             return user_search_result
 
@@ -204,9 +171,60 @@ class UserRepository(BaseRepository[models.User]):
         db_user = self.find_by_id(user_id)
         if db_user is None:
             raise ValueError("invalid user id")
+        previous_agency_id = db_user.agency_id
         db_user.name = user.name
         db_user.agency_id = user.agency_id
         db_user.modified_by = modified_by
         db_user.modified_on = datetime.now()
+        self._session.flush()
+        # The reports show the user's current name and agency
+        ReportCompletionRepository(self._session).update_user(user_id)
+        if previous_agency_id != user.agency_id:
+            # Move the user's completions to their new agency's counts
+            ReportSummaryRepository(self._session).refresh([previous_agency_id, user.agency_id])
         self._session.commit()
+        _drop_cached_profile(user_id)
         return db_user
+
+
+class AsyncUserRepository(AsyncBaseRepository[models.User]):
+    '''
+    Users are returned with their agency, roles and report agencies loaded, so
+    they can be serialised (e.g. into a UserJWT) without lazy loading.
+    '''
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, models.User)
+
+    async def create(self, user: schemas.UserCreate) -> models.User:
+        db_user = await self.save(_to_model(user))
+        await self._session.refresh(db_user, ["agency", "roles", "report_agencies"])
+        return db_user
+
+    async def find_by_id(self, id: int) -> models.User | None:
+        return (await self._session.scalars(_with_relationships(select(models.User).filter_by(id=id)))).first()
+
+    async def find_by_email(self, email: str) -> models.User | None:
+        query = select(models.User).filter(models.User.email == email.lower())
+        return (await self._session.scalars(_with_relationships(query))).first()
+
+
+def _drop_cached_profile(user_id: int) -> None:
+    # So the user's next request reads their new profile. If Redis can't be
+    # reached, the cached profile expires after USER_PROFILE_CACHE_TTL.
+    try:
+        UserProfileCache().delete(user_id)
+    except RedisError as e:
+        logging.error(f"Error dropping the cached profile of user {user_id}: {e}")
+
+
+def _to_model(user: schemas.UserCreate) -> models.User:
+    return models.User(email=user.email.lower(), name=user.name, agency_id=user.agency_id, created_by=user.name)
+
+
+def _with_relationships(query):
+    return query.options(
+        joinedload(models.User.agency),
+        selectinload(models.User.roles),
+        selectinload(models.User.report_agencies)
+    )
@@ -11,11 +11,14 @@ from .quiz_question import QuizQuestion, QuizQuestionCreate, QuizQuestionPublic,
 from .quiz_content import QuizContent, QuizContentCreate, QuizContentPublic
 from .quiz import Quiz, QuizCreate, QuizPublic, QuizTopic, QuizAudience
 from .quiz_submission import QuizSubmission
-from .quiz_grade import QuizGrade
+from .quiz_grade import QuizGrade, QuizGradeQuestion
 from .quiz_completion import QuizCompletion, QuizCompletionCreate
+from .quiz_analysis import QuizAnalysis, QuizVersionAnalysis, QuizQuestionAnalysis, QuizChoiceAnalysis
 from .user_certificate import UserCertificate, CertificateType, CertificateListValue
 from .user_x_role import UserXRole
 from .report_user_x_agency import ReportUserXAgency
 from .role import Role, RoleCreate
-from .reports import UserQuizCompletionReportData, GspcCompletionReportData
+from .reports import UserQuizCompletionReportData, QuizCompletionSummaryData, GspcCompletionReportData
 from .smartpay_training_report_filter import SmartPayTrainingReportFilter
+from .request_profile import RequestProfile
+from .task_job import TaskJob
@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+
+
+class QuizChoiceAnalysis(BaseModel):
+    choice_id: int
+    # The text and answer are only known for the quiz's current version
+    text: str | None = None
+    correct: bool | None = None
+    selected: int
+    # The share of the question's responses that selected the choice
+    selection_rate: float
+
+
+class QuizQuestionAnalysis(BaseModel):
+    question_id: int
+    text: str | None = None
+    responses: int
+    correct: int
+    # The share of responses that were correct, lower is harder
+    difficulty: float
+    choices: list[QuizChoiceAnalysis]
+
+
+class QuizVersionAnalysis(BaseModel):
+    version: str
+    current: bool
+    completions: int
+    passed: int
+    pass_rate: float
+    questions: list[QuizQuestionAnalysis]
+
+
+class QuizAnalysis(BaseModel):
+    quiz_id: int
+    name: str
+    versions: list[QuizVersionAnalysis]
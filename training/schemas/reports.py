@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel, ConfigDict
 from training.schemas.user import UserBase
 
@@ -34,6 +34,15 @@ class AdminUserQuizCompletionReportData(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class QuizCompletionSummaryData(BaseModel):
+    agency: str
+    bureau: str | None = None
+    quiz: str
+    month: date
+    passed: int
+    model_config = ConfigDict(from_attributes=True)
+
+
 class GspcCompletionReportData(BaseModel):
     invitedEmail: str | None = None
     registeredEmail: str | None = None
@@ -0,0 +1,13 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class RequestProfile(BaseModel):
+    id: str
+    method: str
+    route: str
+    duration_ms: float
+    # True when the request was picked by PROFILE_SAMPLE_RATE rather than
+    # requested with the X-Profile header
+    sampled: bool
+    created_on: datetime
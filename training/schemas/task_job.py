@@ -0,0 +1,16 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class TaskJob(BaseModel):
+    id: str
+    # The registered name of the task, see training.tasks
+    task: str
+    queue: str
+    args: list
+    # Counted each time the job is claimed by a worker
+    attempts: int = 0
+    max_attempts: int
+    enqueued_on: datetime
+    # The error of the last failed attempt
+    error: str | None = None
@@ -58,13 +58,4 @@ class UserSearchResult(BaseModel):
     users: list[User]
     total_count: int
 
-    @field_validator('users', mode='before')
-    def convert_user_datetimes(cls, input):
-        for user in input:
-            if isinstance(user.created_on, datetime):
-                user.created_on = user.created_on.isoformat()
-            if user.modified_on and isinstance(user.modified_on, datetime):
-                user.modified_on = user.modified_on.isoformat()
-        return input
-
     model_config = ConfigDict(from_attributes=True)
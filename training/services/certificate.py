@@ -1,5 +1,6 @@
 import os
-import fitz
+from training.metrics import PDF_RENDER_DURATION
+from training.tracing import traced
 
 PDF_PATH = '../../data/blank_certificates'
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -13,17 +14,27 @@ certificates = {
 }
 
 
+def _open_pdf(path: str):
+    # PyMuPDF is imported when the first certificate is rendered rather than
+    # by everything that imports the services. The web workers load it before
+    # they're forked instead, see gunicorn.conf.py.
+    import fitz
+    return fitz.open(path)  # type: ignore
+
+
 class Certificate:
     def __init__(self):
         pass
 
+    @traced()
+    @PDF_RENDER_DURATION.labels(certificate="quiz").time()
     def generate_pdf(self, training_name, name, agency, date):
         date_string = '{dt:%B} {dt.day}, {dt.year}'.format(dt=date)
         data = {'name': name, 'agency': agency, 'date': date_string}
         pdf = certificates[training_name]
         empty_pdf_path = os.path.join(SCRIPT_DIR, PDF_PATH, pdf)
 
-        doc = fitz.open(empty_pdf_path)  # type: ignore
+        doc = _open_pdf(empty_pdf_path)
         page = doc.load_page(0)
 
         for field in page.widgets():
@@ -37,6 +48,8 @@ class Certificate:
         doc.need_appearances(True)
         return doc.tobytes(linear=True, deflate_fonts=True, expand=2)
 
+    @traced()
+    @PDF_RENDER_DURATION.labels(certificate="gspc").time()
     def generate_gspc_pdf(self, name, agency, date, expiration_date):
         date_string = '{dt:%B} {dt.day}, {dt.year}'.format(dt=date)
         expiration_date_string = 'Valid Through '+'{dt:%B} {dt.day}, {dt.year}'.format(dt=expiration_date)
@@ -44,7 +57,7 @@ class Certificate:
         pdf = 'c_gspc.pdf'
         empty_pdf_path = os.path.join(SCRIPT_DIR, PDF_PATH, pdf)
 
-        doc = fitz.open(empty_pdf_path)  # type: ignore
+        doc = _open_pdf(empty_pdf_path)
         page = doc.load_page(0)
 
         for field in page.widgets():
@@ -1,4 +1,7 @@
 import logging
+from datetime import date, datetime
+from redis.exceptions import RedisError
+from training.database import SessionLocal, checkout
 from training.repositories import GspcCompletionRepository, UserRepository
 from training.schemas import GspcSubmission, GspcResult, GspcCompletion
 from sqlalchemy.orm import Session
@@ -8,6 +11,9 @@ from email.message import EmailMessage
 from smtplib import SMTP
 from training.errors import SendEmailError
 from training.config import settings
+from training.metrics import EMAILS_SENT, GRADING_DURATION, count_outcome
+from training.tracing import traced
+from training.tasks import task
 
 CERTIFICATE_EMAIL_TEMPLATE = Template('''
     <p>Hello $name,</p>
@@ -26,14 +32,19 @@ CERTIFICATE_EMAIL_TEMPLATE = Template('''
 
 
 class GspcService():
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, queue_emails: bool = False):
         self.gspc_completion_repo = GspcCompletionRepository(db)
         self.user_repo = UserRepository(db)
         self.certificate_service = Certificate()
+        # Set by the API, so the certificate is emailed by the worker
+        self.queue_emails = queue_emails
 
+    @traced()
+    @GRADING_DURATION.labels(submission="gspc").time()
     def grade(self, user_id: int, submission: GspcSubmission) -> GspcResult:
         """
         Grades a GspcSubmission submitted by user. Sends congratulation email if user meets the criteria.
+        With `queue_emails` the email is queued for the worker instead.
         :param user_id: User ID
         :param submission: Quiz submission object
         :return: GspcResult model which includes the final result
@@ -50,20 +61,14 @@ class GspcService():
         ))
 
         if (passed):
-            try:
-                user = self.user_repo.find_by_id(user_id)
-                pdf_bytes = self.certificate_service.generate_gspc_pdf(
-                    user.name,
-                    user.agency.name,
-                    result.submit_ts,
-                    result.certification_expiration_date
-                )
-
-                self.email_certificate(user.name, user.email, pdf_bytes)
-                logging.info(f"Sent confirmation email to {user.email} for passing training quiz")
-            except Exception as e:
-                logging.error("Error sending quiz confirmation mail", e)
-                raise
+            if self.queue_emails:
+                try:
+                    send_gspc_certificate.delay(user_id, result.submit_ts.isoformat(), result.certification_expiration_date.isoformat())
+                except RedisError:
+                    # The completion is saved, the user can still download the certificate
+                    logging.exception(f"Error queueing the GSPC certificate email of user {user_id}")
+            else:
+                self.send_certificate(user_id, result.submit_ts, result.certification_expiration_date)
 
         result = GspcResult(
             passed=passed,
@@ -72,7 +77,33 @@ class GspcService():
 
         return result
 
-    def email_certificate(self, user_name: str, to_email: str, certificate: bytes) -> None:
+    @traced()
+    def send_certificate(self, user_id: int, submit_ts: datetime, certification_expiration_date: date) -> None:
+        """
+        Renders the certificate of a passed GSPC completion and emails it to the user.
+        :param user_id: User ID
+        :param submit_ts: When the GSPC completion was submitted
+        :param certification_expiration_date: Expiration date of the certification
+        :return: N/A
+        """
+        try:
+            user = self.user_repo.find_by_id(user_id)
+            pdf_bytes = self.certificate_service.generate_gspc_pdf(
+                user.name,
+                user.agency.name,
+                submit_ts,
+                certification_expiration_date
+            )
+
+            self.email_certificate(user.name, user.email, pdf_bytes)
+            logging.info(f"Sent confirmation email to {user.email} for passing training quiz")
+        except Exception as e:
+            logging.error("Error sending quiz confirmation mail", e)
+            raise
+
+    @staticmethod
+    @traced()
+    def email_certificate(user_name: str, to_email: str, certificate: bytes) -> None:
         """
         Sends congratulatory email to user with certificate attached.
         :param user_name: User's Name
@@ -88,7 +119,7 @@ class GspcService():
         message["To"] = to_email
         message.add_attachment(certificate, maintype="application", subtype="pdf", filename="GSPC Certificate.pdf")
 
-        with SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
+        with count_outcome(EMAILS_SENT, email="gspc_certificate"), SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
             smtp.starttls()
             if settings.SMTP_USER and settings.SMTP_PASSWORD:
                 smtp.login(user=settings.SMTP_USER, password=settings.SMTP_PASSWORD)
@@ -98,3 +129,14 @@ class GspcService():
                 raise SendEmailError from e
             finally:
                 smtp.quit()
+
+
+@task("email")
+def send_gspc_certificate(user_id: int, submit_ts: str, certification_expiration_date: str) -> None:
+    '''
+    Emails the certificate of a GSPC submission, in the worker. The dates
+    are ISO strings, since the job's arguments are stored as JSON.
+    '''
+    with SessionLocal() as session:
+        checkout(session)
+        GspcService(session).send_certificate(user_id, datetime.fromisoformat(submit_ts), date.fromisoformat(certification_expiration_date))
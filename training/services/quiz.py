@@ -3,11 +3,18 @@ from email.message import EmailMessage
 from smtplib import SMTP
 from string import Template
 
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
 from training.config import settings
+from training.database import SessionLocal, checkout
+from training.metrics import EMAILS_SENT, GRADING_DURATION, count_outcome
+from training.tracing import traced
 from training.errors import IncompleteQuizResponseError, QuizNotFoundError, SendEmailError
-from training.repositories import QuizRepository, QuizCompletionRepository, UserRepository, CertificateRepository
-from training.schemas import Quiz, QuizSubmission, QuizGrade, QuizCompletionCreate
-from sqlalchemy.orm import Session
+from training.repositories import (AsyncQuizRepository, AsyncQuizCompletionRepository, AsyncUserRepository, AsyncCertificateRepository,
+                                   AsyncReportSummaryRepository, AsyncQuizAnalysisRepository, CertificateRepository, UserRepository)
+from training.schemas import Quiz, QuizSubmission, QuizGrade, QuizGradeQuestion, QuizCompletionCreate
+from sqlalchemy.ext.asyncio import AsyncSession
+from training.tasks import task
 
 from training.services import Certificate
 
@@ -28,22 +35,36 @@ If you did not submit this request, you may be receiving this message in error.
 
 
 class QuizService():
-    def __init__(self, db: Session):
-        self.quiz_repo = QuizRepository(db)
-        self.quiz_completion_repo = QuizCompletionRepository(db)
-        self.user_repo = UserRepository(db)
-        self.certificate_repo = CertificateRepository(db)
+    def __init__(self, db: AsyncSession, queue_emails: bool = False):
+        self.db = db
+        self.quiz_repo = AsyncQuizRepository(db)
+        self.quiz_completion_repo = AsyncQuizCompletionRepository(db)
+        self.user_repo = AsyncUserRepository(db)
+        self.certificate_repo = AsyncCertificateRepository(db)
+        self.report_summary_repo = AsyncReportSummaryRepository(db)
+        self.quiz_analysis_repo = AsyncQuizAnalysisRepository(db)
         self.certificate_service = Certificate()
+        # Set by the API, so the certificate is emailed by the worker
+        self.queue_emails = queue_emails
 
-    def grade(self, quiz_id: int, user_id: int, submission: QuizSubmission) -> QuizGrade:
+    @traced()
+    async def grade(self, quiz_id: int, user_id: int, submission: QuizSubmission) -> QuizGrade:
         """
         Grades quizzes submitted by user. Sends congratulation email if user passes the quiz.
+        The database work runs on the event loop, the PDF rendering and SMTP
+        send are blocking and run in the threadpool. With `queue_emails` the
+        email is queued for the worker instead, so the grade is returned as
+        soon as the completion is committed.
         :param quiz_id: Quiz ID
         :param user_id: User ID
         :param submission: Quiz submission object
         :return: QuizGrade model which includes quiz results
         """
-        db_quiz = self.quiz_repo.find_by_id(quiz_id)
+        with GRADING_DURATION.labels(submission="quiz").time():
+            return await self._grade(quiz_id, user_id, submission)
+
+    async def _grade(self, quiz_id: int, user_id: int, submission: QuizSubmission) -> QuizGrade:
+        db_quiz = await self.quiz_repo.find_by_id(quiz_id)
         if db_quiz is None:
             raise QuizNotFoundError
 
@@ -99,7 +120,7 @@ class QuizService():
 
         responses_dict = submission.model_dump()
 
-        result = self.quiz_completion_repo.create(QuizCompletionCreate(
+        result = await self.quiz_completion_repo.create(QuizCompletionCreate(
             quiz_id=quiz_id,
             user_id=user_id,
             passed=grade.passed,
@@ -107,27 +128,69 @@ class QuizService():
         ))
 
         grade.quiz_completion_id = result.id
+        await self._count_completion(quiz_id, user_id, result.id, passed, grade.questions)
 
         if passed:
-            # Send email with quiz completion attached
-            try:
-                user = self.user_repo.find_by_id(user_id)
-                db_user_certificate = self.certificate_repo.get_certificate_by_id(result.id)
-                pdf_bytes = self.certificate_service.generate_pdf(
-                    db_user_certificate.quiz_name,
-                    db_user_certificate.user_name,
-                    db_user_certificate.agency,
-                    db_user_certificate.completion_date
-                )
-                self.email_certificate(user.name, quiz.name, user.email, pdf_bytes)
-                logging.info(f"Sent confirmation email to {user.email} for passing training quiz")
-            except Exception as e:
-                logging.error("Error sending quiz confirmation mail", e)
-                raise
+            if self.queue_emails:
+                try:
+                    await run_in_threadpool(send_quiz_certificate.delay, user_id, quiz.name, result.id)
+                except RedisError:
+                    # The completion is saved, the user can still download the certificate
+                    logging.exception(f"Error queueing the certificate email of quiz completion {result.id}")
+            else:
+                await self.send_certificate(user_id, quiz.name, result.id)
 
         return grade
 
-    def email_certificate(self, user_name: str, course_name: str, to_email: str, certificate: bytes) -> None:
+    async def _count_completion(self, quiz_id: int, user_id: int, quiz_completion_id: int, passed: bool,
+                                questions: list[QuizGradeQuestion]) -> None:
+        '''
+        Counts a committed completion in the quiz's item analysis and, if it
+        passed, the report summary. Every submission of a quiz adds to the
+        same counter rows, so each is added to in its own short transaction
+        rather than holding their locks while the completion is saved. The
+        counters can be rebuilt with refresh_reports, so a failure is logged
+        and the submission still succeeds.
+        '''
+        counters = [("item analysis", lambda: self.quiz_analysis_repo.add_completion(quiz_id, passed, questions))]
+        if passed:
+            counters.append(("report summary", lambda: self.report_summary_repo.add_passed(user_id, quiz_id)))
+        for name, count in counters:
+            try:
+                await count()
+                await self.db.commit()
+            except Exception:
+                await self.db.rollback()
+                logging.exception(f"Error counting quiz completion {quiz_completion_id} in the {name}")
+
+    @traced()
+    async def send_certificate(self, user_id: int, quiz_name: str, quiz_completion_id: int) -> None:
+        """
+        Renders the certificate of a passed quiz completion and emails it to the user.
+        :param user_id: User ID
+        :param quiz_name: Name of the quiz the user passed
+        :param quiz_completion_id: ID of the committed quiz completion
+        :return: N/A
+        """
+        try:
+            user = await self.user_repo.find_by_id(user_id)
+            db_user_certificate = await self.certificate_repo.get_certificate_by_id(quiz_completion_id)
+            pdf_bytes = await run_in_threadpool(
+                self.certificate_service.generate_pdf,
+                db_user_certificate.quiz_name,
+                db_user_certificate.user_name,
+                db_user_certificate.agency,
+                db_user_certificate.completion_date
+            )
+            await run_in_threadpool(self.email_certificate, user.name, quiz_name, user.email, pdf_bytes)
+            logging.info(f"Sent confirmation email to {user.email} for passing training quiz")
+        except Exception as e:
+            logging.error("Error sending quiz confirmation mail", e)
+            raise
+
+    @staticmethod
+    @traced()
+    def email_certificate(user_name: str, course_name: str, to_email: str, certificate: bytes) -> None:
         """
         Sends congratulatory email to user with certificate attached.
         :param user_name: User's Name
@@ -144,7 +207,7 @@ class QuizService():
         message["To"] = to_email
         message.add_attachment(certificate, maintype="application", subtype="pdf", filename="SmartPayTraining.pdf")
 
-        with SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
+        with count_outcome(EMAILS_SENT, email="quiz_certificate"), SMTP(settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
             smtp.starttls()
             if settings.SMTP_USER and settings.SMTP_PASSWORD:
                 smtp.login(user=settings.SMTP_USER, password=settings.SMTP_PASSWORD)
@@ -154,3 +217,23 @@ class QuizService():
                 raise SendEmailError from e
             finally:
                 smtp.quit()
+
+
+@task("email")
+def send_quiz_certificate(user_id: int, quiz_name: str, quiz_completion_id: int) -> None:
+    '''
+    Renders the certificate of a passed quiz completion and emails it to the
+    user, in the worker. Raises if the email can't be sent, so it's retried.
+    '''
+    with SessionLocal() as session:
+        checkout(session)
+        user = UserRepository(session).find_by_id(user_id)
+        db_user_certificate = CertificateRepository(session).get_certificate_by_id(quiz_completion_id)
+    pdf_bytes = Certificate().generate_pdf(
+        db_user_certificate.quiz_name,
+        db_user_certificate.user_name,
+        db_user_certificate.agency,
+        db_user_certificate.completion_date
+    )
+    QuizService.email_certificate(user.name, quiz_name, user.email, pdf_bytes)
+    logging.info(f"Sent confirmation email to {user.email} for passing training quiz")
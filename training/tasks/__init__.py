@@ -0,0 +1,61 @@
+'''
+Jobs run off the request by the worker process, see training.tasks.worker.
+
+A function becomes a task with the `task` decorator, which names the queue
+its jobs go on. It can still be called directly, or queued to run in the
+worker with `delay`:
+
+    @task("email")
+    def send_welcome_email(user_id: int) -> None:
+        ...
+
+    send_welcome_email.delay(user_id)
+
+The arguments are stored as JSON, so they need to be plain values. A job can
+run more than once, e.g. if its worker is stopped part way, so tasks should
+be safe to repeat.
+'''
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from training.config import settings
+from training.data import TaskQueue
+
+
+class Task:
+    def __init__(self, func: Callable[..., Any], queue: str, max_attempts: int):
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args: Any) -> Any:
+        return self.func(*args)
+
+    def delay(self, *args: Any) -> str:
+        '''
+        Queues a job that runs the task with `args`, and returns its id.
+        '''
+        return TaskQueue().enqueue(self.name, self.queue, list(args), self.max_attempts)
+
+    def delay_many(self, args_list: Iterable[Iterable[Any]]) -> list[str]:
+        '''
+        Queues a job for each of the argument lists in one round trip.
+        '''
+        return TaskQueue().enqueue_many(self.name, self.queue, [list(args) for args in args_list], self.max_attempts)
+
+
+_tasks: dict[str, Task] = {}
+
+
+def task(queue: str = "default", max_attempts: int = settings.TASK_MAX_ATTEMPTS) -> Callable[[Callable[..., Any]], Task]:
+    def decorator(func: Callable[..., Any]) -> Task:
+        registered = Task(func, queue, max_attempts)
+        _tasks[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name: str) -> Task | None:
+    return _tasks.get(name)
@@ -0,0 +1,170 @@
+'''
+Runs the jobs queued with training.tasks. This is the `worker` process in
+the Procfile:
+
+    python -m training.tasks.worker [--queues email,default] [--concurrency 4]
+
+Each of the `--concurrency` threads claims the next job from the queues, in
+the order they're given, and runs it. A job that raises is retried with
+exponential backoff and moved to the queue's dead letters after its last
+attempt. On SIGTERM or SIGINT the worker stops claiming jobs and exits once
+the running ones are finished.
+
+To see how many jobs are waiting in each queue, or to run a queue's dead
+letters again once whatever made them fail is fixed:
+
+    python -m training.tasks.worker --stats
+    python -m training.tasks.worker --requeue-dead email
+'''
+import argparse
+import importlib
+import logging
+import random
+import signal
+import threading
+import time
+
+from redis.exceptions import RedisError
+from opentelemetry.trace import SpanKind
+from training.config import settings
+from training.data import TaskQueue
+from training.schemas import TaskJob
+from training.tasks import get_task
+from training.tracing import configure_tracing, tracer
+
+# Modules whose tasks the worker runs
+TASK_MODULES = ("training.services", "training.api.email")
+
+QUEUES = ("email", "default")
+
+
+class Worker:
+    def __init__(
+        self,
+        queues: tuple[str, ...] = QUEUES,
+        concurrency: int = settings.TASK_WORKER_CONCURRENCY,
+        visibility_timeout: int = settings.TASK_VISIBILITY_TIMEOUT,
+        poll_interval: float = 1.0
+    ):
+        self.queues = queues
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.task_queue = TaskQueue()
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        '''
+        Runs jobs until `stop` is called.
+        '''
+        threads = [threading.Thread(target=self._loop, name=f"worker-{n}") for n in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def run_once(self) -> bool:
+        '''
+        Runs the next job from the queues, and returns whether there was one.
+        '''
+        for queue in self.queues:
+            job = self.task_queue.claim(queue, self.visibility_timeout)
+            if job is not None:
+                self.run_job(job)
+                return True
+        return False
+
+    def run_job(self, job: TaskJob) -> None:
+        task = get_task(job.task)
+        if task is None:
+            logging.error(f"Job {job.id} is for unknown task {job.task}")
+            self.task_queue.dead_letter(job, f"Unknown task {job.task}")
+            return
+        if job.attempts > job.max_attempts:
+            # Its workers kept stopping before it was finished
+            logging.error(f"Job {job.id} of {job.task} timed out on its last attempt")
+            self.task_queue.dead_letter(job, job.error or "Timed out")
+            return
+
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(job.task, kind=SpanKind.CONSUMER, attributes={"job.id": job.id, "job.attempt": job.attempts}):
+                task(*job.args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts < job.max_attempts:
+                delay = retry_delay(job.attempts)
+                logging.warning(f"Job {job.id} of {job.task} failed on attempt {job.attempts}, retrying in {delay:.0f}s: {error}")
+                self.task_queue.retry(job, delay, error)
+            else:
+                logging.exception(f"Job {job.id} of {job.task} failed on its last attempt")
+                self.task_queue.dead_letter(job, error)
+        else:
+            self.task_queue.complete(job)
+            logging.info(f"Ran job {job.id} of {job.task} in {time.perf_counter() - start:.3f}s")
+
+    def _loop(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                ran = self.run_once()
+            except RedisError as e:
+                logging.error(f"Error claiming a job: {e}")
+                ran = False
+            if not ran:
+                self.stopping.wait(self.poll_interval)
+
+
+def retry_delay(attempts: int) -> float:
+    '''
+    Seconds to wait before the next attempt of a job that failed `attempts`
+    times.
+    '''
+    delay = min(settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1), settings.TASK_RETRY_BACKOFF_MAX)
+    # So the jobs that failed together, e.g. while SMTP was down, aren't all retried together
+    return delay * random.uniform(0.8, 1.0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the jobs queued in Redis.")
+    parser.add_argument("--queues", default=",".join(QUEUES), help=f"queues to run jobs from, in order (default {','.join(QUEUES)})")
+    parser.add_argument("--concurrency", type=int, default=settings.TASK_WORKER_CONCURRENCY,
+                        help=f"jobs run at a time (default {settings.TASK_WORKER_CONCURRENCY})")
+    parser.add_argument("--visibility-timeout", type=int, default=settings.TASK_VISIBILITY_TIMEOUT,
+                        help=f"seconds after which an unfinished job is run again (default {settings.TASK_VISIBILITY_TIMEOUT})")
+    parser.add_argument("--stats", action="store_true", help="print the number of jobs in each queue and exit")
+    parser.add_argument("--requeue-dead", metavar="QUEUE", help="put the queue's dead letters back on the queue and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(levelname)s: %(threadName)s: %(module)s.%(funcName)s:%(lineno)d: %(message)s"
+    )
+    queues = tuple(queue.strip() for queue in args.queues.split(",") if queue.strip())
+
+    if args.stats:
+        task_queue = TaskQueue()
+        for queue in queues:
+            counts = task_queue.counts(queue)
+            print(f"{queue}: " + ", ".join(f"{count} {state}" for state, count in counts.items()))
+        return
+    if args.requeue_dead:
+        print(f"Requeued {TaskQueue().requeue_dead(args.requeue_dead)} jobs on {args.requeue_dead}")
+        return
+
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+    configure_tracing()
+
+    worker = Worker(queues, args.concurrency, args.visibility_timeout)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: worker.stop())
+    logging.info(f"Running jobs from {', '.join(queues)} with {args.concurrency} threads")
+    worker.run()
+    logging.info("Stopped")
+
+
+if __name__ == "__main__":
+    main()
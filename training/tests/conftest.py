@@ -1,28 +1,73 @@
-from collections.abc import Generator
-from unittest.mock import MagicMock, patch
+from collections.abc import AsyncGenerator, Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+import fakeredis
 import jwt
 from pydantic import TypeAdapter
 import pytest
 import yaml
 import pathlib
 from datetime import datetime
-from training.api.deps import agency_repository, quiz_repository, quiz_service, user_repository
-from training.database import engine
+from training.api import deps
+from training.api.deps import agency_repository, async_quiz_repository, quiz_service, user_repository
+from training.database import engine, db_uri, AsyncSessionLocal, AsyncReplicaSessionLocal
+from training.database.async_database import _create_async_engine
+from training.database.query_stats import QueryStats, collect_queries
 from training import models, schemas
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import event
 from training.repositories import (AgencyRepository, UserRepository, QuizRepository, QuizCompletionRepository,
-                                   CertificateRepository, RoleRepository, GspcCompletionRepository)
+                                   CertificateRepository, RoleRepository, GspcCompletionRepository, AsyncQuizRepository,
+                                   ReportCompletionRepository, ReportSummaryRepository)
 from training.schemas import AgencyCreate, RoleCreate, UserCertificate, GspcCertificate
 from training.services import QuizService
 from training.config import settings
 from . import factories
 from training.main import app
 
+# The TestClient runs each request in a new event loop and asyncpg connections
+# can't outlive the loop that opened them, so the async sessions in tests
+# don't pool their connections.
+async_engine = _create_async_engine(db_uri, pooled=False)
+AsyncSessionLocal.configure(bind=async_engine)
+AsyncReplicaSessionLocal.configure(bind=_create_async_engine(settings.DB_REPLICA_URI, pooled=False) if settings.DB_REPLICA_URI else async_engine)
+
 quiz_submission_adapter = TypeAdapter(schemas.QuizSubmission)
 gspc_submission_adapter = TypeAdapter(schemas.GspcSubmission)
 
 
+@pytest.fixture(autouse=True)
+def no_rate_limits():
+    '''
+    Turns the rate limits off, so requests don't count against them across
+    tests. test_rate_limit.py sets its own.
+    '''
+    with patch.object(settings, "RATE_LIMITS", {}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def accept_legacy_jwts():
+    '''
+    Most tests sign in with JWTs that carry the whole user, the format from
+    before compact tokens, so they're accepted whatever the date.
+    test_auth.py checks the cutoff.
+    '''
+    with patch.object(settings, "LEGACY_JWT_ACCEPTED_UNTIL", None):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def fake_profile_cache():
+    '''
+    Keeps the user profiles that compact JWTs are resolved with, and that
+    editing a user drops, in a Redis stand-in.
+    '''
+    with patch("training.data.user_profile_cache.redis", fakeredis.FakeRedis()) as redis:
+        yield redis
+
+
 @pytest.fixture
 def db():
     '''
@@ -54,12 +99,52 @@ def db():
     connection.close()
 
 
+@pytest.fixture
+def anyio_backend():
+    '''
+    Runs async tests marked with `pytest.mark.anyio` on asyncio only.
+    '''
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_db() -> AsyncGenerator[AsyncSession, None]:
+    '''
+    The asyncio counterpart of the db fixture. Commits made by the code under
+    test are turned into savepoints, so everything is rolled back when the
+    test case completes.
+    '''
+
+    connection = await async_engine.connect()
+    transaction = await connection.begin()
+    session = AsyncSession(bind=connection, autoflush=False, expire_on_commit=False, join_transaction_mode="create_savepoint")
+
+    yield session
+
+    await session.close()
+    await transaction.rollback()
+    await connection.close()
+
+
+@pytest.fixture
+async def async_db_with_data(async_db: AsyncSession, testdata: dict) -> AsyncGenerator[AsyncSession, None]:
+    '''
+    Provides a fully populated database through an AsyncSession.
+    '''
+    await async_db.run_sync(_load_testdata, testdata)
+    yield async_db
+
+
 @pytest.fixture
 def db_with_data(db: Session, testdata: dict):
     '''
     Provides a fully populated database.
     '''
+    _load_testdata(db, testdata)
+    yield db
 
+
+def _load_testdata(db: Session, testdata: dict) -> None:
     agency_ids = []
     user_ids = []
     quiz_ids = []
@@ -100,11 +185,47 @@ def db_with_data(db: Session, testdata: dict):
                                                  submit_ts=datetime(2024, 1, 24))
     db.add(quiz_completion_fail)
     db.commit()
+
+    # The completions were added directly, rather than through their repository
+    ReportCompletionRepository(db).backfill()
+    ReportSummaryRepository(db).rebuild()
+    db.commit()
     for role in testdata["roles"]:
         role = models.Role(name=role["name"])
         db.add(role)
         db.commit()
-    yield db
+
+
+@pytest.fixture
+def api_db_with_data(db_with_data: Session) -> Generator[Session, None, None]:
+    '''
+    Makes the API routes use the populated test database, for tests that
+    exercise a route together with its queries.
+    '''
+    app.dependency_overrides[deps.db] = lambda: db_with_data
+    app.dependency_overrides[deps.replica_db] = lambda: db_with_data
+    app.dependency_overrides[deps.report_db] = lambda: db_with_data
+    yield db_with_data
+    app.dependency_overrides = {}
+
+
+@pytest.fixture
+def query_budget() -> Callable[[int], AbstractContextManager[QueryStats]]:
+    '''
+    Fails the test when the code in the block runs more SQL statements than
+    its budget, to catch N+1 queries before they ship:
+
+        with query_budget(4):
+            client.get("/api/v1/users?searchText=test&page_number=1")
+    '''
+    @contextmanager
+    def budget(max_queries: int) -> Generator[QueryStats, None, None]:
+        with collect_queries() as stats:
+            yield stats
+        if stats.count > max_queries:
+            statements = "\n\n".join(stats.statements or [])
+            pytest.fail(f"Ran {stats.count} queries, over the budget of {max_queries}:\n\n{statements}")
+    return budget
 
 
 @pytest.fixture
@@ -287,16 +408,16 @@ def passed_quiz_completion_id(db_with_data: Session) -> Generator[int, None, Non
 
 
 @pytest.fixture
-def mock_quiz_repo() -> Generator[QuizRepository, None, None]:
-    mock = MagicMock()
-    app.dependency_overrides[quiz_repository] = lambda: mock
+def mock_quiz_repo() -> Generator[AsyncQuizRepository, None, None]:
+    mock = AsyncMock()
+    app.dependency_overrides[async_quiz_repository] = lambda: mock
     yield mock
     app.dependency_overrides = {}
 
 
 @pytest.fixture
 def mock_quiz_service() -> Generator[QuizService, None, None]:
-    mock = MagicMock()
+    mock = AsyncMock()
     app.dependency_overrides[quiz_service] = lambda: mock
     yield mock
     app.dependency_overrides = {}
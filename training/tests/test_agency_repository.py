@@ -1,5 +1,6 @@
 import pytest
 from training import schemas, models
+from training.database.query_stats import collect_queries
 from training.repositories import AgencyRepository
 
 
@@ -14,6 +15,58 @@ def test_create_duplicate(agency_repo_with_data: AgencyRepository, valid_agency)
         agency_repo_with_data.create(valid_agency)
 
 
+def test_create_many(agency_repo_empty: AgencyRepository):
+    agencies = [
+        schemas.AgencyCreate(name="Department of Batches", bureau="Bureau of Rows"),
+        schemas.AgencyCreate(name="Department of Batches", bureau=" "),
+    ]
+    result = agency_repo_empty.create_many(agencies)
+    assert len(result) == 2
+    assert all(agency.id for agency in result)
+    assert result[1].bureau is None
+
+
+@pytest.mark.parametrize("bureau", [None, "", " "])
+def test_create_many_duplicate_bureau_spelling(agency_repo_empty: AgencyRepository, bureau: str | None):
+    agency_repo_empty.create_many([schemas.AgencyCreate(name="Department of Batches", bureau=None)])
+    with pytest.raises(Exception):
+        agency_repo_empty.create_many([schemas.AgencyCreate(name="Department of Batches", bureau=bureau)])
+    with pytest.raises(Exception):
+        agency_repo_empty.create_many([
+            schemas.AgencyCreate(name="Department of Rows", bureau=None), schemas.AgencyCreate(name="Department of Rows", bureau=bureau)
+        ])
+
+
+def test_create_many_duplicate(agency_repo_with_data: AgencyRepository, valid_agency):
+    new_agency = schemas.AgencyCreate(name="Department of Batches", bureau=None)
+    with pytest.raises(Exception):
+        agency_repo_with_data.create_many([new_agency, valid_agency])
+
+
+def test_save_without_commit(agency_repo_empty: AgencyRepository, valid_agency):
+    result = agency_repo_empty.save(models.Agency(name=valid_agency.name, bureau=valid_agency.bureau), commit=False)
+    assert result.id
+    agency_repo_empty.commit()
+    assert agency_repo_empty.find_by_id(result.id) is not None
+
+
+def test_save_many(agency_repo_empty: AgencyRepository):
+    result = agency_repo_empty.save_many([
+        models.Agency(name="Department of Batches", bureau="Bureau of Rows"),
+        models.Agency(name="Department of Batches", bureau="Bureau of Columns"),
+    ])
+    ids = [agency.id for agency in result]
+    assert len(set(ids)) == 2
+    assert agency_repo_empty.find_by_id(ids[1]).bureau == "Bureau of Columns"
+
+
+def test_save_many_reloads_in_one_query(agency_repo_empty: AgencyRepository):
+    with collect_queries() as stats:
+        result = agency_repo_empty.save_many([models.Agency(name="Department of Batches", bureau=f"Bureau {n}") for n in range(5)])
+        assert [agency.bureau for agency in result] == [f"Bureau {n}" for n in range(5)]
+    assert len([statement for statement in stats.statements if statement.lstrip().upper().startswith("SELECT")]) == 1
+
+
 def test_find_by_name(agency_repo_with_data: AgencyRepository, valid_agency):
     result = agency_repo_with_data.find_by_name(valid_agency)
     assert result is not None
@@ -2,10 +2,10 @@ import pytest
 import jwt
 
 
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from fastapi import status, HTTPException
 from fastapi.testclient import TestClient
-from training.api.deps import certificate_repository
+from training.api.deps import certificate_repository, async_certificate_repository
 from training.config import settings
 from training.main import app
 from training.schemas import UserCertificate, GspcCertificate, CertificateListValue
@@ -69,7 +69,10 @@ def adminJWT(admin_user):
 @pytest.fixture
 def fake_cert_repo():
     mock = MagicMock()
+    # Listings go through the async repository
+    mock.get_all_certificates_by_userId = AsyncMock()
     app.dependency_overrides[certificate_repository] = lambda: mock
+    app.dependency_overrides[async_certificate_repository] = lambda: mock
     yield mock
     app.dependency_overrides = {}
 
@@ -88,11 +88,12 @@ class TestGspc:
     @patch('training.config.settings', 'JWT_SECRET', 'super_secret')
     @patch('training.api.api_v1.gspc.send_gspc_invite_email')
     def test_gspc_invite_success(self, send_gspc_invite_email, goodJWT, standard_payload, fake_gspc_invite_repo):
-        '''Given 2 valid emails it should call the db create method for each'''
+        '''Given 2 valid emails it should save both invites in one batch'''
         response = post_gspc_invite(standard_payload, goodJWT)
 
         assert response.status_code == HTTPStatus.OK
-        assert fake_gspc_invite_repo.create.call_count == 2
+        assert fake_gspc_invite_repo.create_many.call_count == 1
+        assert len(fake_gspc_invite_repo.create_many.call_args.kwargs["emails"]) == 2
 
     @patch('training.config.settings', 'JWT_SECRET', 'super_secret')
     @patch('training.api.api_v1.gspc.send_gspc_invite_email')
@@ -119,18 +120,20 @@ class TestGspc:
     @patch('training.config.settings', 'JWT_SECRET', 'super_secret')
     @patch('training.api.api_v1.gspc.send_gspc_invite_email')
     def test_gspc_invite_sends_emails_to_valid_emails(self, send_gspc_invite_email, goodJWT, standard_payload, fake_gspc_invite_repo):
-        '''Given 2 valid emails send 2 invite emails'''
+        '''Given 2 valid emails queue 2 invite emails'''
 
         post_gspc_invite(standard_payload, goodJWT)
-        assert send_gspc_invite_email.call_count == 2
+        assert send_gspc_invite_email.delay_many.call_count == 1
+        emails = [email for email, link in send_gspc_invite_email.delay_many.call_args.args[0]]
+        assert emails == ["ValidEmail@test.com", "ValidEmail2@test.com"]
 
     @patch('training.config.settings', 'JWT_SECRET', 'super_secret')
     @patch('training.api.api_v1.gspc.send_gspc_invite_email')
     def test_gspc_invite_logs_emails(self, send_gspc_invite_email, goodJWT, standard_payload, fake_gspc_invite_repo):
-        '''Given 2 valid emails logger logs emails sent'''
+        '''Given 2 valid emails logger logs emails queued'''
         with patch('training.api.api_v1.gspc.logging') as logger:
             post_gspc_invite(standard_payload, goodJWT)
-            assert logger.info.call_count == 2
+            logger.info.assert_called_once_with("Queued 2 gspc invite emails")
 
     def test_gspc_report(self, goodJWT, fake_gspc_completion_repository):
         '''Given a valid request returns a csv'''
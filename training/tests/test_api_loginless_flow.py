@@ -1,12 +1,12 @@
 import pytest
 import jwt
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 from training.main import app
 from training.api.api_v1.loginless_flow import page_lookup
 from training.data import UserCache
 from training.schemas import User, TempUser, Role, Agency, UserCreate, UserJWT
-from training.api.deps import user_repository
+from training.api.deps import async_user_repository
 from training.config import settings
 
 client = TestClient(app)
@@ -39,8 +39,8 @@ def fake_cache():
 
 @pytest.fixture
 def fake_user_repo():
-    mock = MagicMock()
-    app.dependency_overrides[user_repository] = lambda: mock
+    mock = AsyncMock()
+    app.dependency_overrides[async_user_repository] = lambda: mock
     yield mock
     app.dependency_overrides = {}
 
@@ -271,7 +271,7 @@ class TestAuth:
         client.get(
             f"/api/v1/get-user/{token}"
         )
-        assert fake_user_repo.create.called_once_with(user_complete)
+        fake_user_repo.create.assert_awaited_once_with(UserCreate.model_validate(user_complete))
 
     def test_get_user_returns_user(self, fake_cache, fake_user_repo, user_complete, authorized_complete):
         '''Should return the user and JWT'''
@@ -287,4 +287,6 @@ class TestAuth:
 
         assert response.status_code == 200
         assert user == UserJWT.model_validate(authorized_complete).model_dump()
-        assert decoded_user == UserJWT.model_validate(authorized_complete).model_dump()
+        assert decoded_user == {
+            "id": user["id"], "roles": user["roles"], "ver": 2, "iat": decoded_user["iat"], "exp": decoded_user["iat"] + settings.JWT_TTL
+        }
@@ -1,9 +1,14 @@
+import jwt
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from training import models
+from training.config import settings
 from training.errors import IncompleteQuizResponseError, QuizNotFoundError
 from training.main import app
-from training.repositories import QuizRepository
+from training.repositories import AsyncQuizRepository, QuizAnalysisRepository, QuizRepository
 from training.schemas import QuizCreate
 from training.services import QuizService
 from .factories import QuizCreateSchemaFactory, QuizGradeSchemaFactory, QuizSchemaFactory, QuizSubmissionSchemaFactory
@@ -36,7 +41,7 @@ def test_create_quiz_invalid():
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
-def test_get_quizzes(mock_quiz_repo: QuizRepository):
+def test_get_quizzes(mock_quiz_repo: AsyncQuizRepository):
     mock_quiz_repo.find_all.return_value = [QuizSchemaFactory.build()]
     response = client.get(
         "/api/v1/quizzes"
@@ -44,7 +49,7 @@ def test_get_quizzes(mock_quiz_repo: QuizRepository):
     assert response.status_code == status.HTTP_200_OK
 
 
-def test_get_quizzes_filtered(mock_quiz_repo: QuizRepository):
+def test_get_quizzes_filtered(mock_quiz_repo: AsyncQuizRepository):
     mock_quiz_repo.find_all.return_value = [QuizSchemaFactory.build()]
     filters = {}
     filters["topic"] = "Travel"
@@ -55,7 +60,7 @@ def test_get_quizzes_filtered(mock_quiz_repo: QuizRepository):
     mock_quiz_repo.find_all.assert_called_with(filters=filters)
 
 
-def test_get_quiz(mock_quiz_repo: QuizRepository):
+def test_get_quiz(mock_quiz_repo: AsyncQuizRepository):
     mock_quiz_repo.find_by_id.return_value = QuizSchemaFactory.build()
     response = client.get(
         "/api/v1/quizzes/1"
@@ -64,7 +69,7 @@ def test_get_quiz(mock_quiz_repo: QuizRepository):
     mock_quiz_repo.find_by_id.assert_called_with(1)
 
 
-def test_get_quiz_invalid_id(mock_quiz_repo: QuizRepository):
+def test_get_quiz_invalid_id(mock_quiz_repo: AsyncQuizRepository):
     mock_quiz_repo.find_by_id.return_value = None
     response = client.get(
         "/api/v1/quizzes/1"
@@ -101,3 +106,24 @@ def test_submit_quiz_incomplete(mock_quiz_service: QuizService, valid_jwt: str):
         headers={"Authorization": f"Bearer {valid_jwt}"}
     )
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_quiz_analysis(api_db_with_data: Session):
+    quiz_id = api_db_with_data.scalars(select(models.Quiz.id).order_by(models.Quiz.id)).first()
+    QuizAnalysisRepository(api_db_with_data).rebuild(quiz_id)
+    token = jwt.encode({"id": 1, "name": "Admin", "email": "admin@example.com", "roles": ["Admin"]}, settings.JWT_SECRET, algorithm="HS256")
+
+    response = client.get(f"/api/v1/quizzes/{quiz_id}/analysis", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["quiz_id"] == quiz_id
+    assert response.json()["versions"][0]["current"]
+
+    response = client.get("/api/v1/quizzes/0/analysis", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_quiz_analysis_requires_admin(api_db_with_data: Session):
+    token = jwt.encode({"id": 1, "name": "Report", "email": "report@example.com", "roles": ["Report"]}, settings.JWT_SECRET, algorithm="HS256")
+    response = client.get("/api/v1/quizzes/1/analysis", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+from fastapi import status
+import jwt
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from training import models
+from training.config import settings
+from training.main import app
+from training.repositories import UserRepository
+
+
+client = TestClient(app)
+
+
+def _report_jwt(db: Session, agency_names: list[str]) -> str:
+    user = db.scalars(select(models.User).order_by(models.User.id)).first()
+    agency_ids = list(db.scalars(select(models.Agency.id).where(models.Agency.name.in_(agency_names))))
+    UserRepository(db).edit_user_for_reporting(user.id, agency_ids, "test_user")
+    return jwt.encode({"id": user.id, "name": user.name, "email": user.email, "roles": ["Report"]}, settings.JWT_SECRET, algorithm="HS256")
+
+
+def test_get_report_summary(api_db_with_data: Session):
+    token = _report_jwt(api_db_with_data, ["Department of Mysteries"])
+    response = client.get("/api/v1/reports/summary", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{
+        "agency": "Department of Mysteries",
+        "bureau": None,
+        "quiz": "Travel Training for Ministry of Magic",
+        "month": "2024-01-01",
+        "passed": 1,
+    }]
+
+
+def test_get_report_summary_filtered(api_db_with_data: Session):
+    token = _report_jwt(api_db_with_data, ["Department of Mysteries"])
+    response = client.get(
+        "/api/v1/reports/summary?quiz_names=Another%20Quiz&quiz_names=Yet%20Another%20Quiz",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+def test_get_report_summary_other_agencies(api_db_with_data: Session):
+    token = _report_jwt(api_db_with_data, ["Other"])
+    response = client.get("/api/v1/reports/summary", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+def test_get_report_summary_without_report_agencies(api_db_with_data: Session):
+    user = api_db_with_data.scalars(select(models.User).order_by(models.User.id)).first()
+    token = jwt.encode({"id": user.id, "name": user.name, "email": user.email, "roles": ["Report"]}, settings.JWT_SECRET, algorithm="HS256")
+    response = client.get("/api/v1/reports/summary", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_report_summary_requires_report_role(api_db_with_data: Session, valid_jwt: str):
+    response = client.get("/api/v1/reports/summary", headers={"Authorization": f"Bearer {valid_jwt}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
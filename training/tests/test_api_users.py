@@ -218,3 +218,16 @@ def test_get_smartpay_training_report(reportJWT):
         lines = csv_output.readlines()
         assert lines[0].strip() == 'Full Name,Email Address,Agency,Bureau,Quiz Name,Quiz Completion Date and Time'
         assert lines[1].strip() == 'John Doe,john.doe@example.com,Agency X,Bureau Y,Sample Quiz,10/11/2024 12:00:00'
+
+
+def test_get_users_query_budget(adminJWT, api_db_with_data, query_budget):
+    # The count, the search with agencies joined, and one query each for roles and report agencies
+    with query_budget(4):
+        response = client.get(
+            "/api/v1/users?searchText=example.com&page_number=1",
+            headers={"Authorization": f"Bearer {adminJWT}"}
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total_count"] == 3
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert response.headers["Server-Timing"].endswith('desc="4 queries"')
@@ -1,11 +1,17 @@
+import time
+from datetime import datetime, timedelta, timezone
 from fastapi import FastAPI, Depends
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 import jwt
 import pytest
+from redis.exceptions import ConnectionError
 
-from training.api.auth import JWTUser, RequireRole, user_from_form
+from training import models
+from training.api.auth import JWTUser, RequireRole, TokenCache, decode_token, encode_jwt, token_cache, user_from_form
 from training.config import settings
+from training.data import UserProfileCache
+from training.schemas import UserJWT
 
 
 app = FastAPI()
@@ -77,6 +83,11 @@ def read_current_user_from_form(user=Depends(user_from_form)):
     return user
 
 
+@app.get("/shared")
+def read_shared_user(user=Depends(JWTUser()), admin=Depends(RequireRole(['aopc']))):
+    return user
+
+
 client = TestClient(app)
 
 
@@ -151,3 +162,113 @@ class TestUserFromFormField:
         # without expected data FastAPI returns 422 Unprocessable Entity
         response = client.post("/home", data={})
         assert response.status_code == 422
+
+
+class TestTokenCache:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        token_cache.clear()
+        yield
+        token_cache.clear()
+
+    def test_decodes_each_token_once(self, goodJWT, user):
+        with patch("training.api.auth.jwt.decode", wraps=jwt.decode) as decode:
+            assert decode_token(goodJWT) == user
+            assert decode_token(goodJWT) == user
+        decode.assert_called_once()
+
+    def test_invalid_tokens_are_not_cached(self, badJWT):
+        assert decode_token(badJWT) is None
+        assert len(token_cache) == 0
+
+    def test_expired_tokens_are_dropped(self):
+        cache = TokenCache(maxsize=2)
+        cache.set("current", {"id": 1, "exp": time.time() + 60})
+        cache.set("expired", {"id": 2, "exp": time.time() - 1})
+
+        assert cache.get("current") is not None
+        assert cache.get("expired") is None
+        assert len(cache) == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = TokenCache(maxsize=2)
+        cache.set("first", {"id": 1})
+        cache.set("second", {"id": 2})
+        cache.get("first")
+        cache.set("third", {"id": 3})
+
+        assert cache.get("first") == {"id": 1}
+        assert cache.get("second") is None
+        assert cache.get("third") == {"id": 3}
+
+    def test_one_decode_per_request(self, goodJWT, user):
+        with patch("training.api.auth.decode_token", wraps=decode_token) as decode:
+            response = client.get("/shared", headers={"Authorization": f"Bearer {goodJWT}"})
+        assert response.status_code == 200
+        assert response.json() == user
+        decode.assert_called_once()
+
+
+class TestCompactJWT:
+    @pytest.fixture
+    def db_user(self, db_with_data):
+        return db_with_data.query(models.User).first()
+
+    @pytest.fixture
+    def find_by_id(self, db_user):
+        with patch("training.api.auth.AsyncUserRepository") as repo:
+            repo.return_value.find_by_id = AsyncMock(return_value=db_user)
+            yield repo.return_value.find_by_id
+
+    def test_encode_jwt(self, db_user):
+        user = UserJWT.model_validate(db_user)
+        with patch("training.api.auth.time.time", return_value=1_700_000_000):
+            token = encode_jwt(user)
+        claims = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"], options={"verify_exp": False})
+        assert claims == {"id": user.id, "roles": user.roles, "ver": 2, "iat": 1_700_000_000, "exp": 1_700_000_000 + settings.JWT_TTL}
+
+    def test_expired_token(self, db_user, find_by_id):
+        with patch("training.api.auth.time.time", return_value=time.time() - settings.JWT_TTL - 60):
+            token = encode_jwt(UserJWT.model_validate(db_user))
+
+        response = client.get("/home", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
+        find_by_id.assert_not_awaited()
+
+    def test_legacy_token_cutoff(self, goodJWT):
+        with patch.object(settings, "LEGACY_JWT_ACCEPTED_UNTIL", datetime.now(timezone.utc) + timedelta(days=1)):
+            assert decode_token(goodJWT) is not None
+        # Also once its claims are cached
+        with patch.object(settings, "LEGACY_JWT_ACCEPTED_UNTIL", datetime.now(timezone.utc) - timedelta(days=1)):
+            assert decode_token(goodJWT) is None
+            assert client.get("/home", headers={"Authorization": f"Bearer {goodJWT}"}).status_code == 403
+
+    def test_loads_and_caches_profile(self, db_user, find_by_id):
+        user = UserJWT.model_validate(db_user)
+        headers = {"Authorization": f"Bearer {encode_jwt(user)}"}
+
+        assert client.get("/home", headers=headers).json() == user.model_dump()
+        assert client.get("/home", headers=headers).json() == user.model_dump()
+        find_by_id.assert_awaited_once_with(user.id)
+        assert UserProfileCache().get(user.id) == user.model_dump()
+
+    def test_roles_come_from_token(self, db_user, find_by_id):
+        user = UserJWT.model_validate(db_user)
+        UserProfileCache().set(user.model_copy(update={"roles": ["Admin"]}))
+
+        response = client.get("/home", headers={"Authorization": f"Bearer {encode_jwt(user)}"})
+        assert response.json()["roles"] == user.roles
+        find_by_id.assert_not_awaited()
+
+    def test_unknown_user(self, db_user, find_by_id):
+        find_by_id.return_value = None
+        token = encode_jwt(UserJWT.model_validate(db_user))
+
+        response = client.get("/home", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
+
+    def test_redis_down(self, db_user, find_by_id):
+        user = UserJWT.model_validate(db_user)
+        with patch.object(UserProfileCache, "get", side_effect=ConnectionError("Redis is down")):
+            response = client.get("/home", headers={"Authorization": f"Bearer {encode_jwt(user)}"})
+        assert response.json() == user.model_dump()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from training.benchmarks import Bench, BenchmarkResult, SUITES, compare, write_results
+from training.benchmarks.quiz import make_quiz, make_service, make_submission
+from training.benchmarks.startup import LAZY_MODULES, MODULE, import_times
+
+
+def test_result_stats():
+    result = BenchmarkResult("grade", {"questions": 25}, [0.3, 0.1, 0.2])
+    stats = result.to_dict()
+    assert result.key == "grade[questions=25]"
+    assert stats["rounds"] == 3
+    assert stats["min"] == 0.1
+    assert stats["median"] == 0.2
+    assert stats["max"] == 0.3
+
+
+def test_run_awaits_coroutines():
+    calls = []
+
+    async def grade():
+        await asyncio.sleep(0)
+        calls.append(1)
+
+    bench = Bench()
+    try:
+        result = bench.run("grade", grade, rounds=3, warmup=1)
+    finally:
+        bench.close()
+    assert len(calls) == 4
+    assert len(result.timings) == 3
+
+
+def test_run_measures_memory():
+    bench = Bench()
+    try:
+        result = bench.run("allocate", lambda: bytearray(1024 * 1024), rounds=1, memory=True)
+    finally:
+        bench.close()
+    assert result.peak_memory >= 1024 * 1024
+    assert result.to_dict()["peak_memory"] == result.peak_memory
+
+
+def test_serialization_suite():
+    bench = Bench(rounds=1)
+    try:
+        SUITES["serialization"](bench)
+    finally:
+        bench.close()
+    assert {r.params["path"] for r in bench.results} == {"fastapi", "orjson", "model"}
+    assert all(r.peak_memory for r in bench.results)
+
+
+def test_importing_the_app_leaves_heavy_modules_for_later():
+    # How long the import takes depends on the machine, the startup suite checks that
+    times = import_times()
+    assert MODULE in times
+    assert not set(LAZY_MODULES) & set(times)
+
+
+def test_grade_benchmark_grades_the_submission():
+    quiz = make_quiz(10)
+    service = make_service(quiz)
+    bench = Bench()
+    try:
+        grade = bench._loop.run_until_complete(service.grade(quiz.id, 1, make_submission(quiz, passing=False)))
+    finally:
+        bench.close()
+    assert grade.question_count == 10
+    assert grade.correct_count == 0
+
+
+def test_quiz_suite(tmp_path):
+    bench = Bench(rounds=1)
+    try:
+        SUITES["quiz"](bench)
+    finally:
+        bench.close()
+    path = tmp_path / "results.json"
+    write_results(bench, str(path))
+    results = json.loads(path.read_text())["results"]
+    assert {(r["params"]["questions"], r["params"]["passed"]) for r in results} == {(n, p) for n in (10, 25, 100) for p in (False, True)}
+
+
+def test_compare():
+    baseline = {"results": [{"name": "grade", "params": {"questions": 25}, "median": 0.010},
+                            {"name": "report", "params": {}, "median": 1.0}]}
+    current = {"results": [{"name": "grade", "params": {"questions": 25}, "median": 0.012},
+                           {"name": "report", "params": {}, "median": 1.05},
+                           {"name": "new", "params": {}, "median": 1.0}]}
+    assert compare(baseline, current, threshold=0.1) == [
+        ("grade[questions=25]", 0.010, 0.012, True),
+        ("report", 1.0, 1.05, False),
+    ]
@@ -1,5 +1,9 @@
 from typing import List
-from training.repositories import CertificateRepository
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from training import models
+from training.repositories import CertificateRepository, AsyncCertificateRepository
 
 
 def test_get_certificates_by_userId(cert_repo_with_data: CertificateRepository, valid_user_ids: List[int]):
@@ -16,3 +20,12 @@ def test_get_certificate_by_id(cert_repo_with_data: CertificateRepository, passe
     result = cert_repo_with_data.get_certificate_by_id(id)
     assert result is not None
     assert result.id == passed_quiz_completion_id
+
+
+@pytest.mark.anyio
+async def test_async_get_certificates_by_userId(async_db_with_data: AsyncSession):
+    repo = AsyncCertificateRepository(async_db_with_data)
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    result = await repo.get_all_certificates_by_userId(user_id)
+    assert len(result) == 1
+    assert result[0].user_id == user_id
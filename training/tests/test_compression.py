@@ -0,0 +1,98 @@
+import gzip
+from unittest.mock import patch
+
+import brotli
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from training import compression
+from training.compression import CompressionMiddleware, accepted_encoding
+
+BODY = "Leopold Bloom," * 200
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, cached_routes=("/agencies",), minimum_size=1024)
+
+
+@app.get("/report")
+def report():
+    return Response(BODY, media_type="application/csv")
+
+
+@app.get("/agencies")
+def agencies():
+    return [{"id": id, "name": "General Services Administration"} for id in range(100)]
+
+
+@app.get("/small")
+def small():
+    return {"name": "Leopold Bloom"}
+
+
+@app.get("/certificate")
+def certificate():
+    return Response(BODY.encode(), media_type="application/pdf")
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse((BODY for _ in range(3)), media_type="text/csv")
+
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("", None),
+])
+def test_accepted_encoding(accept_encoding, expected):
+    assert accepted_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+def test_compresses_allowed_content_types(encoding, decompress):
+    response = client.get("/report", headers={"Accept-Encoding": encoding})
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.text == BODY
+
+
+def test_sends_small_and_excluded_responses_as_they_are():
+    for path in ("/small", "/certificate"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+
+def test_without_accept_encoding():
+    response = client.get("/report", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == BODY
+
+
+def test_compresses_streamed_responses():
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == BODY * 3
+
+
+def test_caches_compressed_bodies_of_cached_routes():
+    with patch("training.compression.compress", wraps=compression.compress) as compress:
+        first = client.get("/agencies", headers={"Accept-Encoding": "br"})
+        second = client.get("/agencies", headers={"Accept-Encoding": "br"})
+        client.get("/report", headers={"Accept-Encoding": "br"})
+        client.get("/report", headers={"Accept-Encoding": "br"})
+
+    assert first.content == second.content
+    assert compress.call_count == 3
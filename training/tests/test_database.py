@@ -0,0 +1,126 @@
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from training import models
+from training.api import deps
+from training.config import settings
+from training.database import engine, replica_engine, SessionLocal, ReplicaSessionLocal, checkout, pool_metrics
+from training.database.query_stats import collect_queries
+from training.main import app
+
+client = TestClient(app)
+
+
+def test_checkout_uses_default_statement_timeout():
+    with SessionLocal() as session:
+        checkout(session)
+        assert session.execute(text("SHOW statement_timeout")).scalar() == "15s"
+
+
+def test_checkout_with_statement_timeout():
+    with SessionLocal() as session:
+        checkout(session, statement_timeout=120000)
+        assert session.execute(text("SHOW statement_timeout")).scalar() == "2min"
+        # It should survive a commit part way through a request
+        session.commit()
+        assert session.execute(text("SHOW statement_timeout")).scalar() == "2min"
+
+    # and not leak to the next session using the pooled connection
+    with SessionLocal() as session:
+        checkout(session)
+        assert session.execute(text("SHOW statement_timeout")).scalar() == "15s"
+
+
+def test_checkout_records_wait():
+    pool_metrics.reset()
+    with SessionLocal() as session:
+        checkout(session)
+        snapshot = pool_metrics.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["timeouts"] == 0
+    assert snapshot["wait_max"] >= 0
+    assert snapshot["checked_out"] >= 1
+
+
+requires_replica = pytest.mark.skipif(settings.DB_REPLICA_URI is None, reason="DB_REPLICA_URI is not set")
+
+
+@pytest.mark.skipif(settings.DB_REPLICA_URI is not None, reason="DB_REPLICA_URI is set")
+def test_replica_defaults_to_primary():
+    assert replica_engine is engine
+
+
+@requires_replica
+def test_replica_session_uses_replica():
+    with SessionLocal() as primary, ReplicaSessionLocal() as replica:
+        checkout(replica)
+        primary_name = primary.execute(text("SELECT current_database()")).scalar()
+        replica_name = replica.execute(text("SELECT current_database()")).scalar()
+    assert primary_name != replica_name
+
+
+@requires_replica
+def test_agencies_are_read_from_replica():
+    with ReplicaSessionLocal() as replica:
+        agency = models.Agency(name="Replica Only Agency", bureau=None)
+        replica.add(agency)
+        replica.commit()
+        try:
+            response = client.get("/api/v1/agencies")
+            assert response.status_code == 200
+            assert "Replica Only Agency" in [agency["name"] for agency in response.json()]
+            with SessionLocal() as primary:
+                assert primary.query(models.Agency).filter(models.Agency.name == "Replica Only Agency").count() == 0
+        finally:
+            replica.delete(agency)
+            replica.commit()
+
+
+def test_collect_queries(db: Session):
+    # Starts the test fixture's savepoint
+    db.execute(text("SELECT 0"))
+    with collect_queries() as stats:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT 2"))
+    assert stats.count == 2
+    assert stats.statements == ["SELECT 1", "SELECT 2"]
+    assert stats.duration > 0
+
+
+def test_failed_query_is_not_counted(db: Session):
+    db.execute(text("SELECT 0"))
+    with collect_queries() as stats:
+        with pytest.raises(DBAPIError):
+            db.execute(text("SELECT * FROM no_such_table"))
+    assert stats.count == 0
+
+
+@patch.object(settings, "DB_SLOW_QUERY_THRESHOLD", 5)
+def test_slow_query_log(db: Session, caplog):
+    db.execute(text("SELECT pg_sleep(0.02)"))
+    db.execute(text("SELECT 1"))
+    slow_queries = [record.message for record in caplog.records if record.message.startswith("Slow query")]
+    assert len(slow_queries) == 1
+    assert "outside a request: SELECT pg_sleep(0.02)" in slow_queries[0]
+
+
+@patch.object(settings, "DB_SLOW_QUERY_THRESHOLD", 5)
+def test_slow_query_log_includes_route(caplog):
+    app.dependency_overrides[deps.agency_repository] = lambda: _SlowAgencyRepository()
+    try:
+        response = client.get("/api/v1/agencies")
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert 'desc="1 queries"' in response.headers["Server-Timing"]
+    assert any("from GET /api/v1/agencies: SELECT pg_sleep" in record.message for record in caplog.records)
+
+
+class _SlowAgencyRepository:
+    def get_agencies_with_bureaus(self):
+        with SessionLocal() as session:
+            session.execute(text("SELECT pg_sleep(0.02)"))
+        return []
@@ -3,10 +3,11 @@ from unittest.mock import MagicMock, patch
 from training import models, schemas
 from training.errors import SendEmailError
 from training.services import GspcService
+from training.services.gspc import send_gspc_certificate
 from training.repositories import CertificateRepository, GspcCompletionRepository
 from sqlalchemy.orm import Session
 from .factories import GspcCompletionFactory
-from datetime import datetime
+from datetime import date, datetime
 from unittest.mock import ANY
 
 from ..api import email
@@ -52,6 +53,35 @@ def test_grade_passing(
     assert result.cert_id == 1
 
 
+@patch.object(send_gspc_certificate, "delay")
+@patch.object(GspcService, "email_certificate")
+def test_grade_passing_queues_email(
+        mock_gspc_service_email_certificate: MagicMock,
+        mock_send_gspc_certificate_delay: MagicMock,
+        db_with_data: Session,
+        valid_gspc_passing_submission: schemas.GspcSubmission,
+        valid_user_ids
+):
+    gspc_service = GspcService(db_with_data, queue_emails=True)
+
+    result = gspc_service.grade(valid_user_ids[-1], submission=valid_gspc_passing_submission)
+
+    # The result is returned before the certificate is rendered and emailed
+    mock_gspc_service_email_certificate.assert_not_called()
+    assert result.passed
+    completion = db_with_data.get(models.GspcCompletion, result.cert_id)
+    mock_send_gspc_certificate_delay.assert_called_once_with(
+        valid_user_ids[-1], completion.submit_ts.isoformat(), completion.certification_expiration_date.isoformat()
+    )
+
+
+@patch.object(GspcService, "send_certificate")
+def test_send_gspc_certificate(mock_gspc_service_send_certificate: MagicMock):
+    send_gspc_certificate(3, "2024-01-24T10:30:00", "2025-01-24")
+
+    mock_gspc_service_send_certificate.assert_called_once_with(3, datetime(2024, 1, 24, 10, 30), date(2025, 1, 24))
+
+
 @patch.object(GspcCompletionRepository, "create")
 def test_grade_failing(
         mock_gspc_completion_repo_create: MagicMock,
@@ -0,0 +1,118 @@
+import json
+from unittest.mock import ANY, MagicMock, patch
+
+import fakeredis
+import jwt
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+from training import schemas
+from training.api.deps import gspc_service
+from training.config import settings
+from training.data import IdempotencyStore
+from training.errors import QuizNotFoundError
+from training.main import app
+from training.services import QuizService
+from .factories import QuizGradeSchemaFactory, QuizSubmissionSchemaFactory
+
+client = TestClient(app)
+
+SUBMISSION = QuizSubmissionSchemaFactory.build().model_dump()
+
+
+@pytest.fixture
+def fake_redis():
+    with patch("training.data.idempotency_store.redis", fakeredis.FakeRedis()) as redis:
+        yield redis
+
+
+@pytest.fixture
+def user_jwt() -> str:
+    return jwt.encode({"id": 42, "name": "Molly Bloom", "email": "molly.bloom@example.gov", "roles": []}, settings.JWT_SECRET, algorithm="HS256")
+
+
+def submit(user_jwt: str, key: str | None, submission: dict = SUBMISSION, quiz_id: int = 1):
+    headers = {"Authorization": f"Bearer {user_jwt}"}
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return client.post(f"/api/v1/quizzes/{quiz_id}/submission", json=submission, headers=headers)
+
+
+def test_repeated_submission_replayed(mock_quiz_service: QuizService, fake_redis, user_jwt: str):
+    mock_quiz_service.grade.return_value = QuizGradeSchemaFactory.build()
+
+    first = submit(user_jwt, "attempt-1")
+    second = submit(user_jwt, "attempt-1")
+
+    assert mock_quiz_service.grade.call_count == 1
+    assert first.status_code == second.status_code == status.HTTP_201_CREATED
+    assert second.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_submissions_without_key_processed(mock_quiz_service: QuizService, fake_redis, user_jwt: str):
+    mock_quiz_service.grade.return_value = QuizGradeSchemaFactory.build()
+
+    submit(user_jwt, None)
+    submit(user_jwt, None)
+
+    assert mock_quiz_service.grade.call_count == 2
+    assert fake_redis.keys() == []
+
+
+def test_key_reused_for_different_submission(mock_quiz_service: QuizService, fake_redis, user_jwt: str):
+    mock_quiz_service.grade.return_value = QuizGradeSchemaFactory.build()
+
+    submit(user_jwt, "attempt-1")
+    response = submit(user_jwt, "attempt-1", quiz_id=2)
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert mock_quiz_service.grade.call_count == 1
+
+
+def test_failed_submission_can_be_retried(mock_quiz_service: QuizService, fake_redis, user_jwt: str):
+    mock_quiz_service.grade.side_effect = [QuizNotFoundError, QuizGradeSchemaFactory.build()]
+
+    assert submit(user_jwt, "attempt-1").status_code == status.HTTP_404_NOT_FOUND
+    assert submit(user_jwt, "attempt-1").status_code == status.HTTP_201_CREATED
+    assert mock_quiz_service.grade.call_count == 2
+
+
+@patch.object(settings, "IDEMPOTENCY_WAIT", 0.2)
+def test_submission_in_progress(mock_quiz_service: QuizService, user_jwt: str):
+    # The key is held by a concurrent request that doesn't finish in time
+    pending = {"state": "pending", "fingerprint": ANY, "token": "other-request"}
+    with patch.object(IdempotencyStore, "claim", return_value=(None, pending)) as claim:
+        response = submit(user_jwt, "attempt-1")
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert claim.call_count > 1
+    mock_quiz_service.grade.assert_not_called()
+
+
+def test_submission_processed_without_redis(mock_quiz_service: QuizService, user_jwt: str):
+    mock_quiz_service.grade.return_value = QuizGradeSchemaFactory.build()
+
+    with patch.object(IdempotencyStore, "claim", side_effect=ConnectionError):
+        submit(user_jwt, "attempt-1")
+        submit(user_jwt, "attempt-1")
+
+    assert mock_quiz_service.grade.call_count == 2
+
+
+def test_gspc_submission_replayed(fake_redis, user_jwt: str, valid_gspc_passing_submission: schemas.GspcSubmission):
+    mock = MagicMock()
+    mock.grade.return_value = schemas.GspcResult(passed=True, cert_id=7)
+    app.dependency_overrides[gspc_service] = lambda: mock
+    headers = {"Authorization": f"Bearer {user_jwt}", "Idempotency-Key": "attempt-1"}
+    body = json.loads(valid_gspc_passing_submission.model_dump_json())
+
+    try:
+        responses = [client.post("/api/v1/gspc/submission", json=body, headers=headers) for _ in range(2)]
+    finally:
+        app.dependency_overrides = {}
+
+    assert mock.grade.call_count == 1
+    assert [response.json() for response in responses] == [{"passed": True, "cert_id": 7}] * 2
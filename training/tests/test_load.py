@@ -0,0 +1,72 @@
+import json
+from email.message import EmailMessage
+from uuid import uuid4
+import httpx
+import pytest
+from training.benchmarks.load import Fixtures, Recorder, SMTPStandIn, _parse_mix, run_load
+
+
+@pytest.fixture
+def fake_api() -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/api/v1/get-link":
+            # The app emails the link, the stand-in catches it
+            SMTPStandIn.mailbox[json.loads(request.content)["user"]["email"]] = str(uuid4())
+            return httpx.Response(201)
+        if path.startswith("/api/v1/get-user/"):
+            return httpx.Response(200, json={"jwt": "user-jwt"})
+        if path == "/api/v1/quizzes/1/submission":
+            assert request.headers["Authorization"] == "Bearer user-jwt"
+            return httpx.Response(201, json={"quiz_completion_id": 5})
+        if path == "/api/v1/certificate/1/5":
+            assert request.content == b"jwtToken=user-jwt"
+            return httpx.Response(200)
+        if path in ("/api/v1/quizzes/1", "/api/v1/certificates/", "/api/v1/users/download-admin-smartpay-training-report"):
+            return httpx.Response(200)
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.anyio
+async def test_run_load(fake_api: httpx.MockTransport):
+    fixtures = Fixtures(quizzes=[(1, {"responses": []}, {"responses": []})], agency_ids=[1], admin_jwt="admin-jwt")
+    async with httpx.AsyncClient(transport=fake_api, base_url="http://loadtest") as client:
+        summary = await run_load(client, fixtures, mix={"trainee": 1, "admin_export": 1}, users=3, duration=0.2, seed=0)
+
+    assert summary["errors"] == 0
+    assert summary["scenarios"]["trainee"] > 0
+    assert summary["scenarios"]["admin_export"] > 0
+    assert set(summary["steps"]) == {
+        "POST /get-link", "GET /get-user/{token}", "GET /quizzes/{id}", "POST /quizzes/{id}/submission",
+        "GET /certificates/", "POST /certificate/{certType}/{id}", "POST /users/download-admin-smartpay-training-report",
+    }
+    assert summary["steps"]["POST /get-link"]["requests"] == summary["scenarios"]["trainee"]
+
+
+def test_recorder_summary():
+    recorder = Recorder()
+    for latency in range(1, 101):
+        recorder.record("GET /quizzes/{id}", latency / 1000, ok=latency != 100)
+    summary = recorder.summary(elapsed=10)
+    assert summary["requests"] == 100
+    assert summary["errors"] == 1
+    assert summary["throughput"] == 10
+    assert summary["p50"] == pytest.approx(0.0505)
+    assert summary["p99"] == pytest.approx(0.09901)
+    assert summary["max"] == 0.1
+
+
+def test_smtp_stand_in_catches_the_token():
+    token = str(uuid4())
+    message = EmailMessage()
+    message.set_content(f'<a href="http://localhost/quiz/training_travel/?t={token}">link</a>', subtype="html")
+    message["To"] = "leopold.bloom@example.gov"
+    with SMTPStandIn("localhost", port=25) as smtp:
+        smtp.starttls()
+        smtp.send_message(message)
+    assert SMTPStandIn.mailbox.pop("leopold.bloom@example.gov") == token
+
+
+def test_parse_mix():
+    assert _parse_mix("trainee=3,admin_export") == {"trainee": 3, "admin_export": 1}
@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+import textwrap
+from unittest.mock import patch
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from training.config import settings
+from training.database import pool_metrics
+from training.main import app
+from training.metrics import REDIS_OPERATIONS, count_outcome
+from .factories import QuizSchemaFactory
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def admin_jwt():
+    user = {
+        'name': 'Albus Dumbledore',
+        'email': 'dumbledore@hogwarts.edu',
+        'roles': ['Admin']
+    }
+    return jwt.encode(user, settings.JWT_SECRET, algorithm="HS256")
+
+
+def test_metrics_requires_token():
+    response = client.get("/metrics")
+    assert response.status_code == 403
+
+
+def test_metrics_requires_admin():
+    user_jwt = jwt.encode({'name': 'Leopold Bloom', 'roles': ['Report']}, settings.JWT_SECRET, algorithm="HS256")
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {user_jwt}"})
+    assert response.status_code == 401
+
+
+@patch.object(settings, "METRICS_TOKEN", "scrape-token")
+def test_metrics_token():
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_metrics_records_route_template(mock_quiz_repo, admin_jwt: str):
+    mock_quiz_repo.find_by_id.return_value = QuizSchemaFactory.build()
+    client.get("/api/v1/quizzes/1")
+    client.get("/api/v1/quizzes/2")
+
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {admin_jwt}"})
+    assert response.status_code == 200
+    assert 'training_http_requests_total{method="GET",route="/api/v1/quizzes/{id}",status="200"}' in response.text
+    assert 'training_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/v1/quizzes/{id}",status="200"}' in response.text
+    assert 'route="/api/v1/quizzes/1"' not in response.text
+
+
+def test_metrics_unmatched_route():
+    client.get("/no/such/path")
+    assert REGISTRY.get_sample_value(
+        "training_http_requests_total", {"method": "GET", "route": "unmatched", "status": "404"}
+    ) >= 1
+
+
+def test_count_outcome():
+    def sample(outcome):
+        return REGISTRY.get_sample_value("training_redis_operations_total", {"operation": "test", "outcome": outcome}) or 0
+
+    with count_outcome(REDIS_OPERATIONS, operation="test"):
+        pass
+    with pytest.raises(ValueError):
+        with count_outcome(REDIS_OPERATIONS, operation="test"):
+            raise ValueError
+
+    assert sample("success") == 1
+    assert sample("error") == 1
+
+
+def test_pool_metrics_are_exported():
+    before = REGISTRY.get_sample_value("training_db_pool_wait_seconds_count", {"pool": "primary"}) or 0
+    pool_metrics.record_checkout(0.01)
+    assert REGISTRY.get_sample_value("training_db_pool_wait_seconds_count", {"pool": "primary"}) == before + 1
+    assert REGISTRY.get_sample_value("training_db_pool_size", {"pool": "primary"}) == settings.DB_POOL_SIZE
+
+
+def test_pool_gauges_are_summed_across_forked_workers(tmp_path):
+    # Imports the pools in a master process and forks workers from it, as
+    # gunicorn does with preload_app, in a new interpreter so the metrics
+    # are written to PROMETHEUS_MULTIPROC_DIR
+    script = textwrap.dedent("""
+        import os
+        from prometheus_client import CollectorRegistry
+        from prometheus_client.multiprocess import MultiProcessCollector
+        from training.database import pool_metrics
+
+        for _ in range(3):
+            pid = os.fork()
+            if pid == 0:
+                pool_metrics.record_checkout(0.01)
+                os._exit(0)
+            os.waitpid(pid, 0)
+
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        print(registry.get_sample_value("training_db_pool_size", {"pool": "primary"}))
+    """)
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert float(result.stdout) == 3 * settings.DB_POOL_SIZE
+
+
+def test_gunicorn_conf_turns_on_multiprocess_metrics(tmp_path):
+    # gunicorn loads its config before the app, in a new interpreter here
+    script = textwrap.dedent("""
+        import runpy
+        runpy.run_path("gunicorn.conf.py")
+        from prometheus_client import values
+        import training.metrics
+        training.metrics.HTTP_REQUESTS.labels(method="GET", route="/", status="200").inc()
+        print(values.ValueClass.__name__)
+    """)
+    env = {key: value for key, value in os.environ.items() if key.upper() != "PROMETHEUS_MULTIPROC_DIR"}
+    env["TMPDIR"] = str(tmp_path)
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "MmapedValue"
+    assert list((tmp_path / "training-metrics").glob("counter_*.db"))
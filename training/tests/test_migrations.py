@@ -0,0 +1,37 @@
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+VERSIONS = Path(__file__).parents[2] / "alembic" / "versions"
+
+
+def load_migration(name: str):
+    spec = importlib.util.spec_from_file_location(name, VERSIONS / f"{name}.py")
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def test_partition_copy_picks_up_low_ids_committed_late(db: Session):
+    migration = load_migration("d3a8c71e5f20_partition_quiz_completions")
+    bind = db.connection()
+    for table in ("old_completions", "new_completions"):
+        bind.execute(text(f'''
+            CREATE TEMP TABLE {table} (
+                id integer PRIMARY KEY, quiz_id integer, user_id integer, passed boolean, submit_ts timestamp, responses jsonb
+            )
+        '''))
+    insert = text("INSERT INTO old_completions VALUES (:id, 1, 1, true, :submit_ts, '{}')")
+
+    # Id 2 was taken by a transaction that hasn't committed yet
+    for id in (1, 3, 4, 5):
+        bind.execute(insert, {"id": id, "submit_ts": datetime(2024, 1, id)})
+    migration.copy_batches(bind, "old_completions", "new_completions", through=5, batch_size=2)
+    # It commits after its batch was copied, and a new row is added
+    bind.execute(insert, {"id": 2, "submit_ts": datetime(2024, 1, 2)})
+    bind.execute(insert, {"id": 6, "submit_ts": datetime(2024, 1, 6)})
+    migration.copy_missing(bind, "old_completions", "new_completions")
+
+    assert bind.execute(text("SELECT id FROM new_completions ORDER BY id")).scalars().all() == [1, 2, 3, 4, 5, 6]
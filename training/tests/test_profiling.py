@@ -0,0 +1,139 @@
+import asyncio
+import marshal
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import httpx
+import jwt
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from training.config import settings
+from training.data import ProfileStore
+from training.main import app
+from training.profiling import ProfiledRoute, ProfilingMiddleware
+from training.schemas import RequestProfile
+from .factories import QuizSchemaFactory
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def admin_jwt():
+    return jwt.encode({'name': 'Albus Dumbledore', 'roles': ['Admin']}, settings.JWT_SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def fake_store_save():
+    with patch.object(ProfileStore, "save") as save:
+        yield save
+
+
+@pytest.fixture
+def fake_profile_store():
+    mock = MagicMock()
+    app.dependency_overrides[ProfileStore] = lambda: mock
+    yield mock
+    app.dependency_overrides = {}
+
+
+def profiled_functions(prof: bytes) -> set[str]:
+    return {function for (_, _, function) in marshal.loads(prof)}
+
+
+def test_profile_sync_route(mock_agency_repo, admin_jwt, fake_store_save):
+    mock_agency_repo.get_agencies_with_bureaus.return_value = []
+    response = client.get("/api/v1/agencies", headers={"X-Profile": admin_jwt})
+    assert response.status_code == 200
+
+    fake_store_save.assert_called_once()
+    profile, = fake_store_save.call_args.args
+    assert response.headers["X-Profile-Id"] == profile.id
+    assert profile.route == "/api/v1/agencies"
+    assert not profile.sampled
+    assert "get_agencies" in profiled_functions(fake_store_save.call_args.kwargs["prof"])
+    assert "get_agencies" in fake_store_save.call_args.kwargs["text"]
+
+
+def test_profile_async_route(mock_quiz_repo, admin_jwt, fake_store_save):
+    mock_quiz_repo.find_by_id.return_value = QuizSchemaFactory.build()
+    response = client.get("/api/v1/quizzes/1", headers={"X-Profile": admin_jwt})
+    assert response.status_code == 200
+    assert "get_quiz" in profiled_functions(fake_store_save.call_args.kwargs["prof"])
+
+
+@pytest.mark.anyio
+async def test_profile_concurrent_async_requests(admin_jwt, fake_store_save):
+    # Both requests are in the endpoint at the same time
+    both_started = asyncio.Event()
+    started = 0
+
+    async def wait_for_both():
+        nonlocal started
+        started += 1
+        if started == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), timeout=5)
+        return {}
+
+    router = APIRouter(route_class=ProfiledRoute)
+    router.add_api_route("/wait", wait_for_both)
+    concurrent_app = FastAPI()
+    concurrent_app.include_router(router)
+    concurrent_app.add_middleware(ProfilingMiddleware)
+
+    async with httpx.AsyncClient(app=concurrent_app, base_url="http://test") as concurrent_client:
+        responses = await asyncio.gather(*[concurrent_client.get("/wait", headers={"X-Profile": admin_jwt}) for _ in range(2)])
+
+    # The second is served without a profile, rather than replacing the first one's profiler
+    assert [response.status_code for response in responses] == [200, 200]
+    assert sum("X-Profile-Id" in response.headers for response in responses) == 1
+    fake_store_save.assert_called_once()
+    assert "wait_for_both" in profiled_functions(fake_store_save.call_args.kwargs["prof"])
+
+
+def test_profile_requires_admin(mock_agency_repo, fake_store_save):
+    mock_agency_repo.get_agencies_with_bureaus.return_value = []
+    user_jwt = jwt.encode({'name': 'Leopold Bloom', 'roles': ['Report']}, settings.JWT_SECRET, algorithm="HS256")
+    response = client.get("/api/v1/agencies", headers={"X-Profile": user_jwt})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    fake_store_save.assert_not_called()
+
+
+@patch.object(settings, "PROFILE_SAMPLE_RATE", 1.0)
+def test_profile_sampled(mock_agency_repo, fake_store_save):
+    mock_agency_repo.get_agencies_with_bureaus.return_value = []
+    client.get("/api/v1/agencies")
+    profile, = fake_store_save.call_args.args
+    assert profile.sampled
+
+
+def test_not_profiled(mock_agency_repo, fake_store_save):
+    mock_agency_repo.get_agencies_with_bureaus.return_value = []
+    response = client.get("/api/v1/agencies")
+    assert "X-Profile-Id" not in response.headers
+    fake_store_save.assert_not_called()
+
+
+def test_get_profiles(admin_jwt, fake_profile_store):
+    profile = RequestProfile(id="abc", method="POST", route="/api/v1/users/download-smartpay-training-report",
+                             duration_ms=1500, sampled=False, created_on=datetime(2024, 1, 24))
+    fake_profile_store.list.return_value = [profile]
+    response = client.get("/api/v1/profiles", headers={"Authorization": f"Bearer {admin_jwt}"})
+    assert response.status_code == 200
+    assert response.json()[0]["route"] == "/api/v1/users/download-smartpay-training-report"
+
+
+def test_download_profile(admin_jwt, fake_profile_store):
+    fake_profile_store.get.return_value = b"profile"
+    response = client.get("/api/v1/profiles/abc", headers={"Authorization": f"Bearer {admin_jwt}"})
+    assert response.status_code == 200
+    assert response.content == b"profile"
+    assert response.headers["Content-Disposition"] == 'attachment; filename="profile-abc.prof"'
+    fake_profile_store.get.assert_called_once_with("abc", "prof")
+
+
+def test_download_profile_not_found(admin_jwt, fake_profile_store):
+    fake_profile_store.get.return_value = None
+    response = client.get("/api/v1/profiles/abc?format=text", headers={"Authorization": f"Bearer {admin_jwt}"})
+    assert response.status_code == 404
@@ -0,0 +1,134 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from training import models, schemas
+from training.repositories import AsyncCertificateRepository, AsyncQuizAnalysisRepository, QuizAnalysisRepository, QuizCompletionRepository
+from training.services import QuizService
+
+
+def _quiz_id(db: Session) -> int:
+    return db.scalars(select(models.Quiz.id).order_by(models.Quiz.id)).first()
+
+
+def _counts(analysis: schemas.QuizAnalysis) -> dict:
+    return {
+        version.version: (version.completions, version.passed, {
+            question.question_id: (question.responses, question.correct, {choice.choice_id: choice.selected for choice in question.choices})
+            for question in version.questions
+        })
+        for version in analysis.versions
+    }
+
+
+def test_rebuild(
+        db_with_data: Session,
+        valid_user_ids: list[int],
+        valid_passing_submission: schemas.QuizSubmission,
+        valid_failing_submission: schemas.QuizSubmission
+):
+    quiz_id = _quiz_id(db_with_data)
+    completion_repo = QuizCompletionRepository(db_with_data)
+    for submission, passed in ((valid_passing_submission, True), (valid_failing_submission, False)):
+        completion_repo.create(schemas.QuizCompletionCreate(
+            quiz_id=quiz_id, user_id=valid_user_ids[0], passed=passed, responses=submission.model_dump()
+        ))
+    repo = QuizAnalysisRepository(db_with_data)
+
+    assert repo.rebuild(quiz_id) == 2
+    analysis = repo.get_analysis(quiz_id)
+
+    assert [version.current for version in analysis.versions] == [True]
+    version = analysis.versions[0]
+    assert (version.completions, version.passed, version.pass_rate) == (2, 1, 0.5)
+    first, second = version.questions
+    assert (first.question_id, first.responses, first.correct, first.difficulty) == (0, 2, 1, 0.5)
+    assert [(choice.choice_id, choice.correct, choice.selected, choice.selection_rate) for choice in first.choices] == [
+        (0, True, 1, 0.5), (1, False, 1, 0.5)
+    ]
+    assert (second.question_id, second.responses, second.correct, second.difficulty) == (1, 2, 2, 1.0)
+    # Choices that were never selected are included
+    assert [(choice.choice_id, choice.selected) for choice in second.choices] == [(0, 0), (1, 2), (2, 0)]
+    assert second.text == "How do you travel via the floo network?"
+
+    # Rebuilding again replaces the counts rather than adding to them
+    repo.rebuild(quiz_id)
+    assert _counts(repo.get_analysis(quiz_id)) == _counts(analysis)
+
+
+def test_get_analysis_old_version(db_with_data: Session):
+    quiz_id = _quiz_id(db_with_data)
+    db_with_data.add_all([
+        models.QuizVersionStats(quiz_id=quiz_id, version="old", completions=4, passed=3),
+        models.QuizQuestionStats(quiz_id=quiz_id, version="old", question_id=0, responses=4, correct=1),
+        models.QuizChoiceStats(quiz_id=quiz_id, version="old", question_id=0, choice_id=3, selected=3),
+    ])
+    db_with_data.flush()
+
+    analysis = QuizAnalysisRepository(db_with_data).get_analysis(quiz_id)
+
+    current, old = analysis.versions
+    assert (current.current, current.completions, current.pass_rate) == (True, 0, 0.0)
+    assert [(question.question_id, question.responses, len(question.choices)) for question in current.questions] == [(0, 0, 2), (1, 0, 3)]
+    assert old == schemas.QuizVersionAnalysis(
+        version="old", current=False, completions=4, passed=3, pass_rate=0.75, questions=[schemas.QuizQuestionAnalysis(
+            question_id=0, text=None, responses=4, correct=1, difficulty=0.25, choices=[
+                schemas.QuizChoiceAnalysis(choice_id=3, selected=3, selection_rate=0.75)
+            ]
+        )]
+    )
+
+
+def test_get_analysis_not_found(db_with_data: Session):
+    assert QuizAnalysisRepository(db_with_data).get_analysis(0) is None
+
+
+@patch.object(AsyncCertificateRepository, "get_certificate_by_id")
+@patch.object(QuizService, "email_certificate")
+@pytest.mark.anyio
+async def test_grade_counts_completions(
+        mock_quiz_service_email_certificate: MagicMock,
+        mock_certificate_repo_get_certificate_by_id: MagicMock,
+        async_db_with_data: AsyncSession,
+        valid_passing_submission: schemas.QuizSubmission,
+        valid_failing_submission: schemas.QuizSubmission,
+        valid_user_certificate: schemas.UserCertificate
+):
+    quiz_service = QuizService(async_db_with_data)
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz_id = await async_db_with_data.run_sync(_quiz_id)
+    mock_certificate_repo_get_certificate_by_id.return_value = valid_user_certificate
+
+    for submission in (valid_passing_submission, valid_failing_submission, valid_passing_submission):
+        await quiz_service.grade(quiz_id, user_id, submission=submission)
+
+    graded = await async_db_with_data.run_sync(lambda db: QuizAnalysisRepository(db).get_analysis(quiz_id))
+    version = graded.versions[0]
+    assert (version.completions, version.passed) == (3, 2)
+    assert [(question.responses, question.correct) for question in version.questions] == [(3, 2), (3, 3)]
+
+    # The counts match the batch count over the stored responses
+    def rebuild(db: Session) -> schemas.QuizAnalysis:
+        QuizAnalysisRepository(db).rebuild(quiz_id)
+        return QuizAnalysisRepository(db).get_analysis(quiz_id)
+    assert _counts(await async_db_with_data.run_sync(rebuild)) == _counts(graded)
+
+
+@patch.object(AsyncQuizAnalysisRepository, "add_completion", side_effect=OperationalError("INSERT", {}, Exception("deadlock detected")))
+@pytest.mark.anyio
+async def test_grade_succeeds_when_counting_fails(
+        mock_add_completion: MagicMock,
+        async_db_with_data: AsyncSession,
+        valid_failing_submission: schemas.QuizSubmission
+):
+    quiz_service = QuizService(async_db_with_data)
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz_id = await async_db_with_data.run_sync(_quiz_id)
+
+    result = await quiz_service.grade(quiz_id, user_id, submission=valid_failing_submission)
+
+    # The completion was committed before it was counted
+    mock_add_completion.assert_called_once()
+    assert await async_db_with_data.get(models.QuizCompletion, result.quiz_completion_id) is not None
@@ -3,7 +3,12 @@ from unittest.mock import MagicMock, patch
 from training import models, schemas
 from training.errors import IncompleteQuizResponseError, SendEmailError
 from training.services import QuizService
-from training.repositories import QuizRepository, QuizCompletionRepository, CertificateRepository
+from training.services.quiz import send_quiz_certificate
+from training.repositories import (AsyncQuizRepository, AsyncQuizCompletionRepository, AsyncCertificateRepository, AsyncReportSummaryRepository,
+                                   CertificateRepository, UserRepository)
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .factories import QuizCompletionFactory
 from unittest.mock import ANY
@@ -11,30 +16,29 @@ from unittest.mock import ANY
 from ..api import email
 
 
-@patch.object(QuizCompletionRepository, "create")
-@patch.object(CertificateRepository, "get_certificate_by_id")
+@patch.object(AsyncQuizCompletionRepository, "create")
+@patch.object(AsyncCertificateRepository, "get_certificate_by_id")
 @patch.object(QuizService, "email_certificate")
-def test_grade_passing(
+@pytest.mark.anyio
+async def test_grade_passing(
         mock_quiz_service_email_certificate: MagicMock,
         mock_certificate_repo_get_certificate_by_id: MagicMock,
         mock_quiz_completion_repo_create: MagicMock,
-        db_with_data: Session,
+        async_db_with_data: AsyncSession,
         valid_passing_submission: schemas.QuizSubmission,
-        valid_user_certificate: schemas.UserCertificate,
-        valid_user_ids,
-        valid_quiz_ids
+        valid_user_certificate: schemas.UserCertificate
 ):
-    quiz_service = QuizService(db_with_data)
+    quiz_service = QuizService(async_db_with_data)
 
-    user_id = valid_user_ids[-1]
-    quiz_id = valid_quiz_ids[0]
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz_id = (await async_db_with_data.scalars(select(models.Quiz.id).order_by(models.Quiz.id))).first()
 
     mock_quiz_completion_repo_create.return_value = QuizCompletionFactory.build()
 
     mock_certificate_repo_get_certificate_by_id.return_value = valid_user_certificate
     mock_quiz_service_email_certificate.return_value = None
 
-    result = quiz_service.grade(quiz_id, user_id, submission=valid_passing_submission)
+    result = await quiz_service.grade(quiz_id, user_id, submission=valid_passing_submission)
 
     mock_quiz_service_email_certificate.assert_called_once_with(
         "Test Three",
@@ -52,20 +56,104 @@ def test_grade_passing(
     assert result.questions[1].selected_ids == [1]
 
 
-@patch.object(QuizRepository, "find_by_id")
-@patch.object(QuizCompletionRepository, "create")
-def test_grade_failing(
+@patch.object(AsyncCertificateRepository, "get_certificate_by_id")
+@patch.object(QuizService, "email_certificate")
+@pytest.mark.anyio
+async def test_grade_passing_counts_report_summary(
+        mock_quiz_service_email_certificate: MagicMock,
+        mock_certificate_repo_get_certificate_by_id: MagicMock,
+        async_db_with_data: AsyncSession,
+        valid_passing_submission: schemas.QuizSubmission,
+        valid_user_certificate: schemas.UserCertificate
+):
+    quiz_service = QuizService(async_db_with_data)
+    user = (await async_db_with_data.scalars(select(models.User).order_by(models.User.id.desc()))).first()
+    quiz_id = (await async_db_with_data.scalars(select(models.Quiz.id).order_by(models.Quiz.id))).first()
+    mock_certificate_repo_get_certificate_by_id.return_value = valid_user_certificate
+
+    for _ in range(2):
+        result = await quiz_service.grade(quiz_id, user.id, submission=valid_passing_submission)
+
+    completion = await async_db_with_data.get(models.QuizCompletion, result.quiz_completion_id)
+    summary = await async_db_with_data.get(models.ReportSummary, (user.agency_id, quiz_id, completion.submit_ts.date().replace(day=1)))
+    assert summary.passed == 2
+
+
+@patch.object(AsyncReportSummaryRepository, "add_passed", side_effect=OperationalError("INSERT", {}, Exception("deadlock detected")))
+@patch.object(send_quiz_certificate, "delay")
+@pytest.mark.anyio
+async def test_grade_passing_succeeds_when_counting_fails(
+        mock_send_quiz_certificate_delay: MagicMock,
+        mock_add_passed: MagicMock,
+        async_db_with_data: AsyncSession,
+        valid_passing_submission: schemas.QuizSubmission
+):
+    quiz_service = QuizService(async_db_with_data, queue_emails=True)
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz_id = (await async_db_with_data.scalars(select(models.Quiz.id).order_by(models.Quiz.id))).first()
+
+    result = await quiz_service.grade(quiz_id, user_id, submission=valid_passing_submission)
+
+    # The completion was committed before it was counted, and its certificate is still sent
+    mock_add_passed.assert_called_once_with(user_id, quiz_id)
+    assert await async_db_with_data.get(models.QuizCompletion, result.quiz_completion_id) is not None
+    mock_send_quiz_certificate_delay.assert_called_once()
+
+
+@patch.object(send_quiz_certificate, "delay")
+@patch.object(QuizService, "email_certificate")
+@pytest.mark.anyio
+async def test_grade_passing_queues_email(
+        mock_quiz_service_email_certificate: MagicMock,
+        mock_send_quiz_certificate_delay: MagicMock,
+        async_db_with_data: AsyncSession,
+        valid_passing_submission: schemas.QuizSubmission
+):
+    quiz_service = QuizService(async_db_with_data, queue_emails=True)
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz = (await async_db_with_data.scalars(select(models.Quiz).order_by(models.Quiz.id))).first()
+
+    result = await quiz_service.grade(quiz.id, user_id, submission=valid_passing_submission)
+
+    # The grade is returned before the certificate is rendered and emailed
+    mock_quiz_service_email_certificate.assert_not_called()
+    assert result.passed
+    mock_send_quiz_certificate_delay.assert_called_once_with(user_id, quiz.name, result.quiz_completion_id)
+
+
+@patch.object(UserRepository, "find_by_id")
+@patch.object(CertificateRepository, "get_certificate_by_id")
+@patch.object(QuizService, "email_certificate")
+def test_send_quiz_certificate(
+        mock_quiz_service_email_certificate: MagicMock,
+        mock_certificate_repo_get_certificate_by_id: MagicMock,
+        mock_user_repo_find_by_id: MagicMock,
+        valid_user_certificate: schemas.UserCertificate
+):
+    mock_user_repo_find_by_id.return_value = models.User(name="Test Three", email="test3@example.com")
+    mock_certificate_repo_get_certificate_by_id.return_value = valid_user_certificate
+
+    send_quiz_certificate(3, "Travel Training for Ministry of Magic", 1)
+
+    mock_certificate_repo_get_certificate_by_id.assert_called_once_with(1)
+    mock_quiz_service_email_certificate.assert_called_once_with("Test Three", "Travel Training for Ministry of Magic", "test3@example.com", ANY)
+
+
+@patch.object(AsyncQuizRepository, "find_by_id")
+@patch.object(AsyncQuizCompletionRepository, "create")
+@pytest.mark.anyio
+async def test_grade_failing(
         mock_quiz_completion_repo_create: MagicMock,
         mock_quiz_repo_find_by_id: MagicMock,
-        db_with_data: Session,
+        async_db_with_data: AsyncSession,
         valid_failing_submission: schemas.QuizSubmission,
         valid_quiz: models.Quiz
 ):
-    quiz_service = QuizService(db_with_data)
+    quiz_service = QuizService(async_db_with_data)
     mock_quiz_repo_find_by_id.return_value = valid_quiz
     mock_quiz_completion_repo_create.return_value = QuizCompletionFactory.build()
 
-    result = quiz_service.grade(quiz_id=123, user_id=123, submission=valid_failing_submission)
+    result = await quiz_service.grade(quiz_id=123, user_id=123, submission=valid_failing_submission)
 
     assert isinstance(result, schemas.QuizGrade)
     assert not result.passed
@@ -76,42 +164,42 @@ def test_grade_failing(
     assert result.questions[1].selected_ids == [1]
 
 
-@patch.object(QuizRepository, "find_by_id")
-@patch.object(QuizCompletionRepository, "create")
-def test_grade_invalid(
+@patch.object(AsyncQuizRepository, "find_by_id")
+@patch.object(AsyncQuizCompletionRepository, "create")
+@pytest.mark.anyio
+async def test_grade_invalid(
         mock_quiz_completion_repo_create: MagicMock,
         mock_quiz_repo_find_by_id: MagicMock,
-        db_with_data: Session,
+        async_db_with_data: AsyncSession,
         invalid_submission: schemas.QuizSubmission,
         valid_quiz: models.Quiz
 ):
-    quiz_service = QuizService(db_with_data)
+    quiz_service = QuizService(async_db_with_data)
     mock_quiz_repo_find_by_id.return_value = valid_quiz
     mock_quiz_completion_repo_create.return_value = 0
 
     with pytest.raises(IncompleteQuizResponseError) as err:
-        quiz_service.grade(quiz_id=123, user_id=123, submission=invalid_submission)
+        await quiz_service.grade(quiz_id=123, user_id=123, submission=invalid_submission)
 
     assert err.value.missing_responses == [1]
 
 
-@patch.object(QuizCompletionRepository, "create")
-@patch.object(CertificateRepository, "get_certificate_by_id")
+@patch.object(AsyncQuizCompletionRepository, "create")
+@patch.object(AsyncCertificateRepository, "get_certificate_by_id")
 @patch.object(QuizService, "email_certificate")
-def test_grade_email_certificate_error(
+@pytest.mark.anyio
+async def test_grade_email_certificate_error(
         mock_quiz_service_email_certificate: MagicMock,
         mock_certificate_repo_get_certificate_by_id: MagicMock,
         mock_quiz_completion_repo_create: MagicMock,
-        db_with_data: Session,
+        async_db_with_data: AsyncSession,
         valid_passing_submission: schemas.QuizSubmission,
-        valid_user_certificate: schemas.UserCertificate,
-        valid_user_ids,
-        valid_quiz_ids
+        valid_user_certificate: schemas.UserCertificate
 ):
-    quiz_service = QuizService(db_with_data)
+    quiz_service = QuizService(async_db_with_data)
 
-    user_id = valid_user_ids[-1]
-    quiz_id = valid_quiz_ids[0]
+    user_id = (await async_db_with_data.scalars(select(models.User.id).order_by(models.User.id.desc()))).first()
+    quiz_id = (await async_db_with_data.scalars(select(models.Quiz.id).order_by(models.Quiz.id))).first()
 
     mock_quiz_completion_repo_create.return_value = QuizCompletionFactory.build()
 
@@ -119,7 +207,7 @@ def test_grade_email_certificate_error(
     mock_quiz_service_email_certificate.side_effect = SendEmailError
 
     with pytest.raises(Exception):
-        quiz_service.grade(quiz_id, user_id, submission=valid_passing_submission)
+        await quiz_service.grade(quiz_id, user_id, submission=valid_passing_submission)
 
 
 @patch.multiple(email.settings,
@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import jwt
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+from starlette.requests import Request
+from training.api.deps import gspc_invite_repository
+from training.api.rate_limit import client_ip
+from training.config import settings
+from training.data import RateLimiter, UserCache
+from training.main import app
+from training.metrics import RATE_LIMITED
+
+client = TestClient(app)
+
+GET_LINK_BODY = {
+    "user": {"name": "Leopold Bloom", "email": "leopold.bloom@example.gov", "agency_id": 3},
+    "dest": {"page_id": "certificates", "title": "Certificates", "parameters": ""}
+}
+
+
+@pytest.fixture
+def fake_redis():
+    with patch("training.data.rate_limiter.redis", fakeredis.FakeRedis()) as redis:
+        yield redis
+
+
+@pytest.fixture
+def get_link_services():
+    with patch("training.api.api_v1.loginless_flow.send_email") as send_email:
+        app.dependency_overrides[UserCache] = lambda: UserCache()
+        with patch.object(UserCache, "set", return_value="token"):
+            yield send_email
+    app.dependency_overrides = {}
+
+
+def request_from(host: str, forwarded_for: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234)})
+
+
+def test_hit_allows_burst_then_rejects(fake_redis):
+    limiter = RateLimiter()
+
+    assert [limiter.hit("test", "key", 3, 60) for _ in range(3)] == [0, 0, 0]
+    retry_after = limiter.hit("test", "key", 3, 60)
+
+    # One request is let through every 20 seconds
+    assert 19 < retry_after <= 20
+    assert limiter.hit("test", "other-key", 3, 60) == 0
+
+
+def test_hit_with_cost(fake_redis):
+    limiter = RateLimiter()
+
+    assert limiter.hit("test", "key", 10, 60, cost=8) == 0
+    # Two more are allowed now, the other two once 12 seconds have passed
+    assert 11 < limiter.hit("test", "key", 10, 60, cost=4) <= 12
+    # Rejected requests aren't counted
+    assert limiter.hit("test", "key", 10, 60, cost=2) == 0
+
+
+@patch.object(settings, "RATE_LIMITS", {"get-link:email": (2, 60)})
+def test_get_link_limited_by_email(fake_redis, get_link_services):
+    before = RATE_LIMITED.labels(limit="get-link:email")._value.get()
+
+    responses = [client.post("/api/v1/get-link", json=GET_LINK_BODY) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [201, 201, 429]
+    assert 29 <= int(responses[2].headers["Retry-After"]) <= 30
+    assert get_link_services.call_count == 2
+    assert RATE_LIMITED.labels(limit="get-link:email")._value.get() == before + 1
+
+
+@patch.object(settings, "RATE_LIMITS", {"get-link:ip": (1, 60)})
+@patch.object(settings, "TRUSTED_PROXY_COUNT", 1)
+def test_get_link_limited_by_ip(fake_redis, get_link_services):
+    first = client.post("/api/v1/get-link", json=GET_LINK_BODY, headers={"X-Forwarded-For": "192.0.2.1"})
+    second = client.post("/api/v1/get-link", json=GET_LINK_BODY, headers={"X-Forwarded-For": "192.0.2.1"})
+    other = client.post("/api/v1/get-link", json=GET_LINK_BODY, headers={"X-Forwarded-For": "192.0.2.2"})
+
+    assert (first.status_code, second.status_code, other.status_code) == (201, 429, 201)
+
+
+@patch.object(settings, "RATE_LIMITS", {"get-link:email": (1, 60)})
+def test_get_link_allowed_without_redis(get_link_services):
+    with patch.object(RateLimiter, "hit", side_effect=ConnectionError):
+        responses = [client.post("/api/v1/get-link", json=GET_LINK_BODY) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [201, 201]
+
+
+@patch.object(settings, "RATE_LIMITS", {"gspc-invite:user": (3, 3600)})
+@patch("training.api.api_v1.gspc.send_gspc_invite_email")
+def test_gspc_invite_limited_by_emails_invited(send_gspc_invite_email, fake_redis):
+    app.dependency_overrides[gspc_invite_repository] = lambda: MagicMock()
+    admin = jwt.encode({"name": "Admin", "email": "admin@example.gov", "roles": ["Admin"]}, settings.JWT_SECRET, algorithm="HS256")
+
+    def invite(emails: str):
+        return client.post(
+            "/api/v1/gspc-invite",
+            json={"email_addresses": emails, "certification_expiration_date": "2030-01-01T00:00:00.000Z"},
+            headers={"Authorization": f"Bearer {admin}"}
+        )
+
+    try:
+        assert invite("one@example.gov, two@example.gov").status_code == status.HTTP_200_OK
+        assert invite("three@example.gov, four@example.gov").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert invite("one@example.gov, two@example.gov, three@example.gov, four@example.gov").json()["detail"] == "No more than 3 at a time"
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_client_ip():
+    with patch.object(settings, "TRUSTED_PROXY_COUNT", 2):
+        # Anything before the proxies' addresses could have been sent by the client
+        assert client_ip(request_from("10.0.0.1", "203.0.113.9, 192.0.2.1, 10.0.0.2")) == "192.0.2.1"
+        assert client_ip(request_from("10.0.0.1", "192.0.2.1")) == "192.0.2.1"
+        assert client_ip(request_from("192.0.2.1")) == "192.0.2.1"
+    with patch.object(settings, "TRUSTED_PROXY_COUNT", 0):
+        assert client_ip(request_from("192.0.2.1", "203.0.113.9")) == "192.0.2.1"
@@ -0,0 +1,66 @@
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from training import models, schemas
+from training.repositories import QuizCompletionRepository, ReportCompletionRepository, UserRepository
+
+
+def _facts(db: Session) -> list[models.ReportCompletion]:
+    return list(db.scalars(select(models.ReportCompletion).order_by(models.ReportCompletion.quiz_completion_id)))
+
+
+def test_loaded_passed_completions(db_with_data: Session):
+    passed = db_with_data.scalars(select(models.QuizCompletion).where(models.QuizCompletion.passed)).all()
+    assert [fact.quiz_completion_id for fact in _facts(db_with_data)] == [completion.id for completion in passed]
+
+
+def test_create_adds_passed_completion(db_with_data: Session, valid_quiz_ids: list[int], valid_user_ids: list[int]):
+    repo = QuizCompletionRepository(db_with_data)
+    passed = repo.create(schemas.QuizCompletionCreate(quiz_id=valid_quiz_ids[0], user_id=valid_user_ids[0], passed=True, responses={}))
+    failed = repo.create(schemas.QuizCompletionCreate(quiz_id=valid_quiz_ids[0], user_id=valid_user_ids[0], passed=False, responses={}))
+
+    fact = db_with_data.get(models.ReportCompletion, passed.id)
+    user = db_with_data.get(models.User, valid_user_ids[0])
+    quiz = db_with_data.get(models.Quiz, valid_quiz_ids[0])
+    assert fact.user_name == user.name
+    assert fact.user_email == user.email
+    assert fact.agency_id == user.agency_id
+    assert fact.agency_name == user.agency.name
+    assert fact.bureau == user.agency.bureau
+    assert fact.quiz_name == quiz.name
+    assert fact.submit_ts == passed.submit_ts
+    assert db_with_data.get(models.ReportCompletion, failed.id) is None
+
+
+def test_update_user_updates_reports(db_with_data: Session):
+    fact = _facts(db_with_data)[0]
+    agency = db_with_data.scalars(select(models.Agency).where(models.Agency.id != fact.agency_id)).first()
+
+    UserRepository(db_with_data).update_user(fact.user_id, models.User(name="Renamed User", agency_id=agency.id), "test_user")
+
+    db_with_data.refresh(fact)
+    assert fact.user_name == "Renamed User"
+    assert fact.agency_id == agency.id
+    assert fact.agency_name == agency.name
+    assert fact.bureau == agency.bureau
+    report = UserRepository(db_with_data).get_admin_smartpay_training_report(schemas.SmartPayTrainingReportFilter(bureau_id=agency.id))
+    assert [row.name for row in report] == ["Renamed User"]
+
+
+def test_backfill(db_with_data: Session):
+    repo = ReportCompletionRepository(db_with_data)
+    expected = [fact.quiz_completion_id for fact in _facts(db_with_data)]
+    db_with_data.execute(delete(models.ReportCompletion))
+
+    assert repo.backfill() == len(expected)
+    assert repo.backfill() == 0
+    assert [fact.quiz_completion_id for fact in _facts(db_with_data)] == expected
+
+
+def test_rebuild(db_with_data: Session):
+    repo = ReportCompletionRepository(db_with_data)
+    quiz = db_with_data.get(models.Quiz, _facts(db_with_data)[0].quiz_id)
+    quiz.name = "Renamed Quiz"
+    db_with_data.flush()
+
+    assert repo.rebuild() == len(_facts(db_with_data))
+    assert {fact.quiz_name for fact in _facts(db_with_data)} == {"Renamed Quiz"}
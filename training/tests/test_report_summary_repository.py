@@ -0,0 +1,81 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from training import models, schemas
+from training.repositories import ReportSummaryRepository, UserRepository
+
+
+def _counts(db: Session) -> dict[tuple[int, int, date], int]:
+    return {(row.agency_id, row.quiz_id, row.month): row.passed for row in db.scalars(select(models.ReportSummary))}
+
+
+def _agency_ids(db: Session, name: str) -> list[int]:
+    return list(db.scalars(select(models.Agency.id).where(models.Agency.name == name).order_by(models.Agency.id)))
+
+
+def _report_user(db: Session, agency_ids: list[int]) -> int:
+    user_id = db.scalars(select(models.User.id).order_by(models.User.id)).first()
+    UserRepository(db).edit_user_for_reporting(user_id, agency_ids, "test_user")
+    return user_id
+
+
+def test_rebuild(db_with_data: Session):
+    completion = db_with_data.scalars(select(models.QuizCompletion).where(models.QuizCompletion.passed)).one()
+    user = db_with_data.get(models.User, completion.user_id)
+    db_with_data.execute(models.ReportSummary.__table__.delete())
+
+    assert ReportSummaryRepository(db_with_data).rebuild() == 1
+    assert _counts(db_with_data) == {(user.agency_id, completion.quiz_id, date(2024, 1, 1)): 1}
+
+
+def test_update_user_moves_counts(db_with_data: Session):
+    completion = db_with_data.scalars(select(models.QuizCompletion).where(models.QuizCompletion.passed)).one()
+    user = db_with_data.get(models.User, completion.user_id)
+    agency_id = db_with_data.scalars(select(models.Agency.id).where(models.Agency.id != user.agency_id)).first()
+
+    UserRepository(db_with_data).update_user(user.id, models.User(name=user.name, agency_id=agency_id), "test_user")
+
+    assert _counts(db_with_data) == {(agency_id, completion.quiz_id, date(2024, 1, 1)): 1}
+
+
+def test_get_user_quiz_completion_summary(db_with_data: Session):
+    report_user_id = _report_user(db_with_data, _agency_ids(db_with_data, "Department of Mysteries"))
+
+    results = UserRepository(db_with_data).get_user_quiz_completion_summary(schemas.SmartPayTrainingReportFilter(), report_user_id)
+
+    assert results == [schemas.QuizCompletionSummaryData(
+        agency="Department of Mysteries", bureau=None, quiz="Travel Training for Ministry of Magic", month=date(2024, 1, 1), passed=1
+    )]
+
+
+@pytest.mark.parametrize("filter", [
+    schemas.SmartPayTrainingReportFilter(completion_date_start=datetime(2024, 2, 1)),
+    schemas.SmartPayTrainingReportFilter(completion_date_end=datetime(2023, 12, 31)),
+    schemas.SmartPayTrainingReportFilter(quiz_names=["Another Quiz"]),
+])
+def test_get_user_quiz_completion_summary_filtered_out(db_with_data: Session, filter: schemas.SmartPayTrainingReportFilter):
+    report_user_id = _report_user(db_with_data, _agency_ids(db_with_data, "Department of Mysteries"))
+    assert UserRepository(db_with_data).get_user_quiz_completion_summary(filter, report_user_id) == []
+
+
+def test_get_user_quiz_completion_summary_month_of_dates(db_with_data: Session):
+    report_user_id = _report_user(db_with_data, _agency_ids(db_with_data, "Department of Mysteries"))
+    filter = schemas.SmartPayTrainingReportFilter(completion_date_start=datetime(2024, 1, 31), completion_date_end=datetime(2024, 1, 2))
+    assert len(UserRepository(db_with_data).get_user_quiz_completion_summary(filter, report_user_id)) == 1
+
+
+def test_get_user_quiz_completion_summary_scoped_to_report_agencies(db_with_data: Session):
+    mysteries = _agency_ids(db_with_data, "Department of Mysteries")
+    # Access to another agency and a bureau of the completion's agency, not the agency itself
+    report_user_id = _report_user(db_with_data, _agency_ids(db_with_data, "Other") + mysteries[-1:])
+    repo = UserRepository(db_with_data)
+
+    assert repo.get_user_quiz_completion_summary(schemas.SmartPayTrainingReportFilter(), report_user_id) == []
+    assert repo.get_user_quiz_completion_summary(schemas.SmartPayTrainingReportFilter(agency_id=mysteries[0]), report_user_id) == []
+
+
+def test_get_user_quiz_completion_summary_invalid_report_user(db_with_data: Session):
+    user_id = db_with_data.scalars(select(models.User.id).order_by(models.User.id)).first()
+    with pytest.raises(ValueError):
+        UserRepository(db_with_data).get_user_quiz_completion_summary(schemas.SmartPayTrainingReportFilter(), user_id)
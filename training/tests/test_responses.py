@@ -0,0 +1,27 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+
+from training.api.responses import ModelSerializer
+from training.schemas import CertificateListValue, CertificateType
+
+
+def test_serializes_rows_by_attribute():
+    row = SimpleNamespace(
+        id=1, user_id=2, user_name="Molly Bloom", cert_title="Travel Training for Card/Account Holders and Approving Officials",
+        completion_date=datetime(2024, 1, 24, 9, 30), certificate_type=CertificateType.QUIZ.value,
+    )
+
+    response = ModelSerializer(list[CertificateListValue]).response([row])
+
+    assert response.media_type == "application/json"
+    # The same JSON as FastAPI's own serialization
+    assert json.loads(response.body) == jsonable_encoder([CertificateListValue.model_validate(row, from_attributes=True)])
+
+
+def test_status_code():
+    response = ModelSerializer(list[int]).response([1, 2], status_code=201)
+    assert response.status_code == 201
+    assert response.body == b"[1,2]"
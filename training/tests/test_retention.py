@@ -0,0 +1,40 @@
+from datetime import datetime
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from training import models
+from training.database.retention import archive_failed, count_archivable, ensure_partitions
+
+
+def test_ensure_partitions(db: Session):
+    this_year = datetime.now().year
+    db.execute(text(f"DROP TABLE IF EXISTS quiz_completions_y{this_year + 2}"))
+
+    assert ensure_partitions(db, years_ahead=2) == [f"quiz_completions_y{this_year + 2}"]
+    assert ensure_partitions(db, years_ahead=2) == []
+
+
+def test_archive_failed(db_with_data: Session, valid_user_ids: list[int], valid_quiz_ids: list[int]):
+    def completion(passed: bool, submit_ts: datetime) -> models.QuizCompletion:
+        return models.QuizCompletion(
+            user_id=valid_user_ids[0], quiz_id=valid_quiz_ids[0], passed=passed, submit_ts=submit_ts, responses={"responses": []}
+        )
+    old_failed = [completion(False, datetime(2019, 6, day)) for day in range(1, 4)]
+    kept = [completion(True, datetime(2019, 6, 1)), completion(False, datetime(2023, 6, 1))]
+    db_with_data.add_all(old_failed + kept)
+    db_with_data.commit()
+    old_failed_ids = [c.id for c in old_failed]
+    kept_ids = {c.id for c in kept}
+    before = datetime(2020, 1, 1)
+
+    assert count_archivable(db_with_data, before) == 3
+    assert archive_failed(db_with_data, before, batch_size=2) == 3
+
+    archived = db_with_data.scalars(select(models.QuizCompletionArchive).order_by(models.QuizCompletionArchive.id)).all()
+    assert [row.id for row in archived] == old_failed_ids
+    assert (archived[0].quiz_id, archived[0].user_id, archived[0].passed, archived[0].submit_ts, archived[0].responses) == (
+        valid_quiz_ids[0], valid_user_ids[0], False, datetime(2019, 6, 1), {"responses": []}
+    )
+    remaining = set(db_with_data.scalars(select(models.QuizCompletion.id)))
+    assert not remaining & set(old_failed_ids)
+    assert remaining >= kept_ids
+    assert count_archivable(db_with_data, before) == 0
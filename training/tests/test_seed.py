@@ -0,0 +1,75 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from training import models
+from training.database.seed import seed, ADMIN_AGENCY
+
+
+@pytest.fixture
+def seed_data() -> dict:
+    return {
+        "agencies": [
+            {"name": ADMIN_AGENCY[0], "bureau": ADMIN_AGENCY[1]},
+            {"name": "Department of Seeds", "bureau": None},
+            {"name": "Department of Seeds", "bureau": "Bureau of Acorns"},
+            {"name": "Department of Seeds", "bureau": "Bureau of Pips"},
+        ],
+        "roles": [{"name": "Admin"}, {"name": "Report"}],
+        "admins": [{"email": "Seed.Admin@example.com", "name": "Seed Admin"}],
+        "AOPSs": [
+            {
+                "name": "Seed AOPC",
+                "email": "seed.aopc@example.com",
+                "agency": "Department of Seeds",
+                "bureau": None,
+                "reporting_agencies": [
+                    {"report_agency": "Department of Seeds", "report_bureau": None},
+                    {"report_agency": "Department of Seeds", "report_bureau": "All"},
+                ],
+            },
+        ],
+    }
+
+
+def test_seed(db: Session, seed_data: dict):
+    seed(db, seed_data)
+
+    admin = db.query(models.User).filter(models.User.email == "seed.admin@example.com").one()
+    assert [role.name for role in admin.roles] == ["Admin"]
+    assert (admin.agency.name, admin.agency.bureau) == ADMIN_AGENCY
+
+    aopc = db.query(models.User).filter(models.User.email == "seed.aopc@example.com").one()
+    assert [role.name for role in aopc.roles] == ["Report"]
+    assert sorted((a.bureau or "") for a in aopc.report_agencies) == ["", "Bureau of Acorns", "Bureau of Pips"]
+
+
+def test_seed_is_idempotent(db: Session, seed_data: dict):
+    seed(db, seed_data)
+    diff = seed(db, seed_data)
+    assert all(len(rows) == 0 for rows in diff.values())
+
+
+def test_seed_dry_run(db: Session, seed_data: dict):
+    diff = seed(db, seed_data, dry_run=True)
+    assert ("Department of Seeds", "Bureau of Pips") in diff["agencies"]
+    assert ("seed.aopc@example.com", "Report") in diff["users_x_roles"]
+    assert db.query(models.Agency).filter(models.Agency.name == "Department of Seeds").count() == 0
+    assert db.query(models.User).filter(models.User.email == "seed.aopc@example.com").count() == 0
+
+
+def test_seed_skips_existing_aopc(db: Session, seed_data: dict):
+    seed(db, seed_data)
+    seed_data["AOPSs"][0]["reporting_agencies"] = []
+    seed_data["agencies"].append({"name": "Department of Seeds", "bureau": "Bureau of Husks"})
+    diff = seed(db, seed_data)
+    assert diff["agencies"] == [("Department of Seeds", "Bureau of Husks")]
+    assert diff["users"] == []
+    assert diff["report_users_x_agencies"] == []
+
+
+def test_seed_rejects_malformed_emails(db: Session, seed_data: dict):
+    seed_data["AOPSs"][0]["email"] = "seed.aopc.example.com"
+    with pytest.raises(ValidationError):
+        seed(db, seed_data)
+    db.rollback()
+    assert db.query(models.User).filter(models.User.email == "seed.admin@example.com").count() == 0
@@ -0,0 +1,45 @@
+import random
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from training import models, schemas
+from training.database.synthetic import SyntheticCounts, generate
+from training.repositories import QuizAnalysisRepository
+from training.schemas.gspc_submission import GspcSubmissionQuestions
+from training.services.certificate import certificates
+
+
+def test_generate(db: Session):
+    users_before = db.scalar(select(func.count()).select_from(models.User))
+    passed_before = db.scalar(select(func.count()).select_from(models.QuizCompletion).where(models.QuizCompletion.passed))
+
+    added = generate(db.connection(), SyntheticCounts(users=50, quiz_completions=200, gspc_invites=20, gspc_completions=10), random.Random(0))
+
+    report_completions = added.pop("report_completions")
+    assert added == {"users": 50, "quiz_completions": 200, "gspc_invite": 20, "gspc_completions": 10}
+    # Every passed completion is in the reports
+    passed = db.scalar(select(func.count()).select_from(models.QuizCompletion).where(models.QuizCompletion.passed))
+    assert report_completions == passed - passed_before > 0
+    assert db.scalar(select(func.count()).select_from(models.User)) == users_before + 50
+    assert set(db.scalars(select(models.Quiz.name))) >= set(certificates)
+
+    # The completions are of the synthetic users and their responses match the quiz's questions
+    for completion in db.scalars(select(models.QuizCompletion).limit(20)):
+        assert completion.submit_ts >= db.get(models.User, completion.user_id).created_on
+        quiz = schemas.Quiz.model_validate(db.get(models.Quiz, completion.quiz_id))
+        submission = schemas.QuizSubmission.model_validate(completion.responses)
+        assert [r.question_id for r in submission.responses] == [q.id for q in quiz.content.questions]
+
+    # The item analysis counts every completion of each quiz
+    analysis = QuizAnalysisRepository(db)
+    completions = db.execute(
+        select(models.QuizCompletion.quiz_id, func.count(), func.count().filter(models.QuizCompletion.passed)).group_by(models.QuizCompletion.quiz_id)
+    ).all()
+    assert sum(count for _, count, _ in completions) >= 200
+    for quiz_id, count, passed in completions:
+        current = next(version for version in analysis.get_analysis(quiz_id).versions if version.current)
+        assert (current.completions, current.passed) == (count, passed)
+        assert all(question.responses == count for question in current.questions)
+
+    for completion in db.scalars(select(models.GspcCompletion)):
+        submission = GspcSubmissionQuestions.model_validate(completion.responses)
+        assert completion.passed == all(r.correct for r in submission.responses)
@@ -0,0 +1,128 @@
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from training.config import settings
+from training.data import TaskQueue
+from training.tasks import get_task, task
+from training.tasks.worker import Worker, retry_delay
+
+calls = []
+
+
+@task("test")
+def record(value: str) -> None:
+    calls.append(value)
+
+
+@task("test", max_attempts=2)
+def fail() -> None:
+    raise ValueError("SMTP is down")
+
+
+@pytest.fixture
+def fake_redis():
+    with patch("training.data.task_queue.redis", fakeredis.FakeRedis()) as redis:
+        yield redis
+    calls.clear()
+
+
+@contextmanager
+def an_hour_later():
+    with patch("training.data.task_queue.time") as clock:
+        clock.time.return_value = time.time() + 60 * 60
+        yield
+
+
+def test_enqueue_and_claim(fake_redis):
+    queue = TaskQueue()
+    first = record.delay("first")
+    record.delay_many([("second",), ("third",)])
+
+    job = queue.claim("test")
+
+    assert job.id == first
+    assert job.task == "training.tests.test_task_queue.record"
+    assert job.args == ["first"]
+    assert job.attempts == 1
+    assert queue.counts("test") == {"ready": 2, "delayed": 0, "running": 1, "dead": 0}
+
+    queue.complete(job)
+    assert queue.counts("test") == {"ready": 2, "delayed": 0, "running": 0, "dead": 0}
+    assert queue.get(first) is None
+
+
+def test_worker_runs_jobs_in_order(fake_redis):
+    record.delay_many([("first",), ("second",)])
+    worker = Worker(queues=("test",))
+
+    assert worker.run_once()
+    assert worker.run_once()
+    assert not worker.run_once()
+
+    assert calls == ["first", "second"]
+    assert TaskQueue().counts("test") == {"ready": 0, "delayed": 0, "running": 0, "dead": 0}
+
+
+def test_worker_retries_then_dead_letters(fake_redis):
+    queue = TaskQueue()
+    id = fail.delay()
+    worker = Worker(queues=("test",))
+
+    worker.run_once()
+
+    # Waiting for its backoff
+    assert queue.counts("test") == {"ready": 0, "delayed": 1, "running": 0, "dead": 0}
+    assert queue.get(id).error == "ValueError: SMTP is down"
+    assert not worker.run_once()
+
+    with an_hour_later():
+        worker.run_once()
+
+    assert queue.counts("test") == {"ready": 0, "delayed": 0, "running": 0, "dead": 1}
+    [job] = queue.dead_letters("test")
+    assert job.id == id
+    assert job.attempts == 2
+
+    assert queue.requeue_dead("test") == 1
+    assert queue.counts("test") == {"ready": 1, "delayed": 0, "running": 0, "dead": 0}
+    assert queue.get(id).attempts == 0
+
+
+def test_claim_reruns_jobs_past_their_visibility_timeout(fake_redis):
+    queue = TaskQueue()
+    id = record.delay("first")
+    # Its worker stops without finishing it
+    queue.claim("test", visibility_timeout=60)
+    assert queue.claim("test", visibility_timeout=60) is None
+
+    with an_hour_later():
+        job = queue.claim("test", visibility_timeout=60)
+
+    assert job.id == id
+    assert job.attempts == 2
+    assert queue.counts("test")["running"] == 1
+
+
+def test_worker_dead_letters_unknown_tasks(fake_redis):
+    queue = TaskQueue()
+    id = queue.enqueue("training.tasks.removed", "test", [])
+
+    Worker(queues=("test",)).run_once()
+
+    assert queue.dead_letters("test")[0].id == id
+    assert queue.get(id).error == "Unknown task training.tasks.removed"
+
+
+def test_get_task():
+    assert get_task("training.tests.test_task_queue.record") is record
+    assert get_task("training.tasks.removed") is None
+
+
+@patch.multiple(settings, TASK_RETRY_BACKOFF=30, TASK_RETRY_BACKOFF_MAX=3600)
+def test_retry_delay():
+    assert 24 <= retry_delay(1) <= 30
+    assert 96 <= retry_delay(3) <= 120
+    assert 2880 <= retry_delay(10) <= 3600
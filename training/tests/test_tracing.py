@@ -0,0 +1,71 @@
+import pytest
+import jwt
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from sqlalchemy.orm import Session
+from training.config import settings
+from training.main import app
+from training.repositories import UserRepository
+from training.tracing import configure_tracing, traced
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def exporter() -> InMemorySpanExporter:
+    # The tracer provider can only be installed once per process
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    return exporter
+
+
+@pytest.fixture
+def finished_spans(exporter: InMemorySpanExporter):
+    exporter.clear()
+
+    def get():
+        trace.get_tracer_provider().force_flush()
+        return {span.name: span for span in exporter.get_finished_spans()}
+    return get
+
+
+def test_repository_spans_are_named_after_the_repository(db_with_data: Session, finished_spans):
+    UserRepository(db_with_data).find_by_id(1)
+    assert "UserRepository.find_by_id" in finished_spans()
+
+
+def test_traced(finished_spans):
+    @traced()
+    def render():
+        return "pdf"
+
+    assert render() == "pdf"
+    assert "test_traced.<locals>.render" in finished_spans()
+
+
+@pytest.mark.anyio
+async def test_traced_coroutine(finished_spans):
+    @traced("smtp.send")
+    async def send():
+        return "sent"
+
+    assert await send() == "sent"
+    assert "smtp.send" in finished_spans()
+
+
+def test_request_span_is_parent_of_repository_spans(api_db_with_data: Session, finished_spans):
+    admin_jwt = jwt.encode({'name': 'Albus Dumbledore', 'roles': ['Admin']}, settings.JWT_SECRET, algorithm="HS256")
+    response = client.get(
+        "/api/v1/users?searchText=example.com&page_number=1",
+        headers={"Authorization": f"Bearer {admin_jwt}"}
+    )
+    assert response.status_code == 200
+
+    spans = finished_spans()
+    request_span = spans["GET /api/v1/users"]
+    assert request_span.attributes["http.route"] == "/api/v1/users"
+    assert request_span.attributes["http.status_code"] == 200
+    # The route runs in the threadpool, the span context goes with it
+    repository_span = spans["UserRepository.get_users"]
+    assert repository_span.parent.span_id == request_span.context.span_id
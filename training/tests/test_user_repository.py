@@ -2,9 +2,12 @@ from typing import List
 from unittest.mock import patch
 import pytest
 from training import models, schemas
-from training.repositories import UserRepository, AgencyRepository
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from training.repositories import UserRepository, AgencyRepository, AsyncUserRepository
 from datetime import datetime, timedelta
-from training.schemas import Agency, AgencyCreate
+from training.data import UserProfileCache
+from training.schemas import Agency, AgencyCreate, UserJWT, UserUpdate
 from training.tests.factories import UserSchemaFactory
 
 
@@ -20,6 +23,17 @@ def test_create(user_repo_empty: UserRepository, agency_repo_with_data: AgencyRe
     assert db_user.name == "New User"
 
 
+def test_create_many(user_repo_empty: UserRepository, agency_repo_with_data: AgencyRepository):
+    agency_id = agency_repo_with_data.find_all()[0].id
+    new_users = [
+        schemas.UserCreate(email="New_User1@example.com", name="New User 1", agency_id=agency_id),  # type: ignore
+        schemas.UserCreate(email="new_user2@example.com", name="New User 2", agency_id=agency_id),  # type: ignore
+    ]
+    db_users = user_repo_empty.create_many(new_users)
+    assert all(db_user.id for db_user in db_users)
+    assert user_repo_empty.find_by_email("new_user1@example.com").id == db_users[0].id
+
+
 def test_create_duplicate(user_repo_with_data: UserRepository):
     existing_user = user_repo_with_data.find_all()[0]
     duplicate_user = schemas.UserCreate(
@@ -98,6 +112,12 @@ def test_edit_user_for_reporting(user_repo_with_data: UserRepository, valid_user
     assert result.modified_by == "test_user"
 
 
+def test_edit_user_for_reporting_invalid_agency(user_repo_with_data: UserRepository, valid_user_ids: List[int]):
+    valid_agency = user_repo_with_data._session.query(models.Agency).first()
+    with pytest.raises(ValueError):
+        user_repo_with_data.edit_user_for_reporting(valid_user_ids[0], [valid_agency.id, 0], "test_user")
+
+
 def test_invalid_create(user_repo_with_data: UserRepository):
     invalid_user_id = 0
     invalid_agency_id_list = [0]
@@ -114,6 +134,8 @@ def test_get_users(user_repo_with_data: UserRepository, valid_user_ids: List[int
     assert result is not None
     for item in result.users:
         assert search_criteria in item.name
+    # Building the result doesn't change the users it was built from
+    assert not user_repo_with_data._session.dirty
 
 
 def test_get_users_by_email(user_repo_with_data: UserRepository, valid_user_ids: List[int]):
@@ -269,3 +291,42 @@ def test_get_smartpay_training_report_with_no_report_agencies(user_repo_with_dat
         report_filter = schemas.SmartPayTrainingReportFilter()
         with pytest.raises(Exception):
             user_repo_with_data.get_user_quiz_completion_report(report_filter, 1)
+
+
+@pytest.mark.anyio
+async def test_async_find_by_email(async_db_with_data: AsyncSession, valid_user_dict):
+    repo = AsyncUserRepository(async_db_with_data)
+    result = await repo.find_by_email(valid_user_dict["email"].upper())
+    assert result is not None
+    assert result.name == valid_user_dict["name"]
+    # Relationships are loaded with the user, since they can't be lazy loaded later
+    assert result.agency.id == result.agency_id
+    assert result.roles == []
+
+
+@pytest.mark.anyio
+async def test_async_create(async_db_with_data: AsyncSession):
+    repo = AsyncUserRepository(async_db_with_data)
+    agency_id = (await async_db_with_data.scalars(select(models.Agency.id))).first()
+    db_user = await repo.create(schemas.UserCreate(email="New_Async_User@example.com", name="New User", agency_id=agency_id))  # type: ignore
+    assert db_user.id
+    assert db_user.email == "new_async_user@example.com"
+    assert schemas.UserJWT.model_validate(db_user).agency.id == agency_id
+
+
+def test_update_user_drops_cached_profile(user_repo_with_data: UserRepository, valid_user_ids: List[int]):
+    cache = UserProfileCache()
+    db_user = user_repo_with_data.find_by_id(valid_user_ids[0])
+    cache.set(UserJWT.model_validate(db_user))
+
+    user_repo_with_data.update_user(db_user.id, UserUpdate(email=db_user.email, name="Updated User", agency_id=db_user.agency_id), "test_user")
+    assert cache.get(db_user.id) is None
+
+
+def test_edit_user_for_reporting_drops_cached_profile(user_repo_with_data: UserRepository, valid_user_ids: List[int]):
+    cache = UserProfileCache()
+    db_user = user_repo_with_data.find_by_id(valid_user_ids[0])
+    cache.set(UserJWT.model_validate(db_user))
+
+    user_repo_with_data.edit_user_for_reporting(db_user.id, [], "test_user")
+    assert cache.get(db_user.id) is None
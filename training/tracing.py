@@ -0,0 +1,133 @@
+'''
+Request tracing with OpenTelemetry. Each request gets a span, with child
+spans for repository calls, Redis, SMTP, certificate PDFs and JWKS fetches,
+so the slow step of a request can be picked out.
+
+Tracing is off unless TRACING_EXPORTER is set to "console" or "file". Spans
+are then written as JSON lines to stdout or to TRACING_FILE. Without an
+exporter the OpenTelemetry API hands out no-op spans, which cost next to
+nothing.
+'''
+import functools
+import inspect
+import sys
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from training.config import settings
+from training.metrics import route_template
+
+tracer = trace.get_tracer("training")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def configure_tracing(exporter: SpanExporter | None = None) -> None:
+    '''
+    Installs a tracer provider that sends spans to `exporter`, or to the
+    exporter named by the TRACING_EXPORTER setting.
+    '''
+    if exporter is None:
+        if settings.TRACING_EXPORTER == "console":
+            exporter = ConsoleSpanExporter(out=sys.stdout, formatter=_json_line)
+        elif settings.TRACING_EXPORTER == "file":
+            exporter = ConsoleSpanExporter(out=open(settings.TRACING_FILE, "a"), formatter=_json_line)
+        elif settings.TRACING_EXPORTER:
+            raise ValueError(f"Unknown TRACING_EXPORTER {settings.TRACING_EXPORTER!r}, use 'console' or 'file'")
+        else:
+            return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.PROJECT_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def _json_line(span: ReadableSpan) -> str:
+    return span.to_json(indent=None) + "\n"
+
+
+def traced(name: str | None = None) -> Callable[[F], F]:
+    '''
+    Decorator that runs a function, sync or async, in a span named `name`,
+    or after the function by default.
+    '''
+    def decorator(func: F) -> F:
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return func(*args, **kwargs)
+        return wrapper  # type: ignore
+    return decorator
+
+
+def trace_methods(cls: type) -> type:
+    '''
+    Runs each public method defined on `cls` in a span. The spans are named
+    after the class of the instance, so methods inherited from a base class
+    show up as e.g. `UserRepository.find_by_id`.
+    '''
+    for attr, func in list(vars(cls).items()):
+        if attr.startswith("_") or not inspect.isfunction(func):
+            continue
+        setattr(cls, attr, _traced_method(func))
+    return cls
+
+
+def _traced_method(func: Callable) -> Callable:
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            with tracer.start_as_current_span(f"{type(self).__name__}.{func.__name__}"):
+                return await func(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with tracer.start_as_current_span(f"{type(self).__name__}.{func.__name__}"):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
+class TracingMiddleware:
+    '''
+    Runs each HTTP request in a server span named after its route template,
+    which is the parent of the spans created while serving it.
+    '''
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.start_as_current_span(f"{scope['method']} {scope['path']}", kind=SpanKind.SERVER) as span:
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            span.set_attribute("http.method", scope["method"])
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # The route is only known once the router has matched the request
+                route = route_template(scope)
+                span.set_attribute("http.route", route)
+                span.update_name(f"{scope['method']} {route}")